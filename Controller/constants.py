@@ -32,6 +32,9 @@ TORCS_INSTALL_DIRECTORY_REF = (
     f"{prefix}general-ai/Game-interfaces/TORCS/install_directory.txt"
 )
 
+# REFERENCE GAME STUFF (protocol testing)
+REFERENCE_PY_PATH = f"{prefix}general-ai/Game-interfaces/Reference/reference_game.py"
+
 # Config files for each game (contains I/O sizes)
 GAME2048_CONFIG_FILE = (
     f"{prefix}general-ai/Game-interfaces/Game2048/2048_config.json"
@@ -45,3 +48,41 @@ TORCS_CONFIG_FILE = (
 MARIO_CONFIG_FILE = (
     f"{prefix}general-ai/Game-interfaces/Mario/Mario_config.json"
 )
+REFERENCE_CONFIG_FILE = (
+    f"{prefix}general-ai/Game-interfaces/Reference/Reference_config.json"
+)
+
+# Encoding of actions sent to game subprocesses (digits after / before decimal point)
+ACTION_PRECISION = 6
+ACTION_INTEGER_DIGITS = 4
+
+# Logs of game subprocesses (used when the protocol runs on a separate channel), removed when the game ends unless
+# it ended by an internal error or KEEP_GAME_LOGS is set
+GAME_LOGS_DIR = f"{loc}/logs/games"
+GAME_LOG_MAX_BYTES = 1 << 20
+KEEP_GAME_LOGS = False
+
+# Resource governor (see utils/resources.py) installed by the controller: number of worker slots (set to 'max_workers'
+# of the selected method, None = no governor) and niceness increment of game subprocesses
+GOVERNOR_WORKERS = None
+GAME_NICENESS = 5
+
+# Default numeric precision of evolved models (float64, float32 or float16 = float16 storage with float32 compute)
+MODEL_PRECISION = "float32"
+
+# Minimal sparsity and size (number of weights) of a layer (e.g. pruned) to be evaluated as a CSR matrix (CSR
+# matrix-vector product is faster than dense BLAS only for large and very sparse matrices)
+SPARSE_INFERENCE_THRESHOLD = 0.95
+SPARSE_INFERENCE_MIN_SIZE = 250000
+
+# Models and populations logged by the evolution store weights in binary '.npy' sidecars (False = JSON lists)
+BINARY_MODEL_FILES = True
+
+# Cache of Echo-State reservoirs (generated once per configuration and memory-mapped by all processes, None = disabled,
+# ignored by git)
+RESERVOIR_CACHE_DIR = f"{loc}/cache/reservoirs"
+
+# Size limit of the cache of reservoir projections of stateless Echo-State models (bytes, 0 = disabled). A stateless
+# projection computes only readout neurons, so the cache pays off only for games whose states repeat often (a hit saves
+# ~20 % of an evaluation, a miss costs ~30 %), e.g. 64 << 20 for Alhambra
+ESN_PROJECTION_CACHE_BYTES = 0
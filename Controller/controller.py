@@ -11,6 +11,8 @@ from __future__ import print_function
 import random
 import numpy as np
 
+import constants
+
 from evolution.differential_evolution import DifferentialEvolution
 from evolution.evolution_parameters import EvolutionaryAlgorithmParameters, EvolutionStrategyParameters, \
     DifferentialEvolutionParameters
@@ -21,6 +23,7 @@ from models.mlp import MLP
 from reinforcement.ddpg.ddpg_reinforcement import DDPGReinforcement
 from reinforcement.reinforcement_parameters import DDPGParameters, DQNParameters
 from reinforcement.dqn.dqn import DQN
+from utils.resources import ResourceGovernor
 
 
 # MASTER_SEED = 42
@@ -45,8 +48,9 @@ def run_eva(game):
 
     # mlp = MLP(hidden_layers=[100, 100, 100, 100], activation="relu")
     esn = EchoState(n_readout=200, n_components=1000, output_layers=[], activation="relu")
+    # pool="process" evaluates individuals by worker processes (games running in the controller process, e.g. 2048)
     evolution = EvolutionaryAlgorithm(game=game, evolution_params=eva_parameters, model=esn, logs_every=100,
-                                      max_workers=4)
+                                      max_workers=4, pool="thread")
     evolution.run()
 
 
@@ -136,6 +140,10 @@ if __name__ == '__main__':
     # Select the game: 2048, mario, torcs, alhambra
     game = "2048"
 
+    # Pin workers and game subprocesses to cores and cap BLAS / TensorFlow threads (see GOVERNOR_WORKERS in constants)
+    if constants.GOVERNOR_WORKERS is not None:
+        ResourceGovernor(workers=constants.GOVERNOR_WORKERS, game_niceness=constants.GAME_NICENESS).install()
+
     # Select learning method
     run_eva(game)
     # run_es(game)
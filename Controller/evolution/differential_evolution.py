@@ -2,7 +2,6 @@ from evolution.evolution import Evolution
 import time
 import numpy as np
 from deap import tools, creator, base
-import concurrent.futures
 
 
 class DifferentialEvolution(Evolution):
@@ -10,8 +9,17 @@ class DifferentialEvolution(Evolution):
     Provides a differential evolution functions.
     """
 
-    def __init__(self, game, evolution_params, model, max_workers, logs_every=50):
-        super(DifferentialEvolution, self).__init__(game, evolution_params, model, max_workers, logs_every)
+    def __init__(self, game, evolution_params, model, max_workers, logs_every=50, lockstep=False, pool="thread",
+                 synchronous=None):
+        """
+        Initializes a new instance of DifferentialEvolution.
+        :param synchronous: If true, trial vectors of all agents are created from the population of the previous
+        generation and evaluated at once (in parallel), otherwise agents are replaced one by one and later agents of a
+        generation see the replaced ones (None = synchronous only for the 'process' pool or lockstep evaluation).
+        """
+        super(DifferentialEvolution, self).__init__(game, evolution_params, model, max_workers, logs_every, lockstep,
+                                                    pool)
+        self.synchronous = (pool == "process" or lockstep) if synchronous is None else synchronous
 
     def deap_toolbox_init(self):
         """
@@ -32,10 +40,25 @@ class DifferentialEvolution(Evolution):
 
         toolbox.register("select", tools.selRandom, k=3)
 
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
-        toolbox.register("map", executor.map)
+        self.init_map(toolbox)
         return toolbox
 
+    def create_trial(self, toolbox, population, agent):
+        """
+        Creates a trial vector of the agent (mutation by three random agents and crossover with the agent).
+        :param toolbox: Deap toolbox.
+        :param population: Current population.
+        :param agent: Agent whose trial vector will be created.
+        :return: Trial vector (new individual).
+        """
+        a, b, c = toolbox.select(population)
+        y = toolbox.clone(agent)
+        index = np.random.randint(self.individual_len)
+        for i, value in enumerate(agent):
+            if i == index or np.random.random() < self.evolution_params.cr:
+                y[i] = a[i] + self.evolution_params.f * (b[i] - c[i])
+        return y
+
     def run(self, file_name=None):
         """
         Starts differential evolution.
@@ -64,7 +87,7 @@ class DifferentialEvolution(Evolution):
         # invalid_ind = [ind for ind in population if not ind.fitness.valid]
         invalid_ind = population
         seeds = [np.random.randint(0, 2 ** 16) for _ in range(len(invalid_ind))]
-        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind, seeds)
+        fitnesses = self.eval_population(toolbox, invalid_ind, seeds)
         for ind, fit in zip(invalid_ind, fitnesses):
             ind.fitness.values = fit
 
@@ -79,22 +102,27 @@ class DifferentialEvolution(Evolution):
 
         # Begin the generational process with differential evolution
         for gen in range(1, self.evolution_params.ngen + 1):
-            for k, agent in enumerate(population):
-                a, b, c = toolbox.select(population)
-                y = toolbox.clone(agent)
-                index = np.random.randint(self.individual_len)
-                for i, value in enumerate(agent):
-                    if i == index or np.random.random() < self.evolution_params.cr:
-                        y[i] = a[i] + self.evolution_params.f * (b[i] - c[i])
-                seed = np.random.randint(0, 2 ** 16)
-                y.fitness.values = toolbox.evaluate(y, seed)
-                if y.fitness > agent.fitness:
-                    population[k] = y
+            if self.synchronous:
+                # Trial vectors of all agents are created from the current population and evaluated at once
+                trials = [self.create_trial(toolbox, population, agent) for agent in population]
+                seeds = [np.random.randint(0, 2 ** 16) for _ in range(len(trials))]
+                fitnesses = self.eval_population(toolbox, trials, seeds)
+                for k, (y, fit) in enumerate(zip(trials, fitnesses)):
+                    y.fitness.values = fit
+                    if y.fitness > population[k].fitness:
+                        population[k] = y
+            else:
+                for k, agent in enumerate(population):
+                    y = self.create_trial(toolbox, population, agent)
+                    seed = np.random.randint(0, 2 ** 16)
+                    y.fitness.values = toolbox.evaluate(y, seed)
+                    if y.fitness > agent.fitness:
+                        population[k] = y
 
             """
             # In case we want evaluate fitness of all individuals (and not only new modified)
             seeds = [np.random.randint(0, 2 ** 16) for _ in range(len(population))]
-            fitnesses = toolbox.map(toolbox.evaluate, population, seeds)
+            fitnesses = self.eval_population(toolbox, population, seeds)
             for ind, fit in zip(population, fitnesses):
                 ind.fitness.values = fit
             """
@@ -14,8 +14,13 @@ import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import utils.miscellaneous
+import utils.model_files
+import utils.resources
 
 from deap import creator, base, tools
+from evolution import variation
+from evolution.process_pool import ProcessPoolEvaluator
+from models.dense_network import get_precision
 from utils.miscellaneous import get_game_config, get_game_instance
 
 
@@ -25,14 +30,37 @@ class Evolution():
     """
     all_time_best = []
 
-    def __init__(self, game, evolution_params, model, max_workers, logs_every=50):
+    def __init__(self, game, evolution_params, model, max_workers, logs_every=50, lockstep=False, pool="thread"):
+        """
+        Initializes a new instance of Evolution.
+        :param game: Game to be played.
+        :param evolution_params: Parameters of the evolution.
+        :param model: Model to be evolved.
+        :param max_workers: Number of threads (processes) evaluating individuals.
+        :param logs_every: Number of generations between logs.
+        :param lockstep: If true, whole generations are evaluated at once (games run in lockstep and all individuals
+        are evaluated by a single batched forward pass in every step). Requires a model with population support (MLP,
+        EchoState) and a game with lockstep support (2048).
+        :param pool: Evaluation backend, 'thread' (pool of threads) or 'process' (pool of processes sharing the
+        population matrix, see ProcessPoolEvaluator; requires a picklable model and a game running in the controller
+        process, e.g. 2048).
+        """
         self.current_game = game
         self.evolution_params = evolution_params
         self.model = model
         self.max_workers = max_workers
         self.logs_every = logs_every
+        self.lockstep = lockstep
+        self.pool = pool
+        self.evaluator = None
 
         self.game_config = get_game_config(game)
+        if lockstep and not hasattr(utils.miscellaneous.get_game_class(game), "run_lockstep"):
+            raise ValueError(f"Game {game} does not support lockstep evaluation.")
+        if pool not in ["thread", "process"]:
+            raise ValueError(f"Unknown pool: {pool}, use 'thread' or 'process'.")
+        if lockstep and pool == "process":
+            raise ValueError("Lockstep evaluation runs in the controller process, use the 'thread' pool.")
 
         print(f"Parameters: {evolution_params.to_string()}")
         print(f"Network: {model.to_string()}")
@@ -43,11 +71,9 @@ class Evolution():
         :param individual: Individual to log.
         :param filename: Filename where to write.
         """
-        with open(filename, "w") as f:
-            data = {"model": self.model.to_dictionary()}
-            data["model_name"] = self.model.get_name()
-            data["weights"] = individual
-            f.write(json.dumps(data))
+        data = {"model": self.model.to_dictionary()}
+        data["model_name"] = self.model.get_name()
+        utils.model_files.write_model(filename, data, individual)
 
     def eval_fitness(self, individual, seed):
         """
@@ -65,17 +91,25 @@ class Evolution():
 
         return result,
 
-    def mut_random(self, individual, mutindpb):
+    def eval_population(self, toolbox, individuals, seeds):
         """
-        Provides random mutation of a individual.
-        :param individual: Individual to mutate.
-        :param mutindpb: Probability of mutation for single "bit" of individual.
-        :return: New mutated individual.
+        Evaluates fitness of all specified individuals (using the 'map' of the toolbox, or in lockstep).
+        :param toolbox: DEAP toolbox with registered 'map' and 'evaluate'.
+        :param individuals: Individuals whose fitness will be evaluated.
+        :param seeds: Seeds for the game instances (one for each individual).
+        :return: Fitnesses of the individuals (tuples for Deap library).
         """
-        for i in range(len(individual)):
-            if (np.random.random() < mutindpb):
-                individual[i] = np.random.random()
-        return individual,
+        if self.evaluator is not None:
+            return self.evaluator.evaluate(individuals, seeds)
+        if not self.lockstep:
+            return toolbox.map(toolbox.evaluate, individuals, seeds)
+
+        models = [self.model.get_new_instance(weights=individual, game_config=self.game_config)
+                  for individual in individuals]
+        population = self.model.get_population(models)
+        game_class = utils.miscellaneous.get_game_class(self.current_game)
+        results = game_class.run_lockstep(population, self.evolution_params._game_batch_size, seeds)
+        return [(result,) for result in results]
 
     def init_individual(self, icls, length, content=None):
         """
@@ -85,6 +119,8 @@ class Evolution():
         :param content: Content of the individual (or None).
         :return: Randomly initialized individual.
         """
+        if issubclass(icls, np.ndarray):
+            return icls(np.random.random(length) if content is None else content)
         if content is None:
             return icls([np.random.random() for _ in range(length)])
         return icls(content)
@@ -101,13 +137,12 @@ class Evolution():
         if file_name is None:
             return container(ind_init() for _ in range(pop_size))
 
-        with open(file_name) as f:
-            content = json.load(f)
-            pop = content["population"]
-            if len(pop) != pop_size:
-                raise ValueError("Wrong population size.")
-            print(f"Loading population from file: {file_name}")
-            return container(ind_init(content=x) for x in pop)
+        content = utils.model_files.read_model(file_name, mmap=False)
+        pop = content["population"]
+        if len(pop) != pop_size:
+            raise ValueError("Wrong population size.")
+        print(f"Loading population from file: {file_name}")
+        return container(ind_init(content=np.asarray(x).tolist()) for x in pop)
 
     def deap_toolbox_init(self):
         """
@@ -117,7 +152,8 @@ class Evolution():
         self.individual_len = self.model.get_number_of_parameters(self.current_game)
 
         creator.create("FitnessMax", base.Fitness, weights=(1.0,))
-        creator.create("Individual", list, fitness=creator.FitnessMax)
+        creator.create("Individual", variation.ArrayIndividual, fitness=creator.FitnessMax,
+                       gene_type=self.get_gene_type())
 
         toolbox = base.Toolbox()
         toolbox.register("attr_float", np.random.random)
@@ -125,14 +161,27 @@ class Evolution():
         toolbox.register("population", self.init_population, container=list, ind_init=toolbox.individual)
 
         toolbox.register("evaluate", self.eval_fitness)
-        toolbox.register("mate", tools.cxUniform, indpb=self.evolution_params.cxindpb)
+
+        # variation operators work on offspring matrices (one row per individual)
+        cx_name = self.evolution_params.crossover[0]
+        if cx_name == "uniform":
+            toolbox.register("mate", variation.cx_uniform, indpb=self.evolution_params.cxindpb)
+        elif cx_name == "blend":
+            toolbox.register("mate", variation.cx_blend, alpha=self.evolution_params.crossover[1])
+        else:
+            raise NotImplementedError
 
         mut_name = self.evolution_params.mut[0]
         if mut_name == "uniform":
-            toolbox.register("mutate", self.mut_random, mutindpb=self.evolution_params.mut[2])
+            toolbox.register("mutate", variation.mut_uniform, indpb=self.evolution_params.mut[2])
+        elif mut_name == "gaussian":
+            toolbox.register("mutate", variation.mut_gaussian, indpb=self.evolution_params.mut[2],
+                             sigma=self.evolution_params.mut[3])
+        elif mut_name == "reset":
+            toolbox.register("mutate", variation.mut_reset, indpb=self.evolution_params.mut[2],
+                             low=self.evolution_params.mut[3], high=self.evolution_params.mut[4])
         else:
             raise NotImplementedError
-            # toolbox.register("mutate", tools.mutGaussian, mu=0.5, sigma=0.05, indpb=0.05)
 
         sel = self.evolution_params.selection[0]
         if sel == "tournament":
@@ -142,10 +191,36 @@ class Evolution():
         else:
             raise NotImplementedError
 
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
-        toolbox.register("map", executor.map)
+        self.init_map(toolbox)
         return toolbox
 
+    def get_gene_type(self):
+        """
+        Returns a type of genes of array-backed individuals: the computation type of the model precision, so
+        individuals are weights of model instances without a conversion (float16 models keep float32 genes, small
+        mutations would be rounded away in float16).
+        :return: NumPy dtype of genes.
+        """
+        return np.dtype(get_precision(getattr(self.model, "precision", "float64"))[1])
+
+    def init_map(self, toolbox):
+        """
+        Initializes the evaluation backend: registers the 'map' of a thread pool to the toolbox, or starts a pool of
+        processes (used by 'eval_population').
+        :param toolbox: Deap toolbox.
+        """
+        if self.pool == "process":
+            self.evaluator = ProcessPoolEvaluator(self.current_game, self.model,
+                                                  self.evolution_params._game_batch_size,
+                                                  self.evolution_params.pop_size,
+                                                  self.model.get_number_of_parameters(self.current_game),
+                                                  self.max_workers, self.get_gene_type())
+            return
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers,
+                                                         initializer=utils.resources.init_worker)
+        toolbox.register("map", executor.map)
+
     def create_log_files(self, dir, pop, log, elapsed_time):
         """
         Creates a log files of the current population. Also creates a plot.
@@ -157,9 +232,7 @@ class Evolution():
         if not os.path.exists(dir):
             os.makedirs(dir)
 
-        with open(f"{dir}/pop.json", "w") as f:
-            data = {"population": pop}
-            f.write(json.dumps(data))
+        utils.model_files.write_arrays(f"{dir}/pop.json", {}, {"population": pop})
 
         with open(f"{dir}/logbook.txt", "w") as f:
             f.write(str(log))
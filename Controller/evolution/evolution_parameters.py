@@ -32,6 +32,7 @@ class EvolutionaryAlgorithmParameters(EvolutionParameters):
             data["hof_size"],
             data["elite"],
             data["selection"],
+            data.get("crossover", ("uniform",)),
         )
 
     def __init__(self,
@@ -43,7 +44,17 @@ class EvolutionaryAlgorithmParameters(EvolutionParameters):
                  cxindpb,
                  hof_size,
                  elite,
-                 selection):
+                 selection,
+                 crossover=("uniform",)):
+        """
+        Initializes a new instance of EvolutionaryAlgorithmParameters.
+        :param mut: Mutation, tuple (name, probability of mutation of an individual, probability of mutation of a
+        gene, parameters...): ("uniform", p, indpb) - genes reset to [0, 1), ("gaussian", p, indpb, sigma) - Gaussian
+        noise added to genes, ("reset", p, indpb, low, high) - genes reset to [low, high).
+        :param cxindpb: Probability of a swap of a gene by the uniform crossover.
+        :param crossover: Crossover, ("uniform",) - genes swapped with probability 'cxindpb', or ("blend", alpha) -
+        blend crossover (BLX-alpha).
+        """
         self._pop_size = pop_size
         self._cxpb = cxpb
         self._mut = mut
@@ -53,6 +64,7 @@ class EvolutionaryAlgorithmParameters(EvolutionParameters):
         self._hof_size = hof_size
         self._elite = elite
         self._selection = selection
+        self._crossover = crossover
 
     @property
     def pop_size(self):
@@ -90,6 +102,10 @@ class EvolutionaryAlgorithmParameters(EvolutionParameters):
     def selection(self):
         return self._selection
 
+    @property
+    def crossover(self):
+        return self._crossover
+
     def to_dictionary(self):
         """
         Converts current object to json-style dictionary.
@@ -105,6 +121,7 @@ class EvolutionaryAlgorithmParameters(EvolutionParameters):
             "hof_size": self._hof_size,
             "elite": self._elite,
             "selection": self._selection,
+            "crossover": self._crossover,
         }
 
     def to_string(self):
@@ -112,7 +129,7 @@ class EvolutionaryAlgorithmParameters(EvolutionParameters):
         Returns a string representation of the current object.
         :return: a string representation of the current object.
         """
-        return f"pop_size: {self.pop_size}, xover: {self.cxpb}/{self.cxindpb}, mut: {self.mut}, hof: {self.hof_size}, elite: {self.elite}, sel: {self.selection}"
+        return f"pop_size: {self.pop_size}, xover: {self.crossover[0]} {self.cxpb}/{self.cxindpb}, mut: {self.mut}, hof: {self.hof_size}, elite: {self.elite}, sel: {self.selection}"
 
 
 class EvolutionStrategyParameters(EvolutionParameters):
@@ -2,12 +2,11 @@ from evolution.evolution import Evolution
 from deap import tools, creator, base, cma
 import time
 import numpy as np
-import concurrent.futures
 
 
 class EvolutionStrategy(Evolution):
-    def __init__(self, game, evolution_params, model, max_workers=2, logs_every=50):
-        super(EvolutionStrategy, self).__init__(game, evolution_params, model, max_workers, logs_every)
+    def __init__(self, game, evolution_params, model, max_workers=2, logs_every=50, lockstep=False, pool="thread"):
+        super(EvolutionStrategy, self).__init__(game, evolution_params, model, max_workers, logs_every, lockstep, pool)
 
     def run(self, file_name=None):
         """
@@ -27,8 +26,7 @@ class EvolutionStrategy(Evolution):
         creator.create("Individual", list, fitness=creator.FitnessMax)
 
         toolbox = base.Toolbox()
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
-        toolbox.register("map", executor.map)
+        self.init_map(toolbox)
         toolbox.register("evaluate", self.eval_fitness)
 
         logbook = tools.Logbook()
@@ -59,7 +57,7 @@ class EvolutionStrategy(Evolution):
 
             # Evaluate the individuals
             seeds = [np.random.randint(0, 2 ** 16) for _ in range(len(population))]
-            fitnesses = toolbox.map(toolbox.evaluate, population, seeds)
+            fitnesses = self.eval_population(toolbox, population, seeds)
             for ind, fit in zip(population, fitnesses):
                 ind.fitness.values = fit
 
@@ -5,8 +5,9 @@ from deap import tools
 
 
 class EvolutionaryAlgorithm(Evolution):
-    def __init__(self, game, evolution_params, model, max_workers=2, logs_every=50):
-        super(EvolutionaryAlgorithm, self).__init__(game, evolution_params, model, max_workers, logs_every)
+    def __init__(self, game, evolution_params, model, max_workers=2, logs_every=50, lockstep=False, pool="thread"):
+        super(EvolutionaryAlgorithm, self).__init__(game, evolution_params, model, max_workers, logs_every, lockstep,
+                                                    pool)
 
     def run(self, file_name=None):
         """
@@ -29,14 +30,14 @@ class EvolutionaryAlgorithm(Evolution):
         logbook.header = ['gen', 'nevals'] + (stats.fields if stats else [])
 
         if (self.evolution_params.hof_size > 0):
-            halloffame = tools.HallOfFame(self.evolution_params.hof_size)
+            halloffame = tools.HallOfFame(self.evolution_params.hof_size, similar=np.array_equal)
         else:
             halloffame = None
 
         # invalid_ind = [ind for ind in population if not ind.fitness.valid]
         invalid_ind = population
         seeds = [np.random.randint(0, 2 ** 16) for _ in range(len(invalid_ind))]
-        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind, seeds)
+        fitnesses = self.eval_population(toolbox, invalid_ind, seeds)
         for ind, fit in zip(invalid_ind, fitnesses):
             ind.fitness.values = fit
 
@@ -52,20 +53,19 @@ class EvolutionaryAlgorithm(Evolution):
         # Begin the generational process
         for gen in range(1, self.evolution_params.ngen + 1):
 
-            # Select the next generation individuals
+            # Select the next generation individuals (offspring matrix - copies of the selected individuals)
             offspring = toolbox.select(population, len(population) - self.evolution_params.elite)
-            offspring = [toolbox.clone(ind) for ind in offspring]
+            matrix = np.array(offspring, dtype=offspring[0].dtype).reshape(len(offspring), -1)
 
-            # Apply crossover and mutation on the offspring
-            for i in range(1, len(offspring), 2):
-                if np.random.random() < self.evolution_params.cxpb:
-                    offspring[i - 1], offspring[i] = toolbox.mate(offspring[i - 1], offspring[i])
-                    del offspring[i - 1].fitness.values, offspring[i].fitness.values
+            # Apply crossover on pairs of neighbours and mutation on the offspring (all at once)
+            pairs = 2 * np.flatnonzero(np.random.random(len(matrix) // 2) < self.evolution_params.cxpb)
+            matrix[pairs], matrix[pairs + 1] = toolbox.mate(matrix[pairs], matrix[pairs + 1])
 
-            for i in range(len(offspring)):
-                if np.random.random() < self.evolution_params.mut[1]:
-                    offspring[i], = toolbox.mutate(offspring[i])
-                    del offspring[i].fitness.values
+            mutants = np.flatnonzero(np.random.random(len(matrix)) < self.evolution_params.mut[1])
+            matrix[mutants] = toolbox.mutate(matrix[mutants])
+
+            # New individuals (with invalid fitness)
+            offspring = [toolbox.individual(content=genes) for genes in matrix]
 
             # Add elite individuals (they lived through mutation and x-over)
             offspring.extend(
@@ -75,7 +75,7 @@ class EvolutionaryAlgorithm(Evolution):
             # invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
             invalid_ind = offspring
             seeds = [np.random.randint(0, 2 ** 16) for _ in range(len(invalid_ind))]
-            fitnesses = toolbox.map(toolbox.evaluate, invalid_ind, seeds)
+            fitnesses = self.eval_population(toolbox, invalid_ind, seeds)
             for ind, fit in zip(invalid_ind, fitnesses):
                 ind.fitness.values = fit
 
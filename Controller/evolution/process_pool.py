@@ -0,0 +1,177 @@
+"""
+Process-pool evaluation of fitness. Games like 2048 are pure-Python CPU work, so evaluation threads mostly contend for
+the GIL; workers of the process pool run in parallel. The population is a matrix in shared memory (one row per
+individual), every worker loads the game configuration, the model template and its reservoir (Echo-State models) once,
+in its initializer, and tasks pass only row indices and seeds.
+Models must be picklable (the template is sent to workers when they start).
+"""
+import concurrent.futures
+import weakref
+from multiprocessing import shared_memory
+import numpy as np
+
+from utils.miscellaneous import get_game_config, get_game_instance
+
+# evaluator of the current worker process (see 'init_worker')
+worker = None
+
+
+class SharedPopulation():
+    """
+    Population matrix (one row per individual) in shared memory.
+    """
+
+    @staticmethod
+    def create(rows, columns, dtype=np.float64):
+        """
+        Creates a new population matrix (parent side).
+        :param rows: Maximum number of individuals.
+        :param columns: Length of an individual.
+        :param dtype: Type of genes.
+        :return: A new instance of SharedPopulation.
+        """
+        dtype = np.dtype(dtype)
+        memory = shared_memory.SharedMemory(create=True, size=max(1, dtype.itemsize * rows * columns))
+        return SharedPopulation(memory, rows, columns, dtype, owner=True)
+
+    @staticmethod
+    def attach(arguments):
+        """
+        Attaches to an existing population matrix (worker side).
+        :param arguments: Arguments created by 'get_arguments' of the parent side.
+        :return: A new instance of SharedPopulation.
+        """
+        name, rows, columns, dtype = arguments
+        return SharedPopulation(shared_memory.SharedMemory(name=name), rows, columns, dtype)
+
+    def __init__(self, memory, rows, columns, dtype=np.float64, owner=False):
+        """
+        Initializes a new instance of SharedPopulation (use 'create' or 'attach').
+        :param memory: Shared memory block.
+        :param rows: Maximum number of individuals.
+        :param columns: Length of an individual.
+        :param dtype: Type of genes.
+        :param owner: Indicates whether this side created the block (and removes it on close).
+        """
+        self.memory = memory
+        self.rows = rows
+        self.columns = columns
+        self.owner = owner
+        self.matrix = np.ndarray((rows, columns), dtype=dtype, buffer=memory.buf)
+
+    def get_arguments(self):
+        """
+        Returns arguments for 'attach' (picklable).
+        """
+        return self.memory.name, self.rows, self.columns, self.matrix.dtype.str
+
+    def write(self, individuals):
+        """
+        Writes individuals to the first rows of the matrix.
+        :param individuals: Individuals (lists or arrays of the individual length).
+        """
+        if len(individuals) > self.rows:
+            raise ValueError(f"Population of {len(individuals)} individuals does not fit {self.rows} rows.")
+        for row, individual in zip(self.matrix, individuals):
+            row[:] = individual
+
+    def close(self):
+        """
+        Closes the block (the owner also removes it).
+        """
+        self.matrix = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+class Worker():
+    """
+    Evaluator of a single worker process.
+    """
+
+    def __init__(self, game, model, game_batch_size, population_arguments):
+        """
+        Initializes a new instance of Worker.
+        :param game: Game to be played.
+        :param model: Model template (creates instances for individuals).
+        :param game_batch_size: Number of games played by an individual.
+        :param population_arguments: Arguments of the shared population matrix.
+        """
+        self.game = game
+        self.model = model
+        self.game_batch_size = game_batch_size
+        self.game_config = get_game_config(game)
+        self.population = SharedPopulation.attach(population_arguments)
+        # an instance with zero weights initializes the reservoir of Echo-State models (once per worker)
+        self.instance = model.get_new_instance(np.zeros(self.population.columns, dtype=self.population.matrix.dtype),
+                                               self.game_config)
+
+    def eval_fitness(self, row, seed):
+        """
+        Evaluates a fitness of the individual in the specified row of the population matrix.
+        :param row: Row of the individual.
+        :param seed: Seed for the game instance.
+        :return: Fitness of the individual (tuple for Deap library).
+        """
+        # weights are a view of the shared row (valid until the parent writes the next population)
+        model = self.model.get_new_instance(weights=self.population.matrix[row], game_config=self.game_config)
+        game = get_game_instance(self.game, [model, self.game_batch_size, seed])
+        return game.run(),
+
+
+def init_worker(game, model, game_batch_size, population_arguments):
+    """
+    Initializer of worker processes.
+    """
+    global worker
+    worker = Worker(game, model, game_batch_size, population_arguments)
+
+
+def eval_row(row, seed):
+    """
+    Task of worker processes (evaluates a single row of the population matrix).
+    """
+    return worker.eval_fitness(row, seed)
+
+
+class ProcessPoolEvaluator():
+    """
+    Evaluates populations by a pool of worker processes.
+    """
+
+    def __init__(self, game, model, game_batch_size, pop_size, individual_len, max_workers, dtype=np.float64):
+        """
+        Initializes a new instance of ProcessPoolEvaluator (starts the worker processes).
+        :param game: Game to be played.
+        :param model: Model template.
+        :param game_batch_size: Number of games played by an individual.
+        :param pop_size: Maximum number of individuals evaluated at once.
+        :param individual_len: Length of an individual.
+        :param max_workers: Number of worker processes.
+        :param dtype: Type of genes (the computation type of the model avoids conversions of the weights in workers).
+        """
+        self.population = SharedPopulation.create(pop_size, individual_len, dtype)
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers, initializer=init_worker,
+            initargs=(game, model, game_batch_size, self.population.get_arguments()))
+        weakref.finalize(self, ProcessPoolEvaluator.shutdown, self.executor, self.population)
+
+    @staticmethod
+    def shutdown(executor, population):
+        """
+        Stops the worker processes and removes the population matrix.
+        """
+        executor.shutdown(wait=True)
+        population.close()
+
+    def evaluate(self, individuals, seeds):
+        """
+        Evaluates fitness of the specified individuals.
+        :param individuals: Individuals whose fitness will be evaluated.
+        :param seeds: Seeds for the game instances (one for each individual).
+        :return: Fitnesses of the individuals (tuples for Deap library).
+        """
+        self.population.write(individuals)
+        # results are collected before the next population overwrites the rows
+        return list(self.executor.map(eval_row, range(len(individuals)), seeds))
@@ -0,0 +1,96 @@
+"""
+NumPy array-backed individuals and vectorized variation operators. Operators work on whole offspring matrices (one
+row per individual) instead of walking individuals gene by gene in Python, so their cost does not grow with Python
+overhead of large genomes (MLP and Echo-State readouts).
+"""
+import copy
+import numpy as np
+
+
+class ArrayIndividual(np.ndarray):
+    """
+    Base class of array-backed individuals (float vector), use as the base of 'creator.Individual'. Unlike DEAP's
+    default NumPy support, individuals are created from arrays without converting genes to Python floats. Type of genes
+    is the class attribute 'gene_type' (float64 by default, e.g. 'creator.create(..., gene_type=np.dtype("float32"))'
+    matches models of float32 precision, which then use individuals as their weights without a copy).
+    """
+    gene_type = np.dtype(np.float64)
+
+    def __new__(cls, content):
+        return np.array(content, dtype=cls.gene_type).view(cls)
+
+    def __deepcopy__(self, memo):
+        # copies the genes and the fitness (deepcopy of ndarray subclasses drops their attributes)
+        clone = np.ndarray.copy(self)
+        clone.__dict__.update(copy.deepcopy(self.__dict__, memo))
+        return clone
+
+    def __reduce__(self):
+        return self.__class__, (np.asarray(self),), self.__dict__
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+def cx_uniform(parents1, parents2, indpb):
+    """
+    Uniform crossover of pairs of individuals: genes of a pair are swapped with the specified probability.
+    :param parents1: First parents (matrix, one row per pair).
+    :param parents2: Second parents (matrix of the same shape).
+    :param indpb: Probability of a swap of a single gene.
+    :return: Tuple of children matrices.
+    """
+    swap = np.random.random(parents1.shape) < indpb
+    return np.where(swap, parents2, parents1), np.where(swap, parents1, parents2)
+
+
+def cx_blend(parents1, parents2, alpha):
+    """
+    Blend crossover (BLX-alpha) of pairs of individuals: children genes are random blends of the parent genes,
+    which may lie up to 'alpha' times the distance of the parent genes outside of their interval.
+    :param parents1: First parents (matrix, one row per pair).
+    :param parents2: Second parents (matrix of the same shape).
+    :param alpha: Extent of the interval of children genes.
+    :return: Tuple of children matrices.
+    """
+    gamma = (1.0 + 2.0 * alpha) * np.random.random(parents1.shape) - alpha
+    difference = gamma * (parents2 - parents1)
+    return parents1 + difference, parents2 - difference
+
+
+def mut_reset(individuals, indpb, low=0.0, high=1.0):
+    """
+    Reset mutation: genes are replaced by random values from the uniform distribution.
+    :param individuals: Individuals to mutate (matrix, modified in place).
+    :param indpb: Probability of mutation of a single gene.
+    :param low: Lower bound of new values.
+    :param high: Upper bound of new values.
+    :return: Mutated individuals.
+    """
+    mask = np.random.random(individuals.shape) < indpb
+    individuals[mask] = np.random.uniform(low, high, np.count_nonzero(mask))
+    return individuals
+
+
+def mut_uniform(individuals, indpb):
+    """
+    Uniform mutation: genes are replaced by random values from [0, 1) (as the initial population).
+    :param individuals: Individuals to mutate (matrix, modified in place).
+    :param indpb: Probability of mutation of a single gene.
+    :return: Mutated individuals.
+    """
+    return mut_reset(individuals, indpb, 0.0, 1.0)
+
+
+def mut_gaussian(individuals, indpb, sigma, mu=0.0):
+    """
+    Gaussian mutation: Gaussian noise is added to genes.
+    :param individuals: Individuals to mutate (matrix, modified in place).
+    :param indpb: Probability of mutation of a single gene.
+    :param sigma: Standard deviation of the noise.
+    :param mu: Mean of the noise.
+    :return: Mutated individuals.
+    """
+    mask = np.random.random(individuals.shape) < indpb
+    individuals[mask] += np.random.normal(mu, sigma, np.count_nonzero(mask))
+    return individuals
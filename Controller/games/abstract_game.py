@@ -1,14 +1,26 @@
-import os
+import subprocess
+import utils.resources
+from constants import ACTION_PRECISION, ACTION_INTEGER_DIGITS, GAME_LOGS_DIR, GAME_LOG_MAX_BYTES, KEEP_GAME_LOGS
+from games.action_encoder import ActionEncoder
+from games.protocol_channel import ProtocolChannel, LogDrain
+from games.state_decoder import StateDecoder
 
 
 class AbstractGame():
     """ Basic wrapper for every game used."""
+    # indicates whether the game runs in the controller process (no game subprocess, ports or other shared resources)
+    in_process = False
 
     def __init__(self):
         self.process = None
         self.model = None
         self.score = None
         self.score_extended = None
+        self.action_precision = ACTION_PRECISION
+        self.action_encoder = None
+        self.channel = None
+        self.protocol_channel = None
+        self.log_drains = []
 
     def run(self, advanced_results=False):
         """
@@ -18,6 +30,7 @@ class AbstractGame():
         :return: Game result.
         """
         state, current_phase = self.init_process()
+        self.model.reset_state()
         while True:
             result = self.model.evaluate(state, current_phase)
 
@@ -54,6 +67,75 @@ class AbstractGame():
         """
         raise NotImplementedError
 
+    @staticmethod
+    def get_config_value(game_config_file, key, default):
+        """
+        Returns a value of the game configuration (configuration files are loaded only once).
+        :param game_config_file: Game configuration file.
+        :param key: Key of the value.
+        :param default: Value used if the configuration does not contain the key.
+        :return: Value of the game configuration.
+        """
+        StateDecoder.from_config_file(game_config_file)
+        return StateDecoder.configs[game_config_file].get(key, default)
+
+    @staticmethod
+    def get_action_precision(game_config_file):
+        """
+        Returns a number of digits after the decimal point of actions sent to the game: 'action_precision' of the game
+        configuration (ACTION_PRECISION if the configuration does not contain it).
+        :param game_config_file: Game configuration file.
+        """
+        return int(AbstractGame.get_config_value(game_config_file, "action_precision", ACTION_PRECISION))
+
+    @staticmethod
+    def get_separate_protocol(game_config_file, separate_protocol=None):
+        """
+        Determines whether the game uses a separate protocol channel (see 'start_process').
+        :param game_config_file: Game configuration file.
+        :param separate_protocol: Value requested by the caller, None to use 'separate_protocol' of the game
+        configuration (false if the configuration does not contain it).
+        :return: True if the game uses a separate protocol channel.
+        """
+        if separate_protocol is not None:
+            return separate_protocol
+        return bool(AbstractGame.get_config_value(game_config_file, "separate_protocol", False))
+
+    def start_process(self, command, separate_protocol=False):
+        """
+        Starts the game subprocess. Actions are written to its standard input.
+        :param command: Command (or list of arguments) to start the subprocess.
+        :param separate_protocol: If true, the game writes protocol messages to a separate channel (see
+        ProtocolChannel) and its stdout/stderr are drained into bounded log files. Otherwise, protocol messages are
+        read from the standard output of the game.
+        """
+        command = utils.resources.get_child_command(command)
+        if not separate_protocol:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=-1)
+            return
+
+        self.protocol_channel = ProtocolChannel()
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                        bufsize=-1, env=self.protocol_channel.get_environment())
+        log_name = f"{GAME_LOGS_DIR}/{type(self).__name__.lower()}_{self.process.pid}"
+        self.log_drains = [LogDrain(self.process.stdout, f"{log_name}.out.log", GAME_LOG_MAX_BYTES),
+                           LogDrain(self.process.stderr, f"{log_name}.err.log", GAME_LOG_MAX_BYTES)]
+
+    def read_protocol_line(self):
+        """
+        Reads the next json line of the game protocol, skipping all non-json outputs (logs) of the game.
+        :return: Next protocol line (bytes).
+        """
+        if self.protocol_channel is not None:
+            return self.protocol_channel.read_frame(alive=lambda: self.process.poll() is None)
+
+        line = b" "
+        while line[0] != ord('{'):
+            line = self.process.stdout.readline()
+            if not line:
+                raise EOFError("Game process has closed its standard output.")
+        return line
+
     def get_process_data(self):
         """
         Gets a next data chunk from the game. Implementations are in child classes.
@@ -63,12 +145,18 @@ class AbstractGame():
 
     def send_to_process(self, input):
         """
-        Sends the specified data to subprocess with the game.
-        :param data: Data to be send.
+        Sends the specified data to subprocess with the game. Data are formatted into a reused buffer, using
+        'action_precision' digits after the decimal point (set by games from their configuration, see
+        'get_action_precision').
+        :param input: Data to be send (list or NumPy array of numbers).
         """
-        data = "".join(f"{str(x)} " for x in input)
-        data = f"{data}{os.linesep}"
-        self.process.stdin.write(bytearray(data.encode('ascii')))
+        if self.channel is not None:
+            self.channel.write_action(input)
+            return
+
+        if self.action_encoder is None or self.action_encoder.precision != self.action_precision:
+            self.action_encoder = ActionEncoder(len(input), self.action_precision, ACTION_INTEGER_DIGITS)
+        self.process.stdin.write(self.action_encoder.encode(input))
         self.process.stdin.flush()
 
     def finalize(self, internal_error=False):
@@ -77,3 +165,21 @@ class AbstractGame():
         :param internal_error: Determines whether the internal error occured.
         """
         self.process.kill()
+        self.close_channel(keep_logs=internal_error)
+
+    def close_channel(self, keep_logs=False):
+        """
+        Closes the shared-memory channel or the protocol channel with the game (if used). Call after the game process
+        has been killed.
+        :param keep_logs: If true, log files of the game are kept (also kept if KEEP_GAME_LOGS is set).
+        """
+        if self.channel is not None:
+            self.channel.close()
+            self.channel = None
+        if self.protocol_channel is not None:
+            self.protocol_channel.close()
+            self.protocol_channel = None
+        if not (keep_logs or KEEP_GAME_LOGS):
+            for drain in self.log_drains:
+                drain.remove()
+        self.log_drains = []
@@ -0,0 +1,118 @@
+import os
+import numpy as np
+
+
+class ActionEncoder():
+    """
+    Encodes numeric actions into ASCII lines with a fixed precision, ready to be written to a game subprocess.
+    Short actions (all the current games) are formatted by a precompiled bytes template, one per action size. Long
+    actions are written as fixed-width fields '[sign or 0][integer digits].[fraction digits] ' into a reused buffer
+    by a few NumPy ufuncs; there the per-call overhead of NumPy pays off. Values that do not fit into the fixed
+    field (too large, NaN, inf) are formatted by the original string path.
+    """
+
+    def __init__(self, size, precision=6, integer_digits=4, vectorized_threshold=256):
+        """
+        Initializes a new instance of ActionEncoder.
+        :param size: Expected number of values in a single action (buffers grow if a longer action comes).
+        :param precision: Number of digits after the decimal point.
+        :param integer_digits: Number of digits before the decimal point (vectorized path only).
+        :param vectorized_threshold: Actions of at least this size are encoded into the reused NumPy buffer.
+        """
+        self.precision = precision
+        self.integer_digits = integer_digits
+        self.vectorized_threshold = vectorized_threshold
+        self.templates = {}
+
+        self.width = integer_digits + precision + 3  # sign, dot and separating space
+        self.linesep = np.frombuffer(os.linesep.encode('ascii'), dtype=np.uint8)
+        self.limit = 10 ** (integer_digits + precision)
+        self.scale = float(10 ** precision)
+
+        # powers of ten for extraction of all digits of the scaled (fixed point) value
+        self.powers = 10 ** np.arange(integer_digits + precision - 1, -1, -1, dtype=np.int64)
+        self.size = 0
+        if size >= vectorized_threshold:
+            self.allocate(size)
+
+    def allocate(self, size):
+        """
+        Allocates buffers of the vectorized path for actions of the specified size.
+        :param size: Maximum number of values in a single action.
+        """
+        self.size = size
+        self.buffer = np.empty(size * self.width + len(self.linesep), dtype=np.uint8)
+        self.fields = self.buffer[:size * self.width].reshape(size, self.width)
+        self.fields[:, 1 + self.integer_digits] = ord('.')
+        self.fields[:, -1] = ord(' ')
+
+        self.values = np.empty(size, dtype=np.float64)
+        self.negative = np.empty(size, dtype=bool)
+        self.fixed_point = np.empty(size, dtype=np.int64)
+        self.digits = np.empty((size, len(self.powers)), dtype=np.int64)
+
+    def encode(self, action):
+        """
+        Encodes the specified action (list or NumPy array of numbers).
+        :param action: Action to encode.
+        :return: Bytes-like object with the encoded line (a view is valid until the next call of 'encode').
+        """
+        n = len(action)
+        if n < self.vectorized_threshold:
+            template = self.templates.get(n)
+            if template is None:
+                template = (b"%." + str(self.precision).encode('ascii') + b"f ") * n + os.linesep.encode('ascii')
+                self.templates[n] = template
+            values = action.tolist() if isinstance(action, np.ndarray) else action
+            return template % tuple(values)
+
+        return self.encode_vectorized(np.asarray(action))
+
+    def encode_vectorized(self, action):
+        """
+        Encodes the specified action (NumPy array) into the reused buffer.
+        :param action: Action to encode.
+        :return: Memory view of the encoded line (valid until the next call of 'encode').
+        """
+        n = len(action)
+        if n > self.size:
+            self.allocate(n)
+
+        values = self.values[:n]
+        np.multiply(action, self.scale, out=values)
+        np.rint(values, out=values)
+        if not np.all(np.abs(values) < self.limit):
+            # Out of the fixed field (or not finite), fall back to the string formatting
+            return self.encode_as_string(action)
+
+        fixed_point = self.fixed_point[:n]
+        negative = self.negative[:n]
+        digits = self.digits[:n]
+        fields = self.fields[:n]
+
+        np.signbit(values, out=negative)
+        np.abs(values, out=values)
+        fixed_point[...] = values
+        np.floor_divide(fixed_point[:, np.newaxis], self.powers, out=digits)
+        np.remainder(digits, 10, out=digits)
+        np.add(digits, ord('0'), out=digits)
+
+        fields[:, 0] = ord('0')
+        np.copyto(fields[:, 0], ord('-'), where=negative)
+        fields[:, 1:1 + self.integer_digits] = digits[:, :self.integer_digits]
+        fields[:, 2 + self.integer_digits:-1] = digits[:, self.integer_digits:]
+
+        end = n * self.width
+        self.buffer[end:end + len(self.linesep)] = self.linesep
+        return memoryview(self.buffer)[:end + len(self.linesep)]
+
+    @staticmethod
+    def encode_as_string(action):
+        """
+        Encodes the specified action using string formatting (the original protocol encoding).
+        :param action: Action to encode.
+        :return: Encoded bytes.
+        """
+        data = "".join(f"{str(x)} " for x in action)
+        data = f"{data}{os.linesep}"
+        return bytearray(data.encode('ascii'))
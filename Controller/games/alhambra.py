@@ -1,8 +1,9 @@
 from games.abstract_game import AbstractGame
+from games.state_decoder import StateDecoder
 import subprocess
+import utils.resources
 from constants import *
 import platform
-import json
 
 
 class Alhambra(AbstractGame):
@@ -23,6 +24,8 @@ class Alhambra(AbstractGame):
         self.model = model
         self.game_batch_size = game_batch_size
         self.seed = seed
+        self.state_decoder = StateDecoder.from_config_file(ALHAMBRA_CONFIG_FILE)
+        self.action_precision = self.get_action_precision(ALHAMBRA_CONFIG_FILE)
 
     def init_process(self):
         """
@@ -31,8 +34,8 @@ class Alhambra(AbstractGame):
         windows = platform.system() == "Windows"
         params = [ALHAMBRA, str(self.seed), str(self.game_batch_size)]
         command = "{} {} {}".format(*params) if windows else ["mono"] + params
-        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
-                                        bufsize=-1)  # Using PIPEs is not the best solution...
+        self.process = subprocess.Popen(utils.resources.get_child_command(command), stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, bufsize=-1)  # Using PIPEs is not the best solution...
 
         data = self.get_process_data()
         return data["state"], data["current_phase"]
@@ -42,5 +45,5 @@ class Alhambra(AbstractGame):
         Gets a subprocess next data (line).
         :return: a subprocess next data (line).
         """
-        line = self.process.stdout.readline().decode('ascii')
-        return json.loads(line)
+        line = self.process.stdout.readline()
+        return self.state_decoder.decode(line)
@@ -9,6 +9,7 @@ class Game2048(AbstractGame):
     """
     Represents a single 2048 game.
     """
+    in_process = True
 
     def __init__(self, model, game_batch_size, seed, test=False):
         """
@@ -45,6 +46,7 @@ class Game2048(AbstractGame):
         score_total = 0
         for _ in range(self.game_batch_size):
             state, phase = self.init_process()
+            self.model.reset_state()
             while not self.game.end:
                 result = self.model.evaluate(state, phase)
                 result = np.argsort(np.array(result))[::-1]
@@ -64,6 +66,55 @@ class Game2048(AbstractGame):
 
         return score_total / self.game_batch_size
 
+    @staticmethod
+    def run_lockstep(population, game_batch_size, seeds):
+        """
+        Runs games of a whole population in lockstep: in every step, states of all running games are stacked and
+        evaluated by a single call of the population model. When at most half of the evaluated games are still
+        running, the population keeps only models of the running games (see 'keep'), so ended games cost nothing.
+        :param population: Population model (e.g. 'MLP.MLPPopulation'), its i-th model plays with the i-th seed.
+        :param game_batch_size: Number of games played by every model. Result is averaged.
+        :param seeds: Random seeds of games (one for each model of the population).
+        :return: List of game results (one for each model).
+        """
+        games = [Game2048(None, game_batch_size, seed) for seed in seeds]
+        scores = np.zeros(len(games))
+        states = None
+        for _ in range(game_batch_size):
+            for i, game in enumerate(games):
+                state, phase = game.init_process()
+                if states is None:
+                    states = np.zeros((len(games), len(state)))
+                states[i] = state
+            active = np.arange(len(games))
+            population.keep(active)
+            population.reset_state()
+
+            running = list(range(len(games)))
+            while running:
+                if 2 * len(running) <= len(active):
+                    active = np.array(running)
+                    population.keep(active)
+                results = population.evaluate(states[active], phase)
+                still_running = []
+                for j, i in enumerate(active):
+                    game = games[i].game
+                    if game.end:
+                        continue
+                    for a in np.argsort(results[j])[::-1]:
+                        moved, _ = game.move(a)
+                        if moved:
+                            break
+
+                    if game.end:
+                        scores[i] += game.score
+                    else:
+                        states[i] = game.get_state()
+                        still_running.append(i)
+                running = still_running
+
+        return (scores / game_batch_size).tolist()
+
     def log_statistics(self):
         """
         Logs statistics of games that have run (statistics of 'game-batch-size' games).
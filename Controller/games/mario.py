@@ -1,7 +1,6 @@
 from games.abstract_game import AbstractGame
-import subprocess
+from games.state_decoder import StateDecoder
 from constants import *
-import json
 import platform
 
 
@@ -10,7 +9,8 @@ class Mario(AbstractGame):
     Represents a single Mario game.
     """
 
-    def __init__(self, model, game_batch_size, seed, level=None, vis_on=False, use_visualization_tool=False, test=False):
+    def __init__(self, model, game_batch_size, seed, level=None, vis_on=False, use_visualization_tool=False, test=False,
+                 separate_protocol=None):
         """
         Initializes a new instance of Mario game.
         :param model: Model which will be playing this game.
@@ -23,6 +23,9 @@ class Mario(AbstractGame):
         use_visualization_tool set to true.
         :param use_visualization_tool: Determines whether use specific visualization tool. Starts different subprocess.
         :param test: Indicates whether the game is in testing mode.
+        :param separate_protocol: Determines whether the game client writes json states to a separate protocol channel
+        (logs on stdout are then drained into log files). Game client must support it. None = 'separate_protocol' of
+        the game configuration.
         """
         super(Mario, self).__init__()
         self.model = model
@@ -34,6 +37,9 @@ class Mario(AbstractGame):
         if vis_on:
             self.vis_on = "1"
         self.level = level
+        self.state_decoder = StateDecoder.from_config_file(MARIO_CONFIG_FILE)
+        self.action_precision = self.get_action_precision(MARIO_CONFIG_FILE)
+        self.separate_protocol = self.get_separate_protocol(MARIO_CONFIG_FILE, separate_protocol)
 
     def init_process(self):
         """
@@ -47,7 +53,7 @@ class Mario(AbstractGame):
         else:
             params = ["java", "-cp", MARIO_CP, MARIO_CLASS, str(self.seed), str(self.game_batch_size)]
             command = "{} {} {} {} {} {}".format(*params) if windows else params
-        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=-1)
+        self.start_process(command, self.separate_protocol)
 
         data = self.get_process_data()
         return data["state"], data["current_phase"]
@@ -57,11 +63,5 @@ class Mario(AbstractGame):
         Gets a subprocess next data (line).
         :return: a subprocess next data (line).
         """
-        line = " "
-
-        # Skip non-json file outputs from mario
-        while not line or line[0] != '{':
-            # print("line: '{}'".format(line))
-            line = self.process.stdout.readline().decode('ascii')
-
-        return json.loads(line)
+        # Skips non-json file outputs from mario (if not using separate protocol channel)
+        return self.state_decoder.decode(self.read_protocol_line())
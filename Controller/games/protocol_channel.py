@@ -0,0 +1,165 @@
+import os
+import socket
+import threading
+import time
+
+
+class ProtocolChannel():
+    """
+    Dedicated channel for protocol messages (json states) of a game subprocess, separated from its standard output.
+    The channel is a loopback TCP connection (works on all platforms and through starter scripts): the game finds
+    the port in the environment variable 'GENERAL_AI_PROTOCOL_PORT', connects and writes json lines there. Logs of
+    the game stay on stdout/stderr. Actions are still sent to the standard input of the game.
+    """
+    ENVIRONMENT_VARIABLE = "GENERAL_AI_PROTOCOL_PORT"
+
+    def __init__(self, timeout=60.0, buffer_size=1 << 16, poll_interval=0.1):
+        """
+        Initializes a new instance of ProtocolChannel and starts listening for the game connection.
+        :param timeout: Timeout (seconds) for the game to connect.
+        :param buffer_size: Size of the read buffer.
+        :param poll_interval: Interval (seconds) of checks whether the game is still alive while waiting for it.
+        """
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+        self.connection = None
+        self.reader = None
+
+    def get_environment(self):
+        """
+        Returns an environment for the game subprocess (current environment with the port of the channel).
+        """
+        environment = dict(os.environ)
+        environment[ProtocolChannel.ENVIRONMENT_VARIABLE] = str(self.port)
+        return environment
+
+    def accept(self, alive=None):
+        """
+        Waits for the game to connect.
+        :param alive: Function that returns false when the game process has ended (then waiting stops immediately).
+        """
+        deadline = time.monotonic() + self.timeout
+        self.server.settimeout(self.poll_interval)
+        try:
+            while self.connection is None:
+                try:
+                    self.connection, _ = self.server.accept()
+                except socket.timeout:
+                    if alive is not None and not alive():
+                        raise RuntimeError("Game process ended before it connected to the protocol channel.")
+                    if time.monotonic() > deadline:
+                        raise RuntimeError(
+                            "Game did not connect to the protocol channel (does the game client support it?).")
+        finally:
+            self.server.close()
+        self.connection.settimeout(None)
+        self.reader = FrameReader(self.connection.makefile("rb", buffering=self.buffer_size))
+
+    def read_frame(self, alive=None):
+        """
+        Reads the next protocol frame (line) from the game.
+        :param alive: Function that returns false when the game process has ended (see 'accept').
+        :return: Next frame (bytes).
+        """
+        if self.reader is None:
+            self.accept(alive)
+        return self.reader.read_frame()
+
+    def close(self):
+        """
+        Closes the channel.
+        """
+        self.server.close()
+        if self.connection is not None:
+            self.reader.close()
+            self.connection.close()
+
+
+class FrameReader():
+    """
+    Reads newline-delimited protocol frames from a buffered binary stream.
+    """
+
+    def __init__(self, stream):
+        """
+        Initializes a new instance of FrameReader.
+        :param stream: Buffered binary stream.
+        """
+        self.stream = stream
+
+    def read_frame(self):
+        """
+        Reads the next frame.
+        :return: Next frame (bytes, including the line separator).
+        """
+        frame = self.stream.readline()
+        if not frame:
+            raise EOFError("Protocol channel has been closed by the game.")
+        return frame
+
+    def close(self):
+        self.stream.close()
+
+
+class LogDrain(threading.Thread):
+    """
+    Background reader of a game output stream (logs). Lines are written into a bounded log file (the file is rotated
+    to '<file>.1' when it exceeds the maximum size) or thrown away if no file is specified. Draining prevents the game
+    from blocking on a full pipe buffer. Log files are named by the game process, so they should be removed (see
+    'remove') when the game ends.
+    """
+
+    def __init__(self, stream, file_name=None, max_bytes=1 << 20):
+        """
+        Initializes a new instance of LogDrain and starts draining.
+        :param stream: Binary stream to drain (stdout or stderr of the game subprocess).
+        :param file_name: Log file (or None to throw the output away).
+        :param max_bytes: Maximum size of the log file.
+        """
+        super(LogDrain, self).__init__(daemon=True)
+        self.stream = stream
+        self.file_name = file_name
+        self.max_bytes = max_bytes
+        self.start()
+
+    def run(self):
+        log = None
+        written = 0
+        try:
+            if self.file_name is not None:
+                os.makedirs(os.path.dirname(self.file_name), exist_ok=True)
+                log = open(self.file_name, "wb")
+            for line in iter(self.stream.readline, b""):
+                if log is None:
+                    continue
+                if written + len(line) > self.max_bytes:
+                    log.close()
+                    os.replace(self.file_name, f"{self.file_name}.1")
+                    log = open(self.file_name, "wb")
+                    written = 0
+                log.write(line)
+                written += len(line)
+        except (OSError, ValueError):
+            pass  # stream closed when the game was finalized
+        finally:
+            if log is not None:
+                log.close()
+
+    def remove(self, timeout=1.0):
+        """
+        Waits for the end of the stream (the game process has been killed) and removes the log files.
+        :param timeout: Maximum time (seconds) to wait for the end of the stream.
+        """
+        self.join(timeout)
+        if self.file_name is None:
+            return
+        for file_name in [self.file_name, f"{self.file_name}.1"]:
+            try:
+                os.remove(file_name)
+            except OSError:
+                pass  # not created or still open (the stream did not end)
@@ -0,0 +1,62 @@
+from games.abstract_game import AbstractGame
+from games.shared_memory_channel import SharedMemoryChannel
+from games.state_decoder import StateDecoder
+import subprocess
+import utils.resources
+import sys
+from constants import *
+
+
+class Reference(AbstractGame):
+    """
+    Represents a single reference game (simple Python game for testing of the game protocols). Communicates using
+    pipes or shared memory.
+    """
+
+    def __init__(self, model, game_batch_size, seed, transport="pipe", test=False, separate_protocol=None):
+        """
+        Initializes a new instance of Reference game.
+        :param model: Model which will be playing this game.
+        :param game_batch_size: Number of games that will be played immediately (one after one) within the single game
+        instance. Result is averaged.
+        :param seed: A random seed for random generator within the game.
+        :param transport: Protocol used for communication with the game subprocess, 'pipe' or 'shared_memory'.
+        :param test: Indicates whether the game is in testing mode.
+        :param separate_protocol: Determines whether the pipe transport uses a separate protocol channel for states.
+        None = 'separate_protocol' of the game configuration.
+        """
+        super(Reference, self).__init__()
+        self.model = model
+        self.game_batch_size = game_batch_size
+        self.seed = seed
+        self.transport = transport
+        self.state_decoder = StateDecoder.from_config_file(REFERENCE_CONFIG_FILE)
+        self.action_precision = self.get_action_precision(REFERENCE_CONFIG_FILE)
+        self.separate_protocol = self.get_separate_protocol(REFERENCE_CONFIG_FILE, separate_protocol)
+
+    def init_process(self):
+        """
+        Initializes a subprocess with the game and returns first state of the game.
+        """
+        params = [sys.executable, REFERENCE_PY_PATH, str(self.seed), str(self.game_batch_size)]
+        if self.transport == "shared_memory":
+            game_config = StateDecoder.configs[REFERENCE_CONFIG_FILE]
+            self.channel = SharedMemoryChannel.create(max(game_config["input_sizes"]), max(game_config["output_sizes"]))
+            self.process = subprocess.Popen(utils.resources.get_child_command(params + self.channel.get_arguments()),
+                                            pass_fds=self.channel.get_pass_fds())
+        elif self.transport == "pipe":
+            self.start_process(params, self.separate_protocol)
+        else:
+            raise NotImplementedError(f"Unknown transport: {self.transport}")
+
+        data = self.get_process_data()
+        return data["state"], data["current_phase"]
+
+    def get_process_data(self):
+        """
+        Gets a subprocess next data.
+        :return: a subprocess next data.
+        """
+        if self.channel is not None:
+            return self.channel.read_state(alive=lambda: self.process.poll() is None)
+        return self.state_decoder.decode(self.read_protocol_line())
@@ -0,0 +1,212 @@
+import mmap
+import os
+import select
+import tempfile
+import time
+import numpy as np
+
+
+class SharedMemoryChannel():
+    """
+    Shared-memory transport between the controller and a game process running on the same host. The channel is
+    a memory-mapped file with a header, a state slot and an action slot:
+
+        header: int64 state_seq, int64 action_seq, int32 state_size, int32 action_size, int32 current_phase,
+                int32 done, float64 reward, int32 score_size (padded to 64 bytes)
+        score slot: float64[MAX_SCORES], state slot: float64[max_state_size], action slot: float64[max_action_size]
+
+    The game writes a state and increments 'state_seq', the controller writes an action and increments
+    'action_seq'. Sides are woken up by a pair of eventfd counters (inherited by the game process); where eventfd is
+    not available, sides poll the sequence numbers. The controller reads states as NumPy views of the mapping.
+    """
+    HEADER_SIZE = 64
+    MAX_SCORES = 8
+
+    @staticmethod
+    def create(max_state_size, max_action_size):
+        """
+        Creates a new channel (controller side). The file is placed in /dev/shm if available.
+        :param max_state_size: Maximum size of the game state.
+        :param max_action_size: Maximum size of the action.
+        :return: A new instance of SharedMemoryChannel.
+        """
+        directory = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        fd, file_name = tempfile.mkstemp(prefix="general_ai_", suffix=".shm", dir=directory)
+        size = SharedMemoryChannel.get_size(max_state_size, max_action_size)
+        os.ftruncate(fd, size)
+        os.close(fd)
+
+        if hasattr(os, "eventfd"):
+            state_fd = os.eventfd(0)
+            action_fd = os.eventfd(0)
+        else:
+            state_fd, action_fd = -1, -1
+        return SharedMemoryChannel(file_name, max_state_size, max_action_size, state_fd, action_fd, owner=True)
+
+    @staticmethod
+    def attach(arguments):
+        """
+        Attaches to an existing channel (game side).
+        :param arguments: Arguments created by 'get_arguments' of the controller side.
+        :return: A new instance of SharedMemoryChannel.
+        """
+        file_name, max_state_size, max_action_size, state_fd, action_fd = arguments
+        return SharedMemoryChannel(file_name, int(max_state_size), int(max_action_size), int(state_fd), int(action_fd))
+
+    @staticmethod
+    def get_size(max_state_size, max_action_size):
+        """
+        Returns a size of the channel file in bytes.
+        """
+        return SharedMemoryChannel.HEADER_SIZE + 8 * (SharedMemoryChannel.MAX_SCORES + max_state_size + max_action_size)
+
+    def __init__(self, file_name, max_state_size, max_action_size, state_fd=-1, action_fd=-1, owner=False):
+        """
+        Initializes a new instance of SharedMemoryChannel (use 'create' or 'attach').
+        :param file_name: Memory-mapped file.
+        :param max_state_size: Maximum size of the game state.
+        :param max_action_size: Maximum size of the action.
+        :param state_fd: Eventfd signalling a new state (or -1 for polling).
+        :param action_fd: Eventfd signalling a new action (or -1 for polling).
+        :param owner: Indicates whether this side created the channel (and removes it on close).
+        """
+        self.file_name = file_name
+        self.max_state_size = max_state_size
+        self.max_action_size = max_action_size
+        self.state_fd = state_fd
+        self.action_fd = action_fd
+        self.owner = owner
+
+        with open(file_name, "r+b") as f:
+            self.mmap = mmap.mmap(f.fileno(), SharedMemoryChannel.get_size(max_state_size, max_action_size))
+
+        self.sequences = np.ndarray((2,), dtype="<i8", buffer=self.mmap, offset=0)
+        self.integers = np.ndarray((4,), dtype="<i4", buffer=self.mmap, offset=16)
+        self.reward = np.ndarray((1,), dtype="<f8", buffer=self.mmap, offset=32)
+        self.score_size = np.ndarray((1,), dtype="<i4", buffer=self.mmap, offset=40)
+
+        offset = SharedMemoryChannel.HEADER_SIZE
+        self.score = np.ndarray((SharedMemoryChannel.MAX_SCORES,), dtype="<f8", buffer=self.mmap, offset=offset)
+        offset += 8 * SharedMemoryChannel.MAX_SCORES
+        self.state = np.ndarray((max_state_size,), dtype="<f8", buffer=self.mmap, offset=offset)
+        offset += 8 * max_state_size
+        self.action = np.ndarray((max_action_size,), dtype="<f8", buffer=self.mmap, offset=offset)
+
+        self.last_state_seq = 0
+        self.last_action_seq = 0
+
+    def get_arguments(self):
+        """
+        Returns command line arguments for the game process, used by 'attach' on the game side.
+        """
+        return [self.file_name, str(self.max_state_size), str(self.max_action_size), str(self.state_fd),
+                str(self.action_fd)]
+
+    def get_pass_fds(self):
+        """
+        Returns file descriptors that must be inherited by the game process.
+        """
+        return tuple(fd for fd in (self.state_fd, self.action_fd) if fd >= 0)
+
+    def wait(self, fd, index, last_seq, alive=None):
+        """
+        Waits until the specified sequence number changes.
+        :param fd: Eventfd of the signal (or -1 for polling).
+        :param index: Index of the sequence number (0 = state, 1 = action).
+        :param last_seq: Last seen sequence number.
+        :param alive: Callable checking whether the other side is still alive (or None).
+        :return: New sequence number.
+        """
+        while self.sequences[index] == last_seq:
+            if fd >= 0:
+                ready, _, _ = select.select([fd], [], [], 1.0)
+                if ready:
+                    os.eventfd_read(fd)
+                    continue
+            else:
+                time.sleep(0)
+            if alive is not None and not alive():
+                raise EOFError("The other side of the shared-memory channel has ended.")
+        return int(self.sequences[index])
+
+    def read_state(self, alive=None):
+        """
+        Waits for the next game state (controller side).
+        :param alive: Callable checking whether the game is still alive (or None).
+        :return: Dictionary with 'state' (view of the mapping, valid until the next 'write_action'), 'current_phase',
+        'reward', 'score' and 'done'.
+        """
+        self.last_state_seq = self.wait(self.state_fd, 0, self.last_state_seq, alive)
+        state_size, _, current_phase, done = self.integers
+        return {
+            "state": self.state[:state_size],
+            "current_phase": int(current_phase),
+            "reward": float(self.reward[0]),
+            "score": self.score[:self.score_size[0]].tolist(),
+            "done": int(done),
+        }
+
+    def write_action(self, action):
+        """
+        Writes the specified action and wakes the game up (controller side).
+        :param action: Action to write (list or NumPy array of numbers).
+        """
+        n = len(action)
+        self.action[:n] = action
+        self.integers[1] = n
+        self.last_action_seq += 1
+        self.sequences[1] = self.last_action_seq
+        self.signal(self.action_fd)
+
+    def write_state(self, state, current_phase, reward, score, done):
+        """
+        Writes the specified state and wakes the controller up (game side).
+        :param state: State of the game.
+        :param current_phase: Current game phase.
+        :param reward: Current reward.
+        :param score: List of scores.
+        :param done: Determines whether the game has ended (1 / 0).
+        """
+        n = len(state)
+        self.state[:n] = state
+        self.score[:len(score)] = score
+        self.score_size[0] = len(score)
+        self.reward[0] = reward
+        self.integers[0] = n
+        self.integers[2] = current_phase
+        self.integers[3] = done
+        self.last_state_seq += 1
+        self.sequences[0] = self.last_state_seq
+        self.signal(self.state_fd)
+
+    def read_action(self, alive=None):
+        """
+        Waits for the next action (game side).
+        :param alive: Callable checking whether the controller is still alive (or None).
+        :return: Action (view of the mapping, valid until the next 'write_state').
+        """
+        self.last_action_seq = self.wait(self.action_fd, 1, self.last_action_seq, alive)
+        return self.action[:self.integers[1]]
+
+    def signal(self, fd):
+        """
+        Wakes up the other side.
+        :param fd: Eventfd of the signal (or -1 for polling).
+        """
+        if fd >= 0:
+            os.eventfd_write(fd, 1)
+
+    def close(self):
+        """
+        Closes the channel. The controller side also removes the file and the signals.
+        """
+        self.sequences = self.integers = self.reward = self.score_size = None
+        self.score = self.state = self.action = None
+        try:
+            self.mmap.close()
+        except BufferError:
+            pass  # some state view is still alive, mapping is released with it
+        if self.owner:
+            for fd in self.get_pass_fds():
+                os.close(fd)
+            os.remove(self.file_name)
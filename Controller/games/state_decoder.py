@@ -0,0 +1,325 @@
+import json
+import re
+import numpy as np
+
+# classes of bytes of the state array (vectorized parser)
+SEPARATOR, DIGIT, DOT, MINUS, PLUS, EXPONENT, INVALID = range(7)
+BYTE_CLASSES = np.full(256, INVALID, dtype=np.uint8)
+SEPARATORS = b", \t\r\n[]"
+BYTE_CLASSES[list(SEPARATORS)] = SEPARATOR
+BYTE_CLASSES[ord("0"):ord("9") + 1] = DIGIT
+BYTE_CLASSES[ord(".")] = DOT
+BYTE_CLASSES[ord("-")] = MINUS
+BYTE_CLASSES[ord("+")] = PLUS
+BYTE_CLASSES[[ord("e"), ord("E")]] = EXPONENT
+
+DIGIT_VALUES = np.zeros(256, dtype=np.int64)
+DIGIT_VALUES[ord("0"):ord("9") + 1] = np.arange(10)
+
+# integer powers of ten of digits of int64 mantissas (the last one, index -1, drops digits after the mantissa) and
+# exactly representable float powers of ten
+POWERS = np.append(10 ** np.arange(19, dtype=np.int64), 0)
+MAX_DIGITS = 18
+FLOAT_POWERS = 10.0 ** np.arange(23)
+MAX_EXACT_MANTISSA = 2 ** 53
+
+BRACKETS = re.compile(rb"[\[\]]")
+
+
+class StateDecoder():
+    """
+    Decodes json lines of the game protocol. The state array is parsed straight from the line into a preallocated
+    float array, sized by the game configuration; the end of the array is matched by brackets and the number of values
+    must be one of 'input_sizes' (other lines are decoded by the json parser). Only the remaining small part of the
+    message (current phase, reward, score, done) goes through json parser.
+    Short states (2048, TORCS) are parsed by 'np.fromstring'. Long states (Mario, Alhambra) are parsed by a vectorized
+    scanner over a view of the line, all its buffers are reused, so the per-step garbage does not grow with the size of
+    the state. Numbers whose mantissa and power of ten are exactly representable (Clinger's fast path, e.g. all numbers
+    with up to 15 significant digits) are converted by a single division or multiplication, which gives the same
+    (correctly rounded) value as 'float'; other numbers are parsed by 'float' one by one.
+    """
+    STATE_KEY = b'"state"'
+
+    configs = {}
+
+    @staticmethod
+    def from_config_file(file_name):
+        """
+        Creates a new decoder for the game with the specified configuration file (configs are loaded only once).
+        :param file_name: Game configuration file (contains I/O sizes).
+        :return: A new instance of StateDecoder.
+        """
+        if file_name not in StateDecoder.configs:
+            with open(file_name, "r") as f:
+                StateDecoder.configs[file_name] = json.load(f)
+        return StateDecoder(StateDecoder.configs[file_name])
+
+    def __init__(self, game_config, vectorized_threshold=64):
+        """
+        Initializes a new instance of StateDecoder.
+        :param game_config: Game configuration (dictionary with 'input_sizes' of every game phase).
+        :param vectorized_threshold: States of games with at least this input size are parsed by the vectorized
+        scanner.
+        """
+        self.input_sizes = set(map(int, game_config["input_sizes"]))
+        size = max(self.input_sizes)
+        self.state = np.zeros(size, dtype=np.float64)
+        self.vectorized = size >= vectorized_threshold
+
+        # buffers of the vectorized scanner: one value per token (number), one value per token and slot 0 (bytes before
+        # the first token), and one value per byte (grow with lines)
+        self.starts = np.empty(size, dtype=np.int64)
+        self.ends = np.empty(size + 1, dtype=np.int64)
+        self.marks = np.empty(size + 1, dtype=np.int64)
+        self.dots = np.empty(size + 1, dtype=np.int64)
+        self.mantissa_ends = np.empty(size + 1, dtype=np.int64)
+        self.mantissa_counts = np.empty(size + 1, dtype=np.int64)
+        self.end_counts = np.empty(size + 1, dtype=np.int64)
+        self.found = np.empty(size, dtype=np.int64)
+        self.mantissas = np.empty(size, dtype=np.int64)
+        self.exponents = np.empty(size, dtype=np.int64)
+        self.digits = np.empty(size, dtype=np.int64)
+        self.fraction_digits = np.empty(size, dtype=np.int64)
+        self.token_classes = np.empty(size, dtype=np.uint8)
+        self.scales = np.empty(size, dtype=np.float64)
+        self.token_masks = [np.empty(size, dtype=bool) for _ in range(2)]
+        self.capacity = 0
+
+    def allocate(self, length):
+        """
+        Allocates byte buffers of the vectorized scanner for state arrays of the specified length (in bytes).
+        :param length: Length of the state array.
+        """
+        self.capacity = max(length, 2 * self.capacity)
+        self.positions = np.arange(self.capacity, dtype=np.int64)
+        self.classes = np.empty(self.capacity, dtype=np.uint8)
+        self.masks = [np.empty(self.capacity, dtype=bool) for _ in range(3)]
+        self.work = [np.empty(self.capacity, dtype=np.int64) for _ in range(5)]
+
+    def decode(self, line):
+        """
+        Decodes the specified protocol line.
+        :param line: Json line (bytes) from the game.
+        :return: Dictionary with 'state', 'current_phase', 'reward', 'score' and 'done'. The 'state' is a view of
+        the internal buffer, valid until the next call of 'decode' (copy it if you need to keep it).
+        """
+        key = line.find(StateDecoder.STATE_KEY)
+        if key < 0:
+            return json.loads(line)
+
+        begin = line.find(b'[', key)
+        if begin < 0 or line[key + len(StateDecoder.STATE_KEY):begin].strip() != b':':
+            return self.decode_json(line)
+        end = self.find_array_end(line, begin)
+        if end < 0:
+            return self.decode_json(line)
+
+        if self.vectorized:
+            n = self.parse_vectorized(line, begin + 1, end)
+        else:
+            n = self.parse_string(line, begin + 1, end)
+        if n is None:
+            return self.decode_json(line)
+
+        data = json.loads(line[:begin] + b'[]' + line[end + 1:])
+        data["state"] = self.state[:n]
+        return data
+
+    def decode_json(self, line):
+        """
+        Decodes the whole line by the json parser (lines the scanner does not expect), the state is copied into the
+        internal buffer.
+        """
+        data = json.loads(line)
+        values = np.asarray(data["state"], dtype=np.float64).reshape(-1)
+        if len(values) > len(self.state):
+            self.state = np.zeros(len(values), dtype=np.float64)
+        state = self.state[:len(values)]
+        state[:] = values
+        data["state"] = state
+        return data
+
+    @staticmethod
+    def find_array_end(line, begin):
+        """
+        Finds the closing bracket of the array that begins at the specified position (nested arrays are skipped).
+        :param line: Json line.
+        :param begin: Position of the opening bracket.
+        :return: Position of the closing bracket (-1 if the array is not closed).
+        """
+        end = line.find(b']', begin)
+        if end < 0 or line.find(b'[', begin + 1, end) < 0:
+            return end  # flat array (states of all the current games)
+
+        depth = 0
+        for bracket in BRACKETS.finditer(line, begin):
+            depth += 1 if bracket.group() == b'[' else -1
+            if depth == 0:
+                return bracket.start()
+        return -1
+
+    def parse_string(self, line, begin, end):
+        """
+        Parses numbers of the state array (short states) into the internal buffer.
+        :param line: Json line.
+        :param begin: Position of the first byte of the array content.
+        :param end: Position of the closing bracket.
+        :return: Number of values (None if it is not one of the input sizes).
+        """
+        content = line[begin:end]
+        if b'[' in content:
+            content = content.translate(None, b'[]')
+        values = np.fromstring(content, sep=',')
+        n = len(values)
+        if n not in self.input_sizes:
+            return None
+        self.state[:n] = values
+        return n
+
+    def parse_vectorized(self, line, begin, end):
+        """
+        Parses numbers of the state array (long states) into the internal buffer by the vectorized scanner. Works on
+        a view of the line and reused buffers only.
+        :param line: Json line.
+        :param begin: Position of the first byte of the array content.
+        :param end: Position of the closing bracket.
+        :return: Number of values (None if it is not one of the input sizes or the array contains other values than
+        numbers).
+        """
+        length = end - begin
+        if length > self.capacity:
+            self.allocate(length)
+        chars = np.frombuffer(line, dtype=np.uint8, count=length, offset=begin)
+        token, starts, mask = (m[:length] for m in self.masks)
+        indices, digit_values, values, token_ids, counts = (w[:length] for w in self.work)
+        np.copyto(indices, chars)  # indices of intp type, 'take' would copy the bytes to cast them
+        classes = np.take(BYTE_CLASSES, indices, out=self.classes[:length], mode='clip')
+        np.take(DIGIT_VALUES, indices, out=digit_values, mode='clip')
+
+        if np.equal(classes, INVALID, out=mask).any():
+            return None  # NaN, Infinity, null...
+        np.not_equal(classes, SEPARATOR, out=token)
+        starts[0] = token[0]
+        np.greater(token[1:], token[:-1], out=starts[1:])
+        n = int(np.count_nonzero(starts))
+        if n not in self.input_sizes:
+            return None
+
+        # token of every byte (1-based, 0 before the first token) and number of digits up to every byte
+        positions = self.positions[:length]
+        np.copyto(token_ids, starts)
+        np.cumsum(token_ids, out=token_ids)
+        np.equal(classes, DIGIT, out=mask)
+        np.copyto(counts, mask)
+        np.cumsum(counts, out=counts)
+
+        # last byte of every token (separators after a number belong to it), its exponent mark (the byte after the
+        # token if there is none), its last mantissa byte and its decimal point (the last mantissa byte if there is
+        # none)
+        ends = self.ends[:n + 1]
+        ends[0] = -1
+        ends.put(token_ids, positions, mode='clip')
+        token_ends = ends[1:]
+        token_starts = self.starts[:n]
+        token_starts[0] = np.argmax(starts)
+        np.add(token_ends[:-1], 1, out=token_starts[1:])
+        marks = self.marks[:n + 1]
+        np.add(ends[0], 1, out=marks[:1])
+        exponent = self.find_marks(classes, EXPONENT, positions, token_starts, np.add(token_ends, 1, out=marks[1:]),
+                                   mask, indices, self.found[:n], marks[1:])
+        mantissa_ends = np.subtract(marks, 1, out=self.mantissa_ends[:n + 1])
+        dots = self.dots[:n + 1]
+        self.find_marks(classes, DOT, positions, token_starts, mantissa_ends[1:], mask, indices, self.found[:n],
+                        dots[1:])
+
+        # digits of mantissas (their power of ten = number of mantissa digits after them), fraction digits
+        mantissa_counts = np.take(counts, mantissa_ends, out=self.mantissa_counts[:n + 1], mode='clip')
+        end_counts = np.take(counts, ends, out=self.end_counts[:n + 1], mode='clip')
+        digits = self.digits[:n]
+        digits[0] = mantissa_counts[1]
+        np.subtract(mantissa_counts[2:], end_counts[1:-1], out=digits[1:])
+        fraction_digits = np.take(counts, dots[1:], out=self.fraction_digits[:n], mode='clip')
+        np.subtract(mantissa_counts[1:], fraction_digits, out=fraction_digits)
+        mantissas = self.parse_digits(mantissa_counts, token_ids, counts, digit_values, token_starts, values,
+                                      self.mantissas[:n])
+        negative, fallback = (m[:n] for m in self.token_masks)
+        np.greater(mantissas, MAX_EXACT_MANTISSA, out=fallback)
+        np.logical_or(fallback, np.greater(digits, MAX_DIGITS, out=negative), out=fallback)
+
+        # digits after exponent marks (mantissa digits are dropped) and signs of exponents
+        exponents = self.exponents[:n]
+        if exponent:
+            np.take(marks, token_ids, out=indices, mode='clip')
+            np.less_equal(positions, indices, out=mask)
+            np.copyto(digit_values, 0, where=mask)
+            self.parse_digits(end_counts, token_ids, counts, digit_values, token_starts, values, exponents)
+            found = np.subtract(end_counts[1:], mantissa_counts[1:], out=self.found[:n])
+            np.logical_or(fallback, np.greater(found, MAX_DIGITS, out=negative), out=fallback)
+            np.take(classes, np.add(marks[1:], 1, out=found), out=self.token_classes[:n], mode='clip')
+            np.negative(exponents, out=exponents, where=np.equal(self.token_classes[:n], MINUS, out=negative))
+        else:
+            exponents.fill(0)
+
+        # value = mantissa * 10 ** -scale, exact by a single operation on the fast path (scale = fraction digits -
+        # exponent)
+        scales = np.subtract(fraction_digits, exponents, out=exponents)
+        magnitudes = np.abs(scales, out=fraction_digits)
+        np.logical_or(fallback, np.greater(magnitudes, len(FLOAT_POWERS) - 1, out=negative), out=fallback)
+        np.minimum(magnitudes, len(FLOAT_POWERS) - 1, out=magnitudes)
+        powers = np.take(FLOAT_POWERS, magnitudes, out=self.scales[:n], mode='clip')
+
+        state = self.state[:n]
+        np.copyto(state, mantissas)
+        np.divide(state, powers, out=state, where=np.greater_equal(scales, 0, out=negative))
+        np.multiply(state, powers, out=state, where=np.less(scales, 0, out=negative))
+        np.take(classes, token_starts, out=self.token_classes[:n], mode='clip')
+        np.negative(state, out=state, where=np.equal(self.token_classes[:n], MINUS, out=negative))
+
+        for i in np.flatnonzero(fallback):
+            state[i] = float(line[begin + token_starts[i]:begin + token_ends[i] + 1].rstrip(SEPARATORS))
+        return n
+
+    @staticmethod
+    def find_marks(classes, mark, positions, token_starts, default, mask, indices, found, out):
+        """
+        Finds the first byte of the specified class in every token.
+        :param classes: Classes of bytes.
+        :param mark: Class of the searched bytes.
+        :param positions: Positions of bytes.
+        :param token_starts: Positions of the first bytes of tokens.
+        :param default: Positions for tokens without such a byte (also the upper bound of positions).
+        :param mask: Work buffer (bool, one value per byte).
+        :param indices: Work buffer (int64, one value per byte).
+        :param found: Work buffer (int64, one value per token).
+        :param out: Output buffer of positions of the found bytes (one value per token), may be 'default'.
+        :return: True if any byte was found.
+        """
+        if not np.equal(classes, mark, out=mask).any():
+            np.copyto(out, default)
+            return False
+        indices.fill(len(positions))
+        np.copyto(indices, positions, where=mask)
+        np.minimum(np.minimum.reduceat(indices, token_starts, out=found), default, out=out)
+        return True
+
+    @staticmethod
+    def parse_digits(last_counts, token_ids, counts, digit_values, token_starts, values, out):
+        """
+        Parses integers formed by digits of every token up to the specified digit (vectorized scanner).
+        :param last_counts: Number of digits up to the last digit of integers (one value per token and slot 0).
+        :param token_ids: Token of every byte (1-based).
+        :param counts: Number of digits up to every byte.
+        :param digit_values: Values of digits (0 for other bytes).
+        :param token_starts: Positions of the first bytes of tokens.
+        :param values: Work buffer (int64, one value per byte).
+        :param out: Output buffer of integers (one value per token). Integers of more than MAX_DIGITS digits are not
+        valid.
+        :return: Integers.
+        """
+        # power of ten of a digit = number of digits after it up to the last digit, negative after the last digit
+        np.take(last_counts, token_ids, out=values, mode='clip')
+        np.subtract(values, counts, out=values)
+        np.clip(values, -1, MAX_DIGITS, out=values)
+        np.take(POWERS, values, out=values, mode='wrap')
+        np.multiply(values, digit_values, out=values)
+        return np.add.reduceat(values, token_starts, out=out)
@@ -1,6 +1,5 @@
 from games.abstract_game import AbstractGame
-import subprocess
-import json
+from games.state_decoder import StateDecoder
 import numpy as np
 from threading import Lock
 from constants import *
@@ -14,7 +13,7 @@ class Torcs(AbstractGame):
     port_locks = [Lock() for _ in range(MAX_NUMBER_OF_TORCS_PORTS)]
     ddpg_wrong_ports = []
 
-    def __init__(self, model, game_batch_size, seed, vis_on=False, test=False):
+    def __init__(self, model, game_batch_size, seed, vis_on=False, test=False, separate_protocol=None):
         """
         Initializes a new instance of TORCS game.
         :param model: Model which will be playing this game.
@@ -23,6 +22,8 @@ class Torcs(AbstractGame):
         :param seed: A random seed for random generator within the game.
         :param vis_on: Determines whether TORCS will run with visual output. If True, different subprocess will be used.
         :param test: Indicates whether the game is in testing mode. Using different track.
+        :param separate_protocol: Determines whether the game client writes json states to a separate protocol channel
+        (logs on stdout are then drained into log files). None = 'separate_protocol' of the game configuration.
         """
         super(Torcs, self).__init__()
         self.model = model
@@ -30,6 +31,9 @@ class Torcs(AbstractGame):
         self.seed = seed
         self.test = test
         self.vis_on = vis_on
+        self.state_decoder = StateDecoder.from_config_file(TORCS_CONFIG_FILE)
+        self.action_precision = self.get_action_precision(TORCS_CONFIG_FILE)
+        self.separate_protocol = self.get_separate_protocol(TORCS_CONFIG_FILE, separate_protocol)
 
     def run(self, advanced_results=False):
         """
@@ -39,6 +43,7 @@ class Torcs(AbstractGame):
         avg_result = 0
         for _ in range(self.game_batch_size):
             state, current_phase = self.init_process()
+            self.model.reset_state()
             while True:
                 result = self.model.evaluate(state, current_phase)
 
@@ -97,7 +102,7 @@ class Torcs(AbstractGame):
         else:
             params = [TORCS_BAT, xml, TORCS_JAVA_CP, port, torcs_install_dir]
         command = "{} {} {} {} {}".format(*params)
-        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=-1)
+        self.start_process(command, self.separate_protocol)
 
         data = self.get_process_data()
         return data["state"], data["current_phase"]
@@ -107,12 +112,8 @@ class Torcs(AbstractGame):
         Gets a subprocess next data (line).
         :return: a subprocess next data (line).
         """
-        line = ' '
-        while line[0] != "{":
-            # Not a proper json
-            line = self.process.stdout.readline().decode('ascii')
-
-        return json.loads(line)
+        # Skips non-json outputs (if not using separate protocol channel)
+        return self.state_decoder.decode(self.read_protocol_line())
 
     def finalize(self, internal_error=False):
         """
@@ -129,3 +130,4 @@ class Torcs(AbstractGame):
             pass
 
         self.process.kill()
+        self.close_channel(keep_logs=internal_error)
@@ -0,0 +1,340 @@
+"""
+Local inference server: loads trained models once and serves 'evaluate(state, phase)' to other processes (evaluators,
+games...) over a Unix socket. Requests of all clients are collected into micro-batches (one batched evaluation per
+model and game phase) and models are reloaded when their checkpoint files change. Clients use 'RemoteModel'
+(models/remote_model.py), which behaves as any other model. Stateful models (Echo-State with 'stateful') keep a state
+per connection: every connection evaluates its own instance of the model (sharing the reservoir), request by request,
+and clients reset it at the start of every game.
+Run this file directly (from 'Controller' directory) and select served models in the main section.
+"""
+import os
+import queue
+import socketserver
+import threading
+import time
+import numpy as np
+
+from models.mlp import MLP
+from models.remote_model import receive_exactly, REQUEST_HEADER, RESPONSE_HEADER, STATUS_OK, STATUS_ERROR, \
+    RESET_PHASE
+
+
+def get_modification_time(path):
+    """
+    Returns the latest modification time of the specified file, or of all files in the specified directory tree.
+    :param path: File or directory.
+    :return: Modification time (0 if the path does not exist).
+    """
+    if not os.path.exists(path):
+        return 0
+    if not os.path.isdir(path):
+        return os.path.getmtime(path)
+    latest = os.path.getmtime(path)
+    for root, _, files in os.walk(path):
+        for name in files:
+            latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+    return latest
+
+
+class InferenceServer():
+    """
+    Serves models over a Unix socket. Every model has its own batching thread, which is the only thread using
+    the model (TensorFlow models use a single session for all clients).
+    """
+
+    class Request():
+        """
+        Represents a single evaluation request of a client.
+        """
+
+        def __init__(self, state, phase, session):
+            self.state = state
+            self.phase = phase
+            self.session = session
+            self.result = None
+            self.error = None
+            self.done = threading.Event()
+
+    class Session():
+        """
+        Represents a state of a single client connection.
+        """
+
+        def __init__(self):
+            # instance of a stateful model used only by this connection, and the served model it was created from
+            self.model = None
+            self.source = None
+
+    class ServedModel(threading.Thread):
+        """
+        Represents a served model with its request queue and batching thread.
+        """
+
+        def __init__(self, name, loader, watch, max_batch, max_delay, reload_interval):
+            """
+            Initializes a new instance of ServedModel and loads the model.
+            :param name: Name of the model (used by clients).
+            :param loader: Function (without parameters) loading the model.
+            :param watch: Files or directories of the checkpoint (model is reloaded when they change).
+            :param max_batch: Maximum number of requests in a batch.
+            :param max_delay: Maximum time (seconds) to wait for other requests of a batch.
+            :param reload_interval: Interval (seconds) of checkpoint checks.
+            """
+            super(InferenceServer.ServedModel, self).__init__(daemon=True)
+            self.name = name
+            self.loader = loader
+            self.watch = watch
+            self.max_batch = max_batch
+            self.max_delay = max_delay
+            self.reload_interval = reload_interval
+            self.requests = queue.Queue()
+            self.running = True
+
+            self.model = loader()
+            self.modification_time = self.get_modification_time()
+            self.last_check = time.time()
+            self.reloading = None
+            self.batches = 0
+            self.evaluated = 0
+
+        def get_modification_time(self):
+            return max([get_modification_time(path) for path in self.watch], default=0)
+
+        def check_reload(self):
+            """
+            Starts loading of a new model if the checkpoint has changed and swaps models when it is loaded.
+            """
+            if self.reloading is not None:
+                if not self.reloading.is_alive():
+                    if self.reloading.model is not None:
+                        self.model = self.reloading.model
+                        print(f"Model {self.name} has been reloaded.")
+                    self.reloading = None
+                return
+
+            if not self.watch or time.time() - self.last_check < self.reload_interval:
+                return
+            self.last_check = time.time()
+            modification_time = self.get_modification_time()
+            if modification_time > self.modification_time:
+                # give the writer some time to finish the checkpoint
+                if time.time() - modification_time < self.reload_interval:
+                    return
+                self.modification_time = modification_time
+                self.reloading = InferenceServer.ModelLoader(self.name, self.loader)
+
+        def run(self):
+            while self.running:
+                try:
+                    request = self.requests.get(timeout=self.reload_interval)
+                except queue.Empty:
+                    self.check_reload()
+                    continue
+
+                batch = [request]
+                deadline = time.time() + self.max_delay
+                while len(batch) < self.max_batch:
+                    try:
+                        batch.append(self.requests.get(timeout=max(0.0, deadline - time.time())))
+                    except queue.Empty:
+                        break
+
+                self.evaluate(batch)
+                self.check_reload()
+
+        def evaluate(self, batch):
+            """
+            Evaluates a batch of requests (one batched evaluation for each game phase, requests of stateful models and
+            resets are evaluated separately).
+            :param batch: List of requests.
+            """
+            stateful = getattr(self.model, "stateful", False)
+            phases = {}
+            for request in batch:
+                if stateful or request.phase == RESET_PHASE:
+                    self.evaluate_session(request, stateful)
+                else:
+                    phases.setdefault(request.phase, []).append(request)
+
+            for phase, requests in phases.items():
+                try:
+                    results = self.model.evaluate_batch([request.state for request in requests], phase)
+                    for request, result in zip(requests, results):
+                        request.result = np.asarray(result, dtype=np.float64)
+                except Exception as e:
+                    for request in requests:
+                        request.error = f"{type(e).__name__}: {e}"
+                for request in requests:
+                    request.done.set()
+
+            self.batches += 1
+            self.evaluated += len(batch)
+
+        def evaluate_session(self, request, stateful):
+            """
+            Evaluates (or resets) the model of the connection of the request.
+            :param request: Request.
+            :param stateful: Indicates whether the served model is stateful.
+            """
+            session = request.session
+            try:
+                if session.source is not self.model:
+                    # the first request of the connection, or the model has been reloaded (the state starts over)
+                    session.source = self.model
+                    session.model = self.model
+                    if stateful:
+                        session.model = self.model.get_new_instance(self.model.weights, self.model.game_config)
+                if request.phase == RESET_PHASE:
+                    session.model.reset_state()
+                    request.result = np.empty(0)
+                else:
+                    request.result = np.array(session.model.evaluate(request.state, request.phase), dtype=np.float64)
+            except Exception as e:
+                request.error = f"{type(e).__name__}: {e}"
+            request.done.set()
+
+    class ModelLoader(threading.Thread):
+        """
+        Loads a new instance of a model in background (served model is used meanwhile).
+        """
+
+        def __init__(self, name, loader):
+            super(InferenceServer.ModelLoader, self).__init__(daemon=True)
+            self.name = name
+            self.loader = loader
+            self.model = None
+            self.start()
+
+        def run(self):
+            try:
+                self.model = self.loader()
+            except Exception as e:
+                print(f"Reloading of model {self.name} failed ({e}), the old model is still served.")
+
+    class Handler(socketserver.BaseRequestHandler):
+        """
+        Handles a single client connection: the first line is the model name, then requests follow.
+        """
+
+        def handle(self):
+            server = self.server.inference_server
+            connection = self.request
+            name = bytearray()
+            while not name.endswith(b"\n"):
+                name += receive_exactly(connection, 1)
+            name = name.decode("utf-8").strip()
+            if name not in server.models:
+                message = f"Unknown model: {name}".encode("utf-8")
+                connection.sendall(RESPONSE_HEADER.pack(STATUS_ERROR, len(message)) + message)
+                return
+            served = server.models[name]
+            session = InferenceServer.Session()
+            connection.sendall(RESPONSE_HEADER.pack(STATUS_OK, 0))
+
+            while True:
+                try:
+                    phase, size = REQUEST_HEADER.unpack(receive_exactly(connection, REQUEST_HEADER.size))
+                    state = np.frombuffer(receive_exactly(connection, 8 * size), dtype="<f8")
+                except (EOFError, OSError):
+                    return
+
+                request = InferenceServer.Request(state, phase, session)
+                served.requests.put(request)
+                request.done.wait()
+                if request.error is None:
+                    payload = request.result.astype("<f8", copy=False).tobytes()
+                    connection.sendall(RESPONSE_HEADER.pack(STATUS_OK, len(request.result)) + payload)
+                else:
+                    message = request.error.encode("utf-8")
+                    connection.sendall(RESPONSE_HEADER.pack(STATUS_ERROR, len(message)) + message)
+
+    def __init__(self, socket_path, max_batch=64, max_delay=0.001, reload_interval=5.0):
+        """
+        Initializes a new instance of InferenceServer.
+        :param socket_path: Path of the Unix socket.
+        :param max_batch: Maximum number of requests in a batch.
+        :param max_delay: Maximum time (seconds) to wait for other requests of a batch.
+        :param reload_interval: Interval (seconds) of checkpoint checks.
+        """
+        self.socket_path = socket_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.reload_interval = reload_interval
+        self.models = {}
+        self.server = None
+
+    def add_model(self, name, loader, watch=None):
+        """
+        Loads and starts serving a model.
+        :param name: Name of the model (used by clients).
+        :param loader: Function (without parameters) loading the model, e.g. 'lambda: MLP.load_from_file(f, game)'.
+        :param watch: File, directory or list of them; the model is reloaded when they change (None = no reloads).
+        """
+        if isinstance(watch, str):
+            watch = [watch]
+        served = InferenceServer.ServedModel(name, loader, watch or [], self.max_batch, self.max_delay,
+                                             self.reload_interval)
+        served.start()
+        self.models[name] = served
+        print(f"Serving model {name}")
+
+    def start(self):
+        """
+        Starts accepting clients in a background thread.
+        """
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, InferenceServer.Handler)
+        self.server.daemon_threads = True
+        self.server.inference_server = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"Inference server listening on {self.socket_path}")
+
+    def serve_forever(self, report_every=60):
+        """
+        Starts the server and reports statistics until interrupted.
+        :param report_every: Interval (seconds) of reports.
+        """
+        self.start()
+        try:
+            while True:
+                time.sleep(report_every)
+                for name, served in self.models.items():
+                    average = served.evaluated / max(1, served.batches)
+                    print(f"{name}: {served.evaluated} evaluations, average batch {average:.2f}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Stops the server.
+        """
+        for served in self.models.values():
+            served.running = False
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+if __name__ == '__main__':
+    server = InferenceServer("/tmp/general_ai_inference.sock")
+
+    game = "2048"
+    file_name = "C:/Users/Jan/Documents/GitHub/general-ai/Experiments/MLP+ES/2048/logs_2017-02-21_17-24-07/best/best_0.json"
+    server.add_model("mlp", lambda: MLP.load_from_file(file_name, game), watch=file_name)
+    # from models.echo_state_network import EchoState
+    # server.add_model("esn", lambda: EchoState.load_from_file(file_name, game), watch=file_name)
+
+    # TensorFlow models (import them only when served)
+    # from models.learned_ddpg import LearnedDDPG
+    # from models.learned_dqn import LearnedDQN
+    # logdir = "C:/Users/Jan/Documents/GitHub/general-ai/Experiments/DDPG/torcs/logs_2017-04-29_11-39-44"
+    # server.add_model("ddpg", lambda: LearnedDDPG(logdir), watch=os.path.join(logdir, "last"))
+    # server.add_model("dqn", lambda: LearnedDQN(logdir), watch=os.path.join(logdir, "best"))
+
+    server.serve_forever()
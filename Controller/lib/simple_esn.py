@@ -22,6 +22,12 @@
 
 # CHANGE LOG:
 # Initializing changed - Init moved to separate method from _fit_transform(...).
+# Precision of the reservoir can be specified (dtype), weights are generated in float64 and converted.
+# Reservoir states (ReservoirState) - activation and work buffers of a single game, stepped without allocations.
+# Spectral radius of large reservoirs is estimated iteratively (ARPACK), instead of the dense eigendecomposition.
+# Sparse reservoirs (connectivity) - random CSR weight matrix, stepped by sparse matrix-vector product.
+# Batched states - independent states of several games stepped at once (single matrix-matrix product).
+# Cycle reservoir (CycleESN) - structured reservoir (cycle with jumps), stepped in O(n_components).
 #
 #################################
 
@@ -36,6 +42,96 @@ from sklearn.utils import check_random_state, check_array
 from numpy import zeros, ones, concatenate, array, tanh, vstack, arange
 import numpy as np
 import scipy.linalg as la
+import scipy.sparse as sp
+import scipy.sparse.linalg as sla
+
+# Reservoirs larger than this use the iterative spectral radius estimation by default
+ITERATIVE_RADIUS_THRESHOLD = 500
+
+
+def spectral_radius(weights, method='auto', tol=1e-4):
+    """Spectral radius (largest absolute eigenvalue) of a square matrix
+
+    Parameters
+    ----------
+    weights : array_like or scipy.sparse matrix, shape (n, n)
+        The matrix.
+
+    method : {'auto', 'dense', 'iterative'}, optional
+        'dense' computes all eigenvalues, 'iterative' estimates the largest
+        ones by ARPACK (implicitly restarted Arnoldi, only matrix-vector
+        products), 'auto' uses 'iterative' for matrices larger than
+        ITERATIVE_RADIUS_THRESHOLD (and for sparse matrices).
+
+    tol : float, optional
+        Relative tolerance of the iterative estimation, default is 1e-4.
+
+    Returns
+    -------
+    radius : float
+        Spectral radius of the matrix.
+    """
+    n = weights.shape[0]
+    if method == 'auto':
+        method = 'iterative' if n > ITERATIVE_RADIUS_THRESHOLD or sp.issparse(weights) else 'dense'
+    if method == 'dense' or n < 3:
+        dense = weights.toarray() if sp.issparse(weights) else weights
+        return np.max(np.abs(la.eigvals(dense)))
+    if method != 'iterative':
+        raise ValueError("Unknown spectral radius method: %s" % method)
+
+    # eigenvalues of random reservoirs are clustered at the edge of the spectrum, with a single Ritz value ARPACK
+    # may converge to a smaller one, so a few largest ones are computed
+    k = min(6, n - 2)
+    # fixed starting vector, so the estimate does not depend on the global random state
+    v0 = ones(n) / np.sqrt(n)
+    eigenvalues = sla.eigs(weights, k=k, which='LM', tol=tol, ncv=min(n, 64), v0=v0, return_eigenvectors=False)
+    return np.max(np.abs(eigenvalues))
+
+
+class ReservoirState(object):
+    """State of a reservoir within a single game (time series)
+
+    Holds the current activation of the reservoir neurons and preallocated
+    work buffers, so a step runs without allocations. Batched state holds
+    independent states of several games (one row per game). Single instance
+    must not be used by more threads at once.
+
+    Parameters
+    ----------
+    n_components : int
+        Number of neurons in the reservoir.
+
+    n_features : int
+        Number of input features.
+
+    n_readout : int
+        Number of readout neurons.
+
+    persistent : bool, optional
+        If true, the activation persists between steps (echo state dynamics),
+        otherwise every step starts from the zero activation, default is True.
+
+    dtype : numpy float type, optional
+        Type of the activations, default is float64.
+
+    batch : int, optional
+        Number of games of a batched state, default is None (single game).
+    """
+
+    def __init__(self, n_components, n_features, n_readout, persistent=True, dtype=np.float64, batch=None):
+        self.persistent = persistent
+        self.batch = batch
+        shape = () if batch is None else (batch,)
+        self.activation = zeros(shape + (n_components,), dtype=dtype)
+        self.input = ones(shape + (1 + n_features,), dtype=dtype)
+        self.pre_activation = zeros(shape + (n_components,), dtype=dtype)
+        self.recurrent = zeros(shape + (n_components,), dtype=dtype)
+        self.readout = zeros(shape + (n_readout,), dtype=dtype)
+
+    def reset(self):
+        """Reset the activation to zeros (start of a new time series)"""
+        self.activation.fill(0)
 
 
 class SimpleESN(BaseEstimator, TransformerMixin):
@@ -70,13 +166,28 @@ class SimpleESN(BaseEstimator, TransformerMixin):
 
     random_state : integer or numpy.RandomState, optional
         Random number generator instance. If integer, fixes the seed.
+
+    dtype : numpy float type, optional
+        Type of the reservoir weights and activations, default is float64.
+
+    radius_method : {'auto', 'dense', 'iterative'}, optional
+        Computation of the spectral radius (see spectral_radius), default is
+        'auto' (iterative for reservoirs larger than ITERATIVE_RADIUS_THRESHOLD).
+
+    radius_tol : float, optional
+        Relative tolerance of the iterative spectral radius, default is 1e-4.
+
+    connectivity : float, optional
+        Fraction of nonzero recurrent connections. If set, the reservoir is
+        a scipy.sparse CSR matrix, so memory and step cost grow with the
+        number of connections. Default is None (dense reservoir).
         
     Attributes
     ----------
     input_weights_ : array_like, shape (n_features,)
         Weight of the input units
 
-    weights_ : array_Like, shape (n_components, n_components)
+    weights_ : array_Like or CSR matrix, shape (n_components, n_components)
         Weight matrix for the reservoir
 
     components_ : array_like, shape (n_samples, 1+n_features+n_components)
@@ -86,46 +197,76 @@ class SimpleESN(BaseEstimator, TransformerMixin):
 
     readout_idx_ : array_like, shape (n_readout,)
         Index of the randomly selected readout neurons
+
+    readout_rows_ : array_like, shape (n_readout,)
+        Index of the readout neurons within the reservoir (rows of weights_)
     """
 
     def __init__(self, n_readout, n_components, damping=0.5,
-                 weight_scaling=0.9, discard_steps=0, random_state=None):
+                 weight_scaling=0.9, discard_steps=0, random_state=None, dtype=np.float64,
+                 radius_method='auto', radius_tol=1e-4, connectivity=None):
         self.n_readout = n_readout
         self.n_components = n_components
         self.damping = damping
         self.weight_scaling = weight_scaling
         self.discard_steps = discard_steps
         self.random_state = check_random_state(random_state)
+        self.dtype = dtype
+        self.radius_method = radius_method
+        self.radius_tol = radius_tol
+        self.connectivity = connectivity
         self.input_weights_ = None
         self.readout_idx_ = None
+        self.readout_rows_ = None
+        self.readout_input_weights_ = None
         self.weights_ = None
 
     def init_weights(self, n_samples, n_features):
         if self.weights_ is None:
-            self.weights_ = self.random_state.rand(self.n_components,
-                                                   self.n_components) - 0.5
-            spectral_radius = np.max(np.abs(la.eig(self.weights_)[0]))
-            self.weights_ *= self.weight_scaling / spectral_radius
+            self.weights_ = self._generate_weights().astype(self.dtype, copy=False)
         if self.input_weights_ is None:
-            self.input_weights_ = self.random_state.rand(self.n_components,
-                                                         1 + n_features) - 0.5
+            self.input_weights_ = self._generate_input_weights(n_features).astype(self.dtype, copy=False)
         if self.readout_idx_ is None:
             self.readout_idx_ = self.random_state.permutation(arange(1 + n_features,
                                                                      1 + n_features + self.n_components))[
                                 :self.n_readout]
+        self._init_readout(n_features)
         self.components_ = zeros(shape=(1 + n_features + self.n_components,
-                                        n_samples))
+                                        n_samples), dtype=self.dtype)
+
+    def _generate_weights(self):
+        if self.connectivity is None:
+            weights = self.random_state.rand(self.n_components, self.n_components) - 0.5
+        else:
+            weights = sp.random(self.n_components, self.n_components, density=self.connectivity, format='csr',
+                                random_state=self.random_state, data_rvs=lambda k: self.random_state.rand(k) - 0.5)
+        weights *= self.weight_scaling / spectral_radius(weights, self.radius_method, self.radius_tol)
+        return weights
+
+    def _generate_input_weights(self, n_features):
+        return self.random_state.rand(self.n_components, 1 + n_features) - 0.5
+
+    def _recurrent(self, activation, out):
+        """Recurrent input of the reservoir (weights_ times activation of
+        every game), written to out"""
+        if sp.issparse(self.weights_):
+            out[...] = self.weights_.dot(activation.T).T
+        else:
+            np.dot(activation, self.weights_.T, out=out)
+        return out
+
+    def _init_readout(self, n_features):
+        self.readout_rows_ = self.readout_idx_ - (1 + n_features)
+        self.readout_input_weights_ = np.ascontiguousarray(self.input_weights_[self.readout_rows_])
 
     def _fit_transform(self, X):
         n_samples, n_features = X.shape
         X = check_array(X, ensure_2d=True)
-        self.weights_ = self.random_state.rand(self.n_components, self.n_components) - 0.5
-        spectral_radius = np.max(np.abs(la.eig(self.weights_)[0]))
-        self.weights_ *= self.weight_scaling / spectral_radius
-        self.input_weights_ = self.random_state.rand(self.n_components,
-                                                     1 + n_features) - 0.5
+        self.weights_ = self._generate_weights()
+        self.input_weights_ = self._generate_input_weights(n_features)
         self.readout_idx_ = self.random_state.permutation(arange(1 + n_features,
                                                                  1 + n_features + self.n_components))[:self.n_readout]
+        self._init_readout(n_features)
         self.components_ = zeros(shape=(1 + n_features + self.n_components,
                                         n_samples))
 
@@ -185,11 +326,11 @@ class SimpleESN(BaseEstimator, TransformerMixin):
         readout : array, shape (n_samples, n_readout)
             Reservoir activation generated by the readout neurons
         """
-        X = check_array(X, ensure_2d=True)
+        X = check_array(X, ensure_2d=True, dtype=self.dtype)
         n_samples, n_features = X.shape
 
-        curr_ = zeros(shape=(self.n_components, 1))
-        U = concatenate((ones(shape=(n_samples, 1)), X), axis=1)
+        curr_ = zeros(shape=(self.n_components, 1), dtype=self.dtype)
+        U = concatenate((ones(shape=(n_samples, 1), dtype=self.dtype), X), axis=1)
         for t in range(n_samples):
             u = array(U[t, :], ndmin=2).T
             curr_ = (1 - self.damping) * curr_ + self.damping * tanh(
@@ -197,3 +338,169 @@ class SimpleESN(BaseEstimator, TransformerMixin):
             self.components_[:, t] = vstack((u, curr_))[:, 0]
 
         return self.components_[self.readout_idx_, self.discard_steps:].T
+
+    def new_state(self, persistent=True, batch=None):
+        """Create a new reservoir state for a single game (time series)
+
+        Parameters
+        ----------
+        persistent : bool, optional
+            If true, the activation persists between steps, otherwise every
+            step starts from the zero activation (as 'transform' of one sample).
+
+        batch : int, optional
+            If set, a batched state of the specified number of games is
+            created (see step_batch).
+
+        Returns
+        -------
+        state : ReservoirState
+            Zero state of the reservoir.
+        """
+        return ReservoirState(self.n_components, self.input_weights_.shape[1] - 1, self.n_readout,
+                              persistent, self.dtype, batch)
+
+    def step(self, x, state):
+        """Advance the reservoir state by a single input, without allocations
+
+        Persistent states update the whole reservoir (sparse reservoirs by
+        sparse matrix-vector product). Otherwise, the previous
+        activation is zero, so only the readout neurons are computed.
+
+        Parameters
+        ----------
+        x : array-like, shape (n_features,)
+            Input of the current step.
+
+        state : ReservoirState
+            State of the reservoir, updated in place.
+
+        Returns
+        -------
+        readout : array, shape (n_readout,)
+            Activation of the readout neurons (buffer of the state, valid until
+            the next step)
+        """
+        state.input[1:] = x
+        if not state.persistent:
+            pre_activation = state.readout
+            np.dot(self.readout_input_weights_, state.input, out=pre_activation)
+            tanh(pre_activation, out=pre_activation)
+            pre_activation *= self.damping
+            return state.readout
+
+        np.dot(self.input_weights_, state.input, out=state.pre_activation)
+        state.pre_activation += self._recurrent(state.activation, state.recurrent)
+        tanh(state.pre_activation, out=state.pre_activation)
+        state.pre_activation *= self.damping
+        state.activation *= 1 - self.damping
+        state.activation += state.pre_activation
+        np.take(state.activation, self.readout_rows_, out=state.readout)
+        return state.readout
+
+    def step_batch(self, X, state):
+        """Advance a batched reservoir state, one input per game
+
+        All games are stepped by a single matrix-matrix product with the
+        reservoir, instead of one matrix-vector product per game.
+
+        Parameters
+        ----------
+        X : array-like, shape (batch, n_features)
+            Inputs of the current step (row i is the input of game i).
+
+        state : ReservoirState
+            Batched state of the reservoir, updated in place.
+
+        Returns
+        -------
+        readout : array, shape (batch, n_readout)
+            Activation of the readout neurons (buffer of the state, valid until
+            the next step)
+        """
+        state.input[:, 1:] = X
+        if not state.persistent:
+            pre_activation = state.readout
+            np.dot(state.input, self.readout_input_weights_.T, out=pre_activation)
+            tanh(pre_activation, out=pre_activation)
+            pre_activation *= self.damping
+            return state.readout
+
+        np.dot(state.input, self.input_weights_.T, out=state.pre_activation)
+        state.pre_activation += self._recurrent(state.activation, state.recurrent)
+        tanh(state.pre_activation, out=state.pre_activation)
+        state.pre_activation *= self.damping
+        state.activation *= 1 - self.damping
+        state.activation += state.pre_activation
+        np.take(state.activation, self.readout_rows_, axis=1, out=state.readout)
+        return state.readout
+
+
+class CycleESN(SimpleESN):
+    """Cycle Reservoir with Jumps (Rodan and Tino, 2012)
+
+    Structured reservoir: every neuron is connected to the previous one in
+    a cycle with the same weight, optionally with bidirectional jumps
+    (every jump_size-th neuron) of another fixed weight. All input weights
+    have the same magnitude, only their signs are random. The recurrent
+    update is a permutation plus scaling, so a step costs O(n_components)
+    and no eigendecomposition is needed at setup. The weight matrix is
+    kept (as CSR) for 'transform' and inspection only.
+
+    Parameters
+    ----------
+    n_readout, n_components, damping, discard_steps, random_state, dtype :
+        Same as SimpleESN.
+
+    weight_scaling : float, optional
+        Weight of the cycle connections (spectral radius of the cycle
+        without jumps), default is 0.9
+
+    jump_size : int, optional
+        Distance of neurons connected by jumps, default is None (no jumps).
+
+    jump_weight : float, optional
+        Weight of the jump connections, default is 0.3
+
+    input_scaling : float, optional
+        Magnitude of the input weights, default is 0.5
+    """
+
+    def __init__(self, n_readout, n_components, damping=0.5, weight_scaling=0.9, discard_steps=0,
+                 random_state=None, dtype=np.float64, jump_size=None, jump_weight=0.3, input_scaling=0.5):
+        super(CycleESN, self).__init__(n_readout, n_components, damping, weight_scaling, discard_steps,
+                                       random_state, dtype)
+        self.jump_size = jump_size
+        self.jump_weight = jump_weight
+        self.input_scaling = input_scaling
+        self.jumps_ = zeros(0, dtype=int)
+        if jump_size is not None:
+            self.jumps_ = arange(0, n_components - n_components % jump_size, jump_size)
+        # neighbours of every jump neuron (previous and next one on the jump cycle)
+        self.jump_prev_ = np.roll(self.jumps_, 1)
+        self.jump_next_ = np.roll(self.jumps_, -1)
+
+    def _generate_weights(self):
+        n = self.n_components
+        rows = [arange(n)]
+        cols = [np.roll(arange(n), 1)]
+        data = [np.full(n, self.weight_scaling)]
+        if len(self.jumps_) > 1:
+            rows += [self.jumps_, self.jumps_]
+            cols += [self.jump_prev_, self.jump_next_]
+            data += [np.full(2 * len(self.jumps_), self.jump_weight)]
+        return sp.coo_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+                             shape=(n, n)).tocsr()
+
+    def _generate_input_weights(self, n_features):
+        signs = np.where(self.random_state.rand(self.n_components, 1 + n_features) < 0.5, -1.0, 1.0)
+        return self.input_scaling * signs
+
+    def _recurrent(self, activation, out):
+        out[..., 1:] = activation[..., :-1]
+        out[..., 0] = activation[..., -1]
+        out *= self.weight_scaling
+        if len(self.jumps_) > 1:
+            out[..., self.jumps_] += self.jump_weight * (activation[..., self.jump_prev_] +
+                                                         activation[..., self.jump_next_])
+        return out
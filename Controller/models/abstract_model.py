@@ -1,3 +1,6 @@
+import numpy as np
+
+
 class AbstractModel():
     """
     Wrapper for all models for evaluating input from a game.
@@ -13,6 +16,25 @@ class AbstractModel():
     def evaluate(self, input, current_phase):
         raise NotImplementedError
 
+    def evaluate_batch(self, inputs, current_phase):
+        """
+        Evaluates several inputs of the same game phase (override for batched inference).
+        :param inputs: List of inputs.
+        :param current_phase: Current game phase.
+        :return: List of outputs (NumPy arrays).
+        """
+        return [np.array(self.evaluate(input, current_phase), dtype=np.float64) for input in inputs]
+
+    def reset_state(self):
+        """
+        Resets the internal state of the model (if any) at the start of a new game, called by games of the calling
+        thread.
+        """
+        pass
+
+    def get_population(self, models):
+        raise NotImplementedError
+
     def get_number_of_parameters(self, game):
         raise NotImplementedError
 
@@ -0,0 +1,145 @@
+import numpy as np
+import scipy.sparse
+import constants
+from utils import activations
+
+# precision -> (storage type of weights, computation type)
+PRECISIONS = {
+    "float64": (np.float64, np.float64),
+    "float32": (np.float32, np.float32),
+    "float16": (np.float16, np.float32),
+}
+
+
+def get_precision(name):
+    """
+    Returns storage and computation types of the specified precision.
+    :param name: Name of the precision ('float64', 'float32' or 'float16').
+    :return: Tuple (storage type, computation type).
+    """
+    if name in PRECISIONS:
+        return PRECISIONS[name]
+
+    raise ValueError(f"Unknown precision: {name}, use one of {list(PRECISIONS)}.")
+
+
+def as_flat_weights(weights, dtype=None):
+    """
+    Returns the specified weights as a contiguous 1-D float array. NumPy arrays of the requested type are returned
+    without copying, other sequences (e.g. individuals of the evolution) are converted once.
+    :param weights: Weights (NumPy array, list...).
+    :param dtype: Requested type (None = any float type of an array, float64 otherwise).
+    :return: Contiguous 1-D float array.
+    """
+    if isinstance(weights, np.ndarray) and weights.dtype.kind == "f" and (dtype is None or weights.dtype == dtype):
+        return np.ascontiguousarray(weights).reshape(-1)
+    return np.asarray(weights, dtype=dtype or np.float64).reshape(-1)
+
+
+class DenseNetwork():
+    """
+    Compiled forward pass of a fully connected network, shared by MLP and Echo-State output layers. Every weight matrix
+    (with the bias in its last row) is split into the weight and bias parts and every layer has its own preallocated
+    output buffer, so the forward pass runs without allocations. Layers whose weight matrix is sparse enough (e.g.
+    pruned) are multiplied as CSR matrices. Single instance must not be used by more threads at once.
+    """
+
+    def __init__(self, layer_sizes, activation, weights, precision="float64", normalize_output=True):
+        """
+        Initializes a new instance of DenseNetwork.
+        :param layer_sizes: Sizes of all layers (including input and output layer).
+        :param activation: Name of the activation function.
+        :param weights: All weights of the network (for every layer, row-major matrix (input + 1) x output). Layer
+        matrices are views of the weights if they are a contiguous array of the storage type.
+        :param precision: Precision of the network (weights are stored in the storage type and converted to the
+        computation type, if they differ).
+        :param normalize_output: If true, outputs are normalized to [0, 1] (min-max), otherwise they are returned as
+        computed by the last layer.
+        """
+        self.layer_sizes = layer_sizes
+        self.normalize_output = normalize_output
+        self.activation = activations.get_activation(activation)
+        self.precision = precision
+        storage_type, self.dtype = get_precision(precision)
+        self.weights = as_flat_weights(weights, storage_type)
+
+        weights = self.weights.astype(self.dtype, copy=False)
+        self.input = np.empty(self.layer_sizes[0], dtype=self.dtype)
+        l_bound = 0
+        r_bound = 0
+        self.layers = []
+        for i in range(len(self.layer_sizes) - 1):
+            m = self.layer_sizes[i] + 1
+            n = self.layer_sizes[i + 1]
+            r_bound += m * n
+            matrix = weights[l_bound:r_bound].reshape(m, n)
+            self.layers.append((matrix[:-1], matrix[-1], np.empty(n, dtype=matrix.dtype)))
+            l_bound = r_bound
+        self.output = np.empty(self.layer_sizes[-1], dtype=self.dtype)
+
+        # transposed CSR matrices of sparse layers (None = dense layer)
+        self.sparse_layers = []
+        for W, _, _ in self.layers:
+            # small layers stay dense without counting their zeros (instances are created for every evaluation)
+            if (W.size >= constants.SPARSE_INFERENCE_MIN_SIZE and
+                    1 - np.count_nonzero(W) / W.size >= constants.SPARSE_INFERENCE_THRESHOLD):
+                self.sparse_layers.append(scipy.sparse.csr_matrix(W.T))
+            else:
+                self.sparse_layers.append(None)
+
+    def forward(self, x):
+        """
+        Performs forward pass, output is normalized to [0, 1] (if 'normalize_output' is set).
+        :param x: Input of the network.
+        :return: Output of the network (internal buffer, valid until the next forward pass).
+        """
+        if x.dtype != self.dtype:
+            self.input[...] = x
+            x = self.input
+        for (W, b, out), sparse in zip(self.layers, self.sparse_layers):
+            if sparse is None:
+                np.matmul(x, W, out=out)
+            else:
+                out[...] = sparse.dot(x)
+            np.add(out, b, out=out)
+            self.activation(out, out=out)
+            x = out
+
+        if not self.normalize_output:
+            self.output[...] = x
+            return self.output
+        return activations.normalize(x, out=self.output)
+
+    def forward_batch(self, x):
+        """
+        Performs forward pass of several inputs at once, outputs are normalized to [0, 1] (each one separately, if
+        'normalize_output' is set).
+        :param x: Inputs of the network (batch x input).
+        :return: Outputs of the network (batch x output, a new array).
+        """
+        x = np.asarray(x, dtype=self.dtype)
+        for (W, b, _), sparse in zip(self.layers, self.sparse_layers):
+            x = np.matmul(x, W) if sparse is None else sparse.dot(x.T).T
+            np.add(x, b, out=x)
+            self.activation(x, out=x)
+
+        return activations.normalize(x, out=x) if self.normalize_output else x
+
+    def get_pruned_weights(self, sparsity):
+        """
+        Prunes weights by magnitude: in every layer, the specified fraction of weights with the smallest absolute
+        values is set to zero (biases are kept).
+        :param sparsity: Target sparsity of weight matrices (0-1).
+        :return: Pruned weights (flat array of the storage type, same layout as 'weights').
+        """
+        pruned = self.weights.copy()
+        l_bound = 0
+        for W, b, _ in self.layers:
+            m, n = W.shape
+            matrix = pruned[l_bound:l_bound + (m + 1) * n].reshape(m + 1, n)[:-1]
+            count = int(np.ceil(sparsity * matrix.size))
+            if count > 0:
+                smallest = np.argpartition(np.abs(matrix), count - 1, axis=None)[:count]
+                matrix.reshape(-1)[smallest] = 0
+            l_bound += (m + 1) * n
+        return pruned
@@ -1,33 +1,36 @@
 import numpy as np
-import json
-import utils.activations
+import scipy.linalg
+import constants
 import utils.miscellaneous
-import lib.simple_esn
-from threading import Lock
+import utils.model_files
+import threading
 
 from models.abstract_model import AbstractModel
+from models.dense_network import DenseNetwork, as_flat_weights, get_precision
+from models.mlp import MLP
+from models.reservoir_registry import ReservoirRegistry
 
 
 class EchoState(AbstractModel):
     """
-    Represents Echo-State Network model. Can contain multiple networks (echo state models).
+    Represents Echo-State Network model. Can contain multiple networks (echo state models). Models of the same
+    reservoir configuration share the reservoir (see ReservoirRegistry).
     """
-    state_check_lock = Lock()
-    library_esn = None
-    echo_state_seed = None
+    registry = ReservoirRegistry()
+    # seed of reservoirs of models created without a seed (the same for the whole process)
+    default_seed = None
 
     @staticmethod
-    def load_from_file(file_name, game):
+    def load_from_file(file_name, game, precision=None):
         """
         Loads EchoState model from the specified file.
         :param file_name: File with stored model.
         :param game: Game to be used for.
+        :param precision: Precision of the model (None = precision stored in the file or the default one).
         :return: Instance of EchoState model.
         """
         try:
-            with open(file_name, "r") as f:
-                data = json.load(f)
-
+            data = utils.model_files.read_model(file_name)
             weights = data["weights"]
             model = data["model"]
             hidden = list(map(int, model["output_layers"]))
@@ -35,68 +38,98 @@ class EchoState(AbstractModel):
             n_readouts = int(model["n_readouts"])
             n_components = int(model["n_components"])
             seed = int(model["echo_state_seed"])
+            stored_precision = model.get("precision")
+            stateful = bool(model.get("stateful", False))
+            connectivity = model.get("connectivity")
+            reservoir = model.get("reservoir", "random")
+            jump_size = model.get("jump_size")
+            # models stored before phases got their own slices of weights (all phases use the leading weights)
+            phase_slicing = bool(model.get("phase_slicing", False))
+            normalize_output = bool(model.get("normalize_output", True))
         except:
             raise ValueError("File has wrong format.")
 
         game_config = utils.miscellaneous.get_game_config(game)
         print(f"Loading Echo-State model from file {file_name}")
-        return EchoState(n_readouts, n_components, hidden, activation, weights, game_config, seed)
+        return EchoState(n_readouts, n_components, hidden, activation, weights, game_config, seed,
+                         precision or stored_precision or constants.MODEL_PRECISION, stateful, connectivity, reservoir,
+                         jump_size, phase_slicing, normalize_output)
 
-    class EchoStateNetwork():
+    class EchoStateNetwork(DenseNetwork):
         """
         Represents Echo-State network model (internally). Single Network.
         """
 
-        def __init__(self, layer_sizes, activation, weights):
-            """
-            Initializes a new instance of EchoStateNetwork (internal representation; single network).
-            :param layer_sizes: Sizes of output layers.
-            :param activation: Activation for output layers.
-            :param weights: Weights of the output layers.
-            """
-            self.layer_sizes = layer_sizes
-            self.activation = utils.activations.get_activation(activation)
-            self.weights = weights
-
-            weights = np.array(list(map(float, self.weights)))
-            l_bound = 0
-            r_bound = 0
-            self.matrices = []
-            for i in range(len(self.layer_sizes) - 1):
-                m = self.layer_sizes[i] + 1
-                n = self.layer_sizes[i + 1]
-                r_bound += m * n
-                self.matrices.append(weights[l_bound:r_bound:1].reshape(m, n))
-                l_bound = r_bound
-
-        def predict(self, input):
+        def predict(self, input, reservoir_state):
             """
             Predicts output for the specified input.
             :param input: Input to the network.
-            :return:
+            :param reservoir_state: State of the reservoir within the current game (updated in place).
+            :return: Output of the network (reused buffer, valid until the next forward pass).
+            """
+            return self.forward(self.esn.step(input, reservoir_state))
+
+        def __init__(self, esn, layer_sizes, activation, weights, precision="float64", normalize_output=True):
+            """
+            Initializes a new instance of EchoStateNetwork.
+            :param esn: Reservoir (SimpleESN) of the network.
+            :param layer_sizes: Sizes of output layers (including readout and output layer).
+            :param activation: Name of the activation function.
+            :param weights: Weights of output layers.
+            :param precision: Precision of output layers.
+            :param normalize_output: If true, outputs are normalized to [0, 1].
+            """
+            super().__init__(layer_sizes, activation, weights, precision, normalize_output)
+            self.esn = esn
+
+    class EchoStatePopulation(MLP.MLPPopulation):
+        """
+        Represents a population of Echo-State models sharing one reservoir, evaluated at once. Reservoir states of all
+        P games are advanced by a single matrix-matrix product with the reservoir, readouts of all models are stacked
+        (as in MLPPopulation) and evaluated by a single batched matmul per layer.
+        """
+
+        def __init__(self, models):
+            """
+            Initializes a new instance of EchoStatePopulation (weights of readouts are copied into stacked tensors).
+            :param models: Echo-State models (individuals) with the same reservoir and output layers.
             """
-            x = np.array(input)
+            super().__init__(models)
+            self.esn = models[0].esn
+            if any(model.esn is not self.esn for model in models):
+                raise ValueError("Models of the population must share the reservoir.")
+            self.stateful = models[0].stateful
+            self.reservoir_state = self.esn.new_state(self.stateful, batch=self.size)
 
-            # reservoir ESN assume (n_samples, n_features)
-            x = EchoState.library_esn.transform(x.reshape(-1, len(input))).flatten()  # we have only one sample
-            for W in self.matrices:
-                x = np.concatenate((x, [1]), axis=0)
-                x = self.activation(np.matmul(x, W))
+        def keep(self, rows):
+            """
+            Keeps only the specified models for next steps (see 'MLPPopulation.keep'). Kept models keep their
+            reservoir states, models that were not kept before start from the zero state.
+            :param rows: Indices (sorted) of the kept models within the whole population.
+            """
+            rows = np.asarray(rows)
+            kept = np.isin(rows, self.rows)
+            activation = self.reservoir_state.activation[np.searchsorted(self.rows, rows[kept])]
+            super().keep(rows)
+            self.reservoir_state = self.esn.new_state(self.stateful, batch=len(rows))
+            self.reservoir_state.activation[kept] = activation
 
-            x = self.normalize(x)
-            return x
+        def reset_state(self):
+            """
+            Resets reservoir states of all games (start of new games).
+            """
+            self.reservoir_state.reset()
 
-        def normalize(self, x):
+        def evaluate(self, states, current_phase):
             """
-            Normalizes the specified interval to [0, 1].
-            :param x: Values to be normalized.
-            :return: Normalized [0, 1] interval.
+            Performs a single step of all (kept) reservoir states and a forward pass of all (kept) readouts.
+            :param states: States of games (P x input, row i is the input of model i; K x input if only K models
+            are kept, see 'keep').
+            :param current_phase: Current game phase (same for all games).
+            :return: Outputs of models (P x output or K x output; reused buffer, valid until the next forward pass).
             """
-            min_val = min(x)
-            max_val = max(x)
-            if max_val - min_val == 0:
-                return x
-            return np.array([((x_i - min_val) / (max_val - min_val)) for x_i in x])
+            features = self.esn.step_batch(states, self.reservoir_state)
+            return super().evaluate(features, current_phase)
 
     def get_name(self):
         """
@@ -111,16 +144,30 @@ class EchoState(AbstractModel):
         return "EchoState"
 
     def __init__(self, n_readout, n_components, output_layers, activation, weights=None, game_config=None,
-                 echo_state_seed=None):
+                 echo_state_seed=None, precision=constants.MODEL_PRECISION, stateful=True, connectivity=None,
+                 reservoir="random", jump_size=None, phase_slicing=True, normalize_output=True):
         """
         Initializes a new instance of Echo-State network model.
         :param n_readout: Number of readout neurons, chosen randomly in the reservoir.
         :param n_components: Number of neurons in the reservoir
         :param output_layers: Sizes of output layers.
         :param activation: Activation for output layers.
-        :param weights: Weights of output layers.
+        :param weights: Weights of output layers (list or contiguous float array; arrays are used without copying,
+        output layers of all phases are views of them).
         :param game_config: Game configuration file.
-        :param echo_state_seed: Seed for echo state network library.
+        :param echo_state_seed: Seed for echo state network library (None = seed shared by all models of the process
+        created without a seed).
+        :param precision: Numeric precision of the reservoir and output layers ('float64', 'float32' or 'float16' =
+        float16 storage of weights with float32 computation; the reservoir always uses the computation type).
+        :param stateful: If true, the reservoir activation persists between steps of a game (echo-state dynamics),
+        otherwise every step starts from the zero activation.
+        :param connectivity: Fraction of nonzero connections of a sparse reservoir (None = dense reservoir).
+        :param reservoir: Type of the reservoir ('random' or 'cycle' = cycle reservoir with O(n) step, see CycleESN).
+        :param jump_size: Distance of neurons connected by jumps of a cycle reservoir (None = no jumps).
+        :param phase_slicing: If true, output layers of every game phase use their own slice of the weights, otherwise
+        all phases use the leading weights (format of models stored without the 'phase_slicing' marker).
+        :param normalize_output: If true, outputs are normalized to [0, 1] (min-max), otherwise the output layer is
+        returned as it is (readouts fitted by 'fit_readout').
         """
         self.n_readout = n_readout
         self.n_components = n_components
@@ -128,19 +175,32 @@ class EchoState(AbstractModel):
         self.activation = activation
         self.weights = weights
         self.game_config = game_config
+        self.precision = precision
+        self.stateful = stateful
+        self.connectivity = connectivity
+        self.reservoir = reservoir
+        self.jump_size = jump_size
+        self.phase_slicing = phase_slicing
+        self.normalize_output = normalize_output
+        self.local = threading.local()
+        dtype = get_precision(precision)[1]
 
-        if EchoState.library_esn is None or echo_state_seed != None:
-            if echo_state_seed is None:
-                EchoState.echo_state_seed = np.random.randint(0, 2 ** 16)
-            else:
-                EchoState.echo_state_seed = echo_state_seed
+        if echo_state_seed is None:
+            if EchoState.default_seed is None:
+                EchoState.default_seed = np.random.randint(0, 2 ** 16)
+            echo_state_seed = EchoState.default_seed
+        self.echo_state_seed = int(echo_state_seed)
 
-            EchoState.library_esn = lib.simple_esn.SimpleESN(n_readout, n_components,
-                                                             random_state=EchoState.echo_state_seed)
+        self.shared_reservoir = EchoState.registry.acquire(self, self.echo_state_seed, n_readout, n_components, dtype,
+                                                           connectivity, reservoir, jump_size)
+        self.esn = self.shared_reservoir.esn
+        # readout features of stateless models depend only on the input (shared by all models of the reservoir)
+        self.projection_cache = None if stateful else self.shared_reservoir.projection_cache
 
         if weights is not None and game_config is not None:
             # Init the network
             phases = self.game_config["game_phases"]
+            flat_weights = as_flat_weights(weights, get_precision(precision)[0])
             self.models = []
             used_weights = 0
             output_layers = self.output_layers
@@ -149,13 +209,11 @@ class EchoState(AbstractModel):
                 output_size = self.game_config["output_sizes"][phase]
                 layer_sizes = [n_readout] + output_layers + [output_size]
 
-                EchoState.state_check_lock.acquire()
-                if EchoState.library_esn.weights_ is None:
-                    EchoState.library_esn.init_weights(n_samples=1, n_features=input_size)
-                EchoState.state_check_lock.release()
+                self.shared_reservoir.init_weights(input_size)
 
-                if (phases == 1):
-                    self.models.append(self.EchoStateNetwork(layer_sizes, activation, weights))
+                if (phases == 1) or not phase_slicing:
+                    self.models.append(self.EchoStateNetwork(self.esn, layer_sizes, activation, flat_weights,
+                                                             precision, normalize_output))
                 else:
                     # slice all weights and use only reliable weights to the current phase
                     new_used_weights = used_weights
@@ -167,25 +225,133 @@ class EchoState(AbstractModel):
                         for i in range(len(output_layers) - 1):
                             new_used_weights += (output_layers[i] + 1) * output_layers[i + 1]
                         new_used_weights += (output_layers[-1] + 1) * output_size
-                    self.models.append(self.EchoStateNetwork(layer_sizes, activation, weights))
+                    self.models.append(self.EchoStateNetwork(self.esn, layer_sizes, activation,
+                                                             flat_weights[used_weights:new_used_weights], precision,
+                                                             normalize_output))
                     used_weights = new_used_weights
 
-    def get_new_instance(self, weights, game_config):
+    def get_new_instance(self, weights, game_config, activation=None, normalize_output=None):
         """
         Creates a new instance of current model, using the specified weights and game configuration.
         :param weights: Weights for the new instance model.
         :param game_config: Game configuration file.
+        :param activation: Activation function of the new instance (None = activation of the current model).
+        :param normalize_output: Normalization of outputs of the new instance (None = as the current model).
         :return: a new instance of current model.
         """
         return EchoState(
             self.n_readout,
             self.n_components,
             self.output_layers,
-            self.activation,
+            activation or self.activation,
             weights,
             game_config,
+            self.echo_state_seed,
+            precision=self.precision,
+            stateful=self.stateful,
+            connectivity=self.connectivity,
+            reservoir=self.reservoir,
+            jump_size=self.jump_size,
+            phase_slicing=self.phase_slicing,
+            normalize_output=self.normalize_output if normalize_output is None else normalize_output,
         )
 
+    def __reduce__(self):
+        """
+        Pickles the model by its parameters (e.g. a template sent to worker processes): the unpickled model acquires
+        the reservoir of the same configuration from the registry of its process.
+        """
+        return EchoState, (self.n_readout, self.n_components, self.output_layers, self.activation, self.weights,
+                           self.game_config, self.echo_state_seed, self.precision, self.stateful, self.connectivity,
+                           self.reservoir, self.jump_size, self.phase_slicing, self.normalize_output)
+
+    def get_population(self, models):
+        """
+        Creates a population of the specified models for batched (lockstep) evaluation.
+        :param models: Echo-State models with the same reservoir and output layers as the current model.
+        :return: Instance of EchoStatePopulation.
+        """
+        return EchoState.EchoStatePopulation(models)
+
+    def get_readout_features(self, trajectories):
+        """
+        Collects readout features of recorded trajectories (the reservoir state is reset at the start of every
+        trajectory, as at the start of a game).
+        :param trajectories: List of trajectories, each one is a list of tuples (state, phase, action).
+        :return: Dictionary phase -> tuple (features (N x n_readout), actions (N x output)).
+        """
+        reservoir_state = self.esn.new_state(self.stateful)
+        features, actions = {}, {}
+        for trajectory in trajectories:
+            reservoir_state.reset()
+            for state, phase, action in trajectory:
+                features.setdefault(phase, []).append(self.esn.step(state, reservoir_state).astype(np.float64))
+                actions.setdefault(phase, []).append(np.asarray(action, dtype=np.float64))
+        return {phase: (np.array(features[phase]), np.array(actions[phase])) for phase in features}
+
+    def fit_readout(self, trajectories, game_config, alpha=1e-3, one_hot=False):
+        """
+        Fits readout weights to actions of recorded trajectories (e.g. played by an expert, search agent or DQN) by
+        ridge regression: weights of every phase are a single linear solve for all outputs at once. Available only
+        for models without hidden output layers. The fitted model has the 'linear' activation and its outputs are not
+        normalized, so it returns the fitted readout (readout features times the fitted weights) in the space of the
+        recorded actions. Its weights should not be evolved by templates with other activation or normalization.
+        :param trajectories: List of trajectories, each one is a list of tuples (state, phase, action).
+        :param game_config: Game configuration file.
+        :param alpha: Regularization strength (the bias is not regularized).
+        :param one_hot: If true, targets are one-hot vectors of the best actions (argmax), otherwise the actions.
+        :return: New instance of EchoState with fitted weights (can be saved by 'save_to_file').
+        """
+        if len(self.output_layers) > 0:
+            raise ValueError("Readout can be fitted only for models without output layers.")
+
+        # instance with zero weights initializes the reservoir
+        n_weights = sum((self.n_readout + 1) * size for size in game_config["output_sizes"])
+        model = self.get_new_instance(np.zeros(n_weights), game_config)
+        data = model.get_readout_features(trajectories)
+
+        weights = []
+        for phase in range(game_config["game_phases"]):
+            if phase not in data:
+                raise ValueError(f"Trajectories contain no states of phase {phase}.")
+            X, Y = data[phase]
+            if one_hot:
+                Y = np.eye(Y.shape[1])[np.argmax(Y, axis=1)]
+            X = np.hstack((X, np.ones((len(X), 1))))
+            regularization = alpha * np.eye(X.shape[1])
+            regularization[-1, -1] = 0
+            W = scipy.linalg.solve(X.T @ X + regularization, X.T @ Y, assume_a="sym")
+            weights.append(W.reshape(-1))
+            print(f"Phase {phase}: fitted readout on {len(X)} states")
+
+        return self.get_new_instance(np.concatenate(weights), game_config, activation="linear", normalize_output=False)
+
+    def prune(self, sparsity):
+        """
+        Creates a pruned copy of the current model (magnitude pruning of every layer, biases are kept). Layers sparse
+        enough are evaluated as CSR matrices.
+        :param sparsity: Target sparsity of weight matrices (0-1).
+        :return: New instance of EchoState with pruned weights.
+        """
+        if not self.phase_slicing and len(self.models) > 1:
+            raise ValueError("Phases of models in the legacy format share weights, they cannot be pruned separately.")
+        weights = np.concatenate([network.get_pruned_weights(sparsity) for network in self.models])
+        return self.get_new_instance(weights, self.game_config)
+
+    def save_to_file(self, file_name):
+        """
+        Saves the current model to the specified file (same format as models logged by the evolution, weights are
+        stored in their storage type).
+        :param file_name: File to save to.
+        """
+        if self.phase_slicing:
+            weights = np.concatenate([network.weights for network in self.models])
+        else:
+            # all phases use the same weights
+            weights = self.models[0].weights
+        data = {"model": self.to_dictionary(), "model_name": self.get_name()}
+        utils.model_files.write_model(file_name, data, weights, dtype=weights.dtype)
+
     def get_number_of_parameters(self, game):
         """
         Evaluates number of parameters of neural networks (e.q. weights of network).
@@ -212,14 +378,38 @@ class EchoState(AbstractModel):
         :param input: Input from the game.
         :return: Output of the forward pass.
         """
-        return self.models[current_phase].predict(input)
+        network = self.models[current_phase]
+        if self.projection_cache is None:
+            return network.predict(input, self.get_reservoir_state())
+
+        key = np.asarray(input, dtype=self.esn.dtype).tobytes()
+        features = self.projection_cache.get(key)
+        if features is None:
+            features = self.projection_cache.put(key, self.esn.step(input, self.get_reservoir_state()).copy())
+        return network.forward(features)
+
+    def get_reservoir_state(self):
+        """
+        Returns the reservoir state of the calling thread (created on the first call). Every thread plays its own
+        game, so games running in parallel never share a state.
+        """
+        if not hasattr(self.local, "reservoir_state"):
+            self.local.reservoir_state = self.esn.new_state(self.stateful)
+        return self.local.reservoir_state
+
+    def reset_state(self):
+        """
+        Resets the reservoir state of the calling thread (start of a new game).
+        """
+        if hasattr(self.local, "reservoir_state"):
+            self.local.reservoir_state.reset()
 
     def to_string(self):
         """
         A string representation of the current object, that describes parameters.
         :return: A string representation of the current object.
         """
-        return f"ESN - echo-state-size: {self.n_components}, n_readouts: {self.n_readout}, output_layers: {self.output_layers}, activation: {self.activation}"
+        return f"ESN - echo-state-size: {self.n_components}, n_readouts: {self.n_readout}, output_layers: {self.output_layers}, activation: {self.activation}, precision: {self.precision}, stateful: {self.stateful}, connectivity: {self.connectivity}, reservoir: {self.reservoir}, jump_size: {self.jump_size}, normalize_output: {self.normalize_output}"
 
     def to_dictionary(self):
         """
@@ -231,5 +421,12 @@ class EchoState(AbstractModel):
             "n_components": self.n_components,
             "output_layers": self.output_layers,
             "activation": self.activation,
-            "echo_state_seed": EchoState.echo_state_seed,
+            "echo_state_seed": self.echo_state_seed,
+            "precision": self.precision,
+            "stateful": self.stateful,
+            "connectivity": self.connectivity,
+            "reservoir": self.reservoir,
+            "jump_size": self.jump_size,
+            "phase_slicing": self.phase_slicing,
+            "normalize_output": self.normalize_output,
         }
@@ -48,7 +48,7 @@ class LearnedDQN(AbstractModel):
         :param current_phase: Current game phase.
         :return: Action.
         """
-        action = self.dqn.agent.eGreedyAction(np.array(input)[np.newaxis, :], explore=False)
+        action = self.dqn.agent.eGreedyAction(np.asarray(input)[np.newaxis, :], explore=False)
         return self.dqn.convert_to_sequence(action)
 
     def get_name(self):
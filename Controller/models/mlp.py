@@ -1,8 +1,9 @@
 import numpy as np
 import constants
-import json
 import utils.miscellaneous
+import utils.model_files
 from models.abstract_model import AbstractModel
+from models.dense_network import DenseNetwork, as_flat_weights, get_precision
 from utils import activations
 
 
@@ -13,78 +14,126 @@ class MLP(AbstractModel):
     """
 
     @staticmethod
-    def load_from_file(file_name, game):
+    def load_from_file(file_name, game, precision=None):
         """
         Loads a MLP model from the specified file.
         :param file_name: File to load from.
         :param game: Game for the current model.
+        :param precision: Precision of the model (None = precision stored in the file or the default one).
         :return: Instance of MLP model.
         """
         try:
-            with open(file_name, "r") as f:
-                data = json.load(f)
-
+            data = utils.model_files.read_model(file_name)
             weights = data["weights"]
             if "activation" in data:
                 # old format
                 hidden = list(map(int, data["hidden_sizes"]))
                 activation = data["activation"]
+                stored_precision = None
             else:
                 # new format
                 hidden = list(map(int, data["model"]["hidden_layers"]))
                 activation = data["model"]["activation"]
+                stored_precision = data["model"].get("precision")
         except:
             raise ValueError("File has wrong format.")
 
         game_config = utils.miscellaneous.get_game_config(game)
         print(f"Loading MLP model from file {file_name}")
-        return MLP(hidden_layers=hidden, activation=activation, weights=weights, game_config=game_config)
+        return MLP(hidden_layers=hidden, activation=activation, weights=weights, game_config=game_config,
+                   precision=precision or stored_precision or constants.MODEL_PRECISION)
 
-    class MLPNetwork():
+    class MLPNetwork(DenseNetwork):
         """
         Represents MLP network model (internally). Single Network.
         """
-        def __init__(self, layer_sizes, activation, weights):
-            self.layer_sizes = layer_sizes
-            self.activation = activations.get_activation(activation)
-            self.weights = weights
-
-            weights = np.array(list(map(float, self.weights)))
-            l_bound = 0
-            r_bound = 0
-            self.matrices = []
-            for i in range(len(self.layer_sizes) - 1):
-                m = self.layer_sizes[i] + 1
-                n = self.layer_sizes[i + 1]
-                r_bound += m * n
-                self.matrices.append(weights[l_bound:r_bound:1].reshape(m, n))
-                l_bound = r_bound
 
         def predict(self, input):
             """
             Performs forward pass in the current network instance.
             :param input: Input to the neural network.
-            :return: Output of the neural network.
+            :return: Output of the neural network (reused buffer, valid until the next forward pass).
+            """
+            return self.forward(np.asarray(input))
+
+    class MLPPopulation():
+        """
+        Represents a population of MLP models with the same architecture, evaluated at once. Weights of all P models
+        are stacked into 3-D tensors (P x input x output), so a single batched matmul per layer computes outputs of all
+        models, each one for its own state (game).
+        """
+
+        def __init__(self, models):
+            """
+            Initializes a new instance of MLPPopulation (weights are copied into the stacked tensors).
+            :param models: MLP models (individuals) with the same architecture.
             """
-            x = np.array(input)
-            for W in self.matrices:
-                x = np.concatenate((x, [1]), axis=0)
-                x = self.activation(np.matmul(x, W))
+            self.size = len(models)
+            self.phases = []
+            for phase in range(len(models[0].models)):
+                networks = [model.models[phase] for model in models]
+                layers = []
+                for i, (_, _, out) in enumerate(networks[0].layers):
+                    W = np.stack([network.layers[i][0] for network in networks])
+                    b = np.stack([network.layers[i][1] for network in networks])[:, np.newaxis, :]
+                    layers.append((W, b, np.empty((self.size, 1, len(out)), dtype=W.dtype)))
+                dtype = networks[0].dtype
+                states = np.empty((self.size, networks[0].layer_sizes[0]), dtype=dtype)
+                output = np.empty((self.size, networks[0].layer_sizes[-1]), dtype=dtype)
+                self.phases.append((networks[0].activation, layers, states, output))
+            self.normalize_output = models[0].models[0].normalize_output
+            # phases of the whole population, 'phases' may contain only the kept models (see 'keep')
+            self.all_phases = self.phases
+            self.rows = np.arange(self.size)
 
-            x = self.normalize(x)
-            return x
+        def keep(self, rows):
+            """
+            Keeps only the specified models for next forward passes (e.g. models whose games are still running), so
+            ended games are not evaluated. Weights of the kept models are gathered into smaller stacked tensors, so
+            call it when the number of models drops substantially (not after every ended game).
+            :param rows: Indices (sorted) of the kept models within the whole population. Row j of states passed to
+            'evaluate' is then the input of model rows[j] and row j of its output is the output of that model.
+            """
+            self.rows = np.asarray(rows)
+            if len(self.rows) == self.size:
+                self.phases = self.all_phases
+                return
+
+            size = len(self.rows)
+            self.phases = []
+            for activation, layers, states, output in self.all_phases:
+                kept = [(W[self.rows], b[self.rows], np.empty((size,) + out.shape[1:], dtype=out.dtype))
+                        for W, b, out in layers]
+                self.phases.append((activation, kept, np.empty((size, states.shape[1]), dtype=states.dtype),
+                                    np.empty((size, output.shape[1]), dtype=output.dtype)))
+
+        def reset_state(self):
+            """
+            Resets internal states of models at the start of new games (MLP models are stateless).
+            """
+            pass
 
-        def normalize(self, x):
+        def evaluate(self, states, current_phase):
             """
-            Normalizes the specified interval to [0, 1].
-            :param x: Values to be normalized.
-            :return: Normalized [0, 1] interval.
+            Performs a single forward pass of all (kept) models.
+            :param states: States of games (P x input, row i is the input of model i; K x input if only K models
+            are kept, see 'keep').
+            :param current_phase: Current game phase (same for all games).
+            :return: Outputs of models (P x output or K x output; reused buffer, valid until the next forward pass).
             """
-            min_val = min(x)
-            max_val = max(x)
-            if max_val - min_val == 0:
-                return x
-            return np.array([((x_i - min_val) / (max_val - min_val)) for x_i in x])
+            activation, layers, x, output = self.phases[current_phase]
+            x[...] = states
+            x = x[:, np.newaxis, :]
+            for W, b, out in layers:
+                np.matmul(x, W, out=out)
+                np.add(out, b, out=out)
+                activation(out, out=out)
+                x = out
+
+            if not self.normalize_output:
+                output[...] = x[:, 0, :]
+                return output
+            return activations.normalize(x[:, 0, :], out=output)
 
     def get_name(self):
         """
@@ -98,26 +147,32 @@ class MLP(AbstractModel):
         """
         return "MLP"
 
-    def __init__(self, hidden_layers, activation, weights=None, game_config=None):
+    def __init__(self, hidden_layers, activation, weights=None, game_config=None,
+                 precision=constants.MODEL_PRECISION):
         """
         Initializes a new instance of SimpleNN.
         :param hidden_layers: list of sizes of hidden layers.
         :param activation: activation function.
-        :param weights: Weights of the current network instance.
+        :param weights: Weights of the current network instance (list or contiguous float array; arrays are used
+        without copying, networks of all phases are views of them).
         :param game_config: Game configuration dictionary, consists of:
         1) input size (for neural network = state of the game
         2) output size (number of "actuators" = number of AI outputs)
         3) number of game phases in total
         (This parameter is dictionary [json]).
+        :param precision: Numeric precision of the networks ('float64', 'float32' or 'float16' = float16 storage of
+        weights with float32 computation).
         """
         self.hidden_layers = hidden_layers
         self.activation = activation
         self.weights = weights
         self.game_config = game_config
+        self.precision = precision
 
         if weights is not None and game_config is not None:
             # Init the network
             phases = self.game_config["game_phases"]
+            flat_weights = as_flat_weights(weights, get_precision(precision)[0])
             self.models = []
             used_weights = 0
             hidden_layers = self.hidden_layers
@@ -126,7 +181,7 @@ class MLP(AbstractModel):
                 output_size = self.game_config["output_sizes"][phase]
                 layer_sizes = [input_size] + hidden_layers + [output_size]
                 if (phases == 1):
-                    self.models.append(self.MLPNetwork(layer_sizes, self.activation, self.weights))
+                    self.models.append(self.MLPNetwork(layer_sizes, self.activation, flat_weights, precision))
                 else:
                     # slice all weights and use only reliable weights to the current phase
                     new_used_weights = used_weights
@@ -137,7 +192,8 @@ class MLP(AbstractModel):
                     new_used_weights += (hidden_layers[-1] + 1) * output_size
                     self.models.append(self.MLPNetwork(layer_sizes=layer_sizes,
                                                        activation=self.activation,
-                                                       weights=self.weights[used_weights:new_used_weights]))
+                                                       weights=flat_weights[used_weights:new_used_weights],
+                                                       precision=precision))
                     used_weights = new_used_weights
 
     def get_new_instance(self, weights, game_config):
@@ -147,7 +203,35 @@ class MLP(AbstractModel):
         :param game_config: Game configuration file.
         :return: newly created instance of MLP.
         """
-        return MLP(self.hidden_layers, self.activation, weights, game_config)
+        return MLP(self.hidden_layers, self.activation, weights, game_config, self.precision)
+
+    def get_population(self, models):
+        """
+        Creates a population of the specified models for batched (lockstep) evaluation.
+        :param models: MLP models with the same architecture as the current model.
+        :return: Instance of MLPPopulation.
+        """
+        return MLP.MLPPopulation(models)
+
+    def prune(self, sparsity):
+        """
+        Creates a pruned copy of the current model (magnitude pruning of every layer, biases are kept). Layers sparse
+        enough are evaluated as CSR matrices.
+        :param sparsity: Target sparsity of weight matrices (0-1).
+        :return: New instance of MLP with pruned weights.
+        """
+        weights = np.concatenate([network.get_pruned_weights(sparsity) for network in self.models])
+        return self.get_new_instance(weights, self.game_config)
+
+    def save_to_file(self, file_name):
+        """
+        Saves the current model to the specified file (same format as models logged by the evolution, weights are
+        stored in their storage type).
+        :param file_name: File to save to.
+        """
+        weights = np.concatenate([network.weights for network in self.models])
+        data = {"model": self.to_dictionary(), "model_name": self.get_name()}
+        utils.model_files.write_model(file_name, data, weights, dtype=weights.dtype)
 
     def get_number_of_parameters(self, game):
         """
@@ -176,16 +260,25 @@ class MLP(AbstractModel):
         """
         return self.models[current_phase].predict(input)
 
+    def evaluate_batch(self, inputs, current_phase):
+        """
+        Performs a single forward pass of several inputs at once (batched matmul).
+        :param inputs: Inputs from the game (list or batch x input array).
+        :param current_phase: Current game phase.
+        :return: Outputs of the forward pass (batch x output array).
+        """
+        return self.models[current_phase].forward_batch(inputs)
+
     def to_string(self):
         """
         A string representation of the current object, that describes parameters.
         :return: A string representation of the current object.
         """
-        return f"MLP - layers: {self.hidden_layers}, activation: {self.activation}"
+        return f"MLP - layers: {self.hidden_layers}, activation: {self.activation}, precision: {self.precision}"
 
     def to_dictionary(self):
         """
         Creates dictionary representation of model parameters.
         :return: Dictionary of model parameters.
         """
-        return {"hidden_layers": self.hidden_layers, "activation": self.activation}
+        return {"hidden_layers": self.hidden_layers, "activation": self.activation, "precision": self.precision}
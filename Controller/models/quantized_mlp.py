@@ -0,0 +1,198 @@
+import numpy as np
+import json
+import os
+import utils.miscellaneous
+import utils.model_files
+from models.abstract_model import AbstractModel
+from models.mlp import MLP
+from utils import activations
+
+
+class QuantizedMLP(AbstractModel):
+    """
+    Represents a trained MLP model with weights quantized to int8 (symmetric, one scale per layer), used for
+    deployment (evaluations of trained controllers). Biases are kept in float32. Can contain multiple networks, each
+    one for each game phase. Can not be evolved.
+    Quantization reduces storage and memory only (weights take 4x less than float32): NumPy has no int8 matrix
+    multiplication, so a forward pass is slower than the float32 MLP. Int8 weights are stored in '.npy' sidecars.
+    """
+
+    @staticmethod
+    def quantize(mlp):
+        """
+        Quantizes the specified MLP model.
+        :param mlp: MLP model (with weights).
+        :return: Instance of QuantizedMLP.
+        """
+        phases = []
+        for network in mlp.models:
+            layers = []
+            for W, b, _ in network.layers:
+                max_abs = float(np.max(np.abs(W)))
+                scale = max_abs / 127 if max_abs > 0 else 1.0
+                quantized = np.clip(np.rint(W / scale), -127, 127).astype(np.int8)
+                layers.append((quantized, scale, np.asarray(b, dtype=np.float32)))
+            phases.append(layers)
+        return QuantizedMLP(mlp.hidden_layers, mlp.activation, phases)
+
+    @staticmethod
+    def export(file_name, game, output_file):
+        """
+        Loads a MLP model from the specified file, quantizes it and saves the quantized model.
+        :param file_name: File with the MLP model.
+        :param game: Game for the model.
+        :param output_file: File for the quantized model.
+        :return: Instance of QuantizedMLP.
+        """
+        model = QuantizedMLP.quantize(MLP.load_from_file(file_name, game, precision="float32"))
+        model.save_to_file(output_file)
+        print(f"Quantized MLP model saved to file {output_file}")
+        return model
+
+    @staticmethod
+    def load_from_file(file_name, game):
+        """
+        Loads a quantized MLP model from the specified file.
+        :param file_name: File to load from.
+        :param game: Game for the current model.
+        :return: Instance of QuantizedMLP model.
+        """
+        try:
+            with open(file_name, "r") as f:
+                data = json.load(f)
+
+            hidden = list(map(int, data["model"]["hidden_layers"]))
+            activation = data["model"]["activation"]
+            directory = os.path.dirname(file_name)
+            phases = [[(QuantizedMLP.load_layer_weights(directory, layer), float(layer["scale"]),
+                        np.array(layer["bias"], dtype=np.float32)) for layer in phase] for phase in data["phases"]]
+        except:
+            raise ValueError("File has wrong format.")
+
+        game_config = utils.miscellaneous.get_game_config(game)
+        if len(phases) != game_config["game_phases"]:
+            raise ValueError(f"Model has {len(phases)} phases, game {game} has {game_config['game_phases']}.")
+        print(f"Loading quantized MLP model from file {file_name}")
+        return QuantizedMLP(hidden, activation, phases)
+
+    @staticmethod
+    def load_layer_weights(directory, layer):
+        """
+        Loads int8 weights of a single layer (from its '.npy' sidecar, or inline list of older files).
+        :param directory: Directory of the model file.
+        :param layer: Dictionary of the layer from the model file.
+        :return: Int8 weight matrix (input x output).
+        """
+        if "weights_file" in layer:
+            W = np.load(os.path.join(directory, layer["weights_file"]))
+            if W.dtype != np.int8:
+                raise ValueError("Quantized weights must be int8.")
+            return W.reshape(layer["shape"])
+        return np.array(layer["weights"], dtype=np.int8).reshape(layer["shape"])
+
+    class QuantizedNetwork():
+        """
+        Represents quantized MLP network model (internally). Single Network.
+        """
+
+        def __init__(self, activation, layers):
+            """
+            Initializes a new instance of QuantizedNetwork.
+            :param activation: Name of the activation function.
+            :param layers: List of tuples (int8 weights input x output, scale, float32 bias).
+            """
+            self.activation = activations.get_activation(activation)
+            self.layers = [(W, np.float32(scale), b, np.empty(W.shape[1], dtype=np.float32))
+                           for W, scale, b in layers]
+            self.input = np.empty(layers[0][0].shape[0], dtype=np.float32)
+            self.output = np.empty(layers[-1][0].shape[1], dtype=np.float32)
+
+        def predict(self, input):
+            """
+            Performs forward pass in the current network instance.
+            :param input: Input to the neural network.
+            :return: Output of the neural network (reused buffer, valid until the next forward pass).
+            """
+            self.input[...] = input
+            x = self.input
+            for W, scale, b, out in self.layers:
+                np.matmul(x, W, out=out)
+                np.multiply(out, scale, out=out)
+                np.add(out, b, out=out)
+                self.activation(out, out=out)
+                x = out
+
+            return activations.normalize(x, out=self.output)
+
+    def get_name(self):
+        """
+        Returns a name of the current model.
+        """
+        return "quantized_mlp"
+
+    def get_class_name(self):
+        """
+        Returns a class name of the current model.
+        """
+        return "QuantizedMLP"
+
+    def __init__(self, hidden_layers, activation, phases):
+        """
+        Initializes a new instance of QuantizedMLP.
+        :param hidden_layers: List of sizes of hidden layers.
+        :param activation: Activation function.
+        :param phases: For each game phase, list of tuples (int8 weights input x output, scale, float32 bias).
+        """
+        self.hidden_layers = hidden_layers
+        self.activation = activation
+        self.phases = phases
+        self.models = [self.QuantizedNetwork(activation, layers) for layers in phases]
+
+    def save_to_file(self, file_name):
+        """
+        Saves the current model to the specified file (int8 weights of each layer to a '.npy' sidecar).
+        :param file_name: File to save to.
+        """
+        data = {"model_name": self.get_name(), "model": self.to_dictionary(), "phases": []}
+        for phase, layers in enumerate(self.phases):
+            data["phases"].append([{"shape": list(W.shape), "scale": scale, "bias": b.tolist(),
+                                    "weights_file": utils.model_files.write_sidecar(
+                                        file_name, f"phase{phase}_layer{layer}", W, np.int8)}
+                                   for layer, (W, scale, b) in enumerate(layers)])
+        with open(file_name, "w") as f:
+            f.write(json.dumps(data))
+
+    def get_number_of_parameters(self, game):
+        """
+        Evaluates number of parameters of neural networks (int8 weights and float biases).
+        """
+        return sum(W.size + b.size for layers in self.phases for W, _, b in layers)
+
+    def get_size_in_bytes(self):
+        """
+        Returns memory occupied by weights and biases of the model.
+        """
+        return sum(W.nbytes + b.nbytes for layers in self.phases for W, _, b in layers)
+
+    def evaluate(self, input, current_phase):
+        """
+        Performs a single forward pass.
+        :param input: Input from the game.
+        :param current_phase: Current game phase.
+        :return: Output of the forward pass.
+        """
+        return self.models[current_phase].predict(input)
+
+    def to_string(self):
+        """
+        A string representation of the current object, that describes parameters.
+        :return: A string representation of the current object.
+        """
+        return f"Quantized MLP (int8) - layers: {self.hidden_layers}, activation: {self.activation}"
+
+    def to_dictionary(self):
+        """
+        Creates dictionary representation of model parameters.
+        :return: Dictionary of model parameters.
+        """
+        return {"hidden_layers": self.hidden_layers, "activation": self.activation, "weights_type": "int8"}
@@ -8,25 +8,27 @@ class Random(AbstractModel):
     Represents random model.
     """
 
-    def __init__(self, game):
+    def __init__(self, game, seed=None):
         """
         Initializes a new instance of Random model for the specified game.
         :param game: Game that will be played.
+        :param seed: Seed of the random generator of the model (None = drawn from the global NumPy generator).
         """
         self.game_config = utils.miscellaneous.get_game_config(game)
+        self.input_sizes = list(map(int, self.game_config["input_sizes"]))
+        self.output_sizes = list(map(int, self.game_config["output_sizes"]))
+        self.rng = np.random.default_rng(np.random.randint(0, 2 ** 31) if seed is None else seed)
+        self.outputs = [np.empty(size) for size in self.output_sizes]
 
     def evaluate(self, input, current_phase):
         """
         Evaluates model output with the specified input. Output is random.
         :param input: Input to evaluate - there's no any usage of this.
         :param current_phase: Current game phase - there's no any usage of this.
-        :return: Random output.
+        :return: Random output (reused buffer, valid until the next evaluation).
         """
-        input_sizes = list(map(int, self.game_config["input_sizes"]))
-        output_sizes = list(map(int, self.game_config["output_sizes"]))
-
-        assert (input_sizes[current_phase] == len(input))
-        return [np.random.random() for _ in range(output_sizes[current_phase])]
+        assert (self.input_sizes[current_phase] == len(input))
+        return self.rng.random(out=self.outputs[current_phase])
 
     def get_name(self):
         """
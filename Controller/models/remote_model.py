@@ -0,0 +1,124 @@
+import socket
+import struct
+import threading
+import numpy as np
+
+from models.abstract_model import AbstractModel
+
+# request: phase, state size (followed by float64 state); response: status, size (followed by float64 action or error)
+REQUEST_HEADER = struct.Struct("<iI")
+RESPONSE_HEADER = struct.Struct("<BI")
+STATUS_OK = 0
+STATUS_ERROR = 1
+# phase of a request (without a state) that resets the state of the connection on the server (start of a new game)
+RESET_PHASE = -1
+
+
+def receive_exactly(connection, size):
+    """
+    Receives exactly the specified number of bytes.
+    :param connection: Socket.
+    :param size: Number of bytes.
+    :return: Received bytes.
+    """
+    data = bytearray(size)
+    view = memoryview(data)
+    received = 0
+    while received < size:
+        n = connection.recv_into(view[received:], size - received)
+        if n == 0:
+            raise EOFError("Connection has been closed.")
+        received += n
+    return data
+
+
+class RemoteModel(AbstractModel):
+    """
+    Represents a model served by the local inference server (see inference_server.py). Every call of 'evaluate' is
+    sent to the server, which evaluates requests of all clients in batches. Can be used by more threads at once
+    (each thread has its own connection, states of stateful models are kept per connection). Weights of the model
+    live on the server, so remote models can not be instantiated from weights (evolved or trained).
+    """
+
+    def __init__(self, name, socket_path="/tmp/general_ai_inference.sock"):
+        """
+        Initializes a new instance of RemoteModel.
+        :param name: Name of the model on the server.
+        :param socket_path: Path of the Unix socket of the server.
+        """
+        self.name = name
+        self.socket_path = socket_path
+        self.local = threading.local()
+
+    def get_connection(self):
+        """
+        Returns a connection of the calling thread (connects on the first call).
+        """
+        if not hasattr(self.local, "connection"):
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.connect(self.socket_path)
+            connection.sendall(f"{self.name}\n".encode("utf-8"))
+            status, size = RESPONSE_HEADER.unpack(receive_exactly(connection, RESPONSE_HEADER.size))
+            if status != STATUS_OK:
+                message = receive_exactly(connection, size).decode("utf-8")
+                connection.close()
+                raise ValueError(message)
+            self.local.connection = connection
+        return self.local.connection
+
+    def get_new_instance(self, weights, game_config):
+        """
+        Remote models can not be instantiated from weights (the server loads its models from files).
+        """
+        raise TypeError("Remote models can not be instantiated from weights, load the model to the inference server.")
+
+    def evaluate(self, input, current_phase):
+        """
+        Evaluates the model on the server.
+        :param input: Input from the game.
+        :param current_phase: Current game phase.
+        :return: Output of the model.
+        """
+        connection = self.get_connection()
+        state = np.asarray(input, dtype="<f8")
+        connection.sendall(REQUEST_HEADER.pack(current_phase, len(state)) + state.tobytes())
+        return self.receive_response(connection)
+
+    def reset_state(self):
+        """
+        Resets the state of the model on the server (state of the connection of the calling thread).
+        """
+        connection = self.get_connection()
+        connection.sendall(REQUEST_HEADER.pack(RESET_PHASE, 0))
+        self.receive_response(connection)
+
+    def receive_response(self, connection):
+        """
+        Receives a response of the server.
+        :param connection: Connection of the calling thread.
+        :return: Output of the model (empty for resets).
+        """
+        status, size = RESPONSE_HEADER.unpack(receive_exactly(connection, RESPONSE_HEADER.size))
+        if status != STATUS_OK:
+            raise RuntimeError(f"Inference server: {receive_exactly(connection, size).decode('utf-8')}")
+        return np.frombuffer(receive_exactly(connection, 8 * size), dtype="<f8")
+
+    def close(self):
+        """
+        Closes the connection of the calling thread.
+        """
+        if hasattr(self.local, "connection"):
+            self.local.connection.close()
+            del self.local.connection
+
+    def get_name(self):
+        """
+        Returns a name of the current model.
+        """
+        return f"remote ({self.name})"
+
+    def get_class_name(self):
+        """
+        Returns a class name of the current model.
+        """
+        return "RemoteModel"
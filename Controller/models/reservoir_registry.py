@@ -0,0 +1,124 @@
+"""
+Registry of Echo-State reservoirs. All models with the same reservoir configuration (seed, sizes, precision, type...)
+share one reservoir with read-only matrices (and one projection cache), models of different configurations get
+different reservoirs, so several ESN experiments can run in one process (or one worker pool) at the same time.
+Reservoirs are reference counted and dropped from the registry when the last model using them is garbage collected.
+"""
+import threading
+import weakref
+import numpy as np
+import scipy.sparse
+
+import constants
+import lib.simple_esn
+import utils.reservoir_cache
+from utils.projection_cache import ProjectionCache
+
+
+class Reservoir():
+    """
+    Reservoir of a single configuration, shared by all models of the configuration.
+    """
+
+    def __init__(self, key, esn, seed):
+        """
+        Initializes a new instance of Reservoir.
+        :param key: Configuration of the reservoir.
+        :param esn: Reservoir (SimpleESN or CycleESN), weights are initialized on the first use (see 'init_weights').
+        :param seed: Seed of the reservoir.
+        """
+        self.key = key
+        self.esn = esn
+        self.seed = seed
+        self.references = 0
+        self.lock = threading.Lock()
+        self.projection_cache = None
+        if constants.ESN_PROJECTION_CACHE_BYTES > 0:
+            self.projection_cache = ProjectionCache(constants.ESN_PROJECTION_CACHE_BYTES)
+
+    def init_weights(self, n_features):
+        """
+        Initializes weights of the reservoir (once, from the reservoir cache), its matrices are read-only from now on.
+        :param n_features: Number of input features.
+        """
+        with self.lock:
+            if self.esn.weights_ is not None:
+                return
+
+            esn = self.esn
+            utils.reservoir_cache.init_reservoir(esn, self.seed, n_features)
+            arrays = [esn.input_weights_, esn.readout_input_weights_]
+            if scipy.sparse.issparse(esn.weights_):
+                arrays += [esn.weights_.data, esn.weights_.indices, esn.weights_.indptr]
+            else:
+                arrays.append(esn.weights_)
+            for array in arrays:
+                if array.flags.writeable:
+                    array.flags.writeable = False
+
+
+class ReservoirRegistry():
+    """
+    Thread-safe registry: configuration -> Reservoir.
+    """
+    # reservoir types: random (dense or sparse) reservoir, cycle reservoir (with jumps)
+    RESERVOIRS = {"random": lib.simple_esn.SimpleESN, "cycle": lib.simple_esn.CycleESN}
+
+    def __init__(self):
+        self.reservoirs = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, owner, seed, n_readout, n_components, dtype, connectivity=None, reservoir="random",
+                jump_size=None):
+        """
+        Returns the reservoir of the specified configuration (created, if it is not registered yet). The reference is
+        released when the owner is garbage collected.
+        :param owner: Model using the reservoir.
+        :param seed: Seed of the reservoir.
+        :param n_readout: Number of readout neurons.
+        :param n_components: Number of neurons in the reservoir.
+        :param dtype: Type of the reservoir weights and activations.
+        :param connectivity: Fraction of nonzero connections of a sparse random reservoir (None = dense).
+        :param reservoir: Type of the reservoir ('random' or 'cycle').
+        :param jump_size: Distance of neurons connected by jumps of a cycle reservoir (None = no jumps).
+        :return: Instance of Reservoir.
+        """
+        if reservoir not in ReservoirRegistry.RESERVOIRS:
+            raise ValueError(f"Unknown reservoir: {reservoir}, use one of {list(ReservoirRegistry.RESERVOIRS)}.")
+        if reservoir == "cycle" and connectivity is not None:
+            raise ValueError("Connectivity can be specified only for random reservoirs.")
+
+        key = (int(seed), n_readout, n_components, np.dtype(dtype).name, connectivity, reservoir, jump_size)
+        with self.lock:
+            entry = self.reservoirs.get(key)
+            if entry is None:
+                if reservoir == "cycle":
+                    esn = lib.simple_esn.CycleESN(n_readout, n_components, random_state=int(seed), dtype=dtype,
+                                                  jump_size=jump_size)
+                else:
+                    esn = lib.simple_esn.SimpleESN(n_readout, n_components, random_state=int(seed), dtype=dtype,
+                                                   connectivity=connectivity)
+                entry = Reservoir(key, esn, int(seed))
+                self.reservoirs[key] = entry
+            entry.references += 1
+
+        weakref.finalize(owner, self.release, entry)
+        return entry
+
+    def release(self, entry):
+        """
+        Releases a reference of the reservoir (the reservoir is removed from the registry with the last reference).
+        :param entry: Instance of Reservoir.
+        """
+        with self.lock:
+            entry.references -= 1
+            if entry.references == 0 and self.reservoirs.get(entry.key) is entry:
+                del self.reservoirs[entry.key]
+
+    def get_statistics(self):
+        """
+        Returns registered reservoirs and numbers of their references.
+        :return: Dictionary configuration -> number of references.
+        """
+        with self.lock:
+            return {key: entry.references for key, entry in self.reservoirs.items()}
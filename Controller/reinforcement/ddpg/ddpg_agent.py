@@ -26,6 +26,7 @@ See the original license above.
 """
 import numpy as np
 import tensorflow as tf
+import utils.resources
 
 from reinforcement.ddpg.actor_network_bn import ActorNetwork
 from reinforcement.ddpg.critic_network import CriticNetwork
@@ -47,8 +48,9 @@ class DDPGAgent():
         self.batch_size = batch_size
         self.gamma = gamma
 
-        self.sess = tf.Session(config=tf.ConfigProto(inter_op_parallelism_threads=8,
-                                                     intra_op_parallelism_threads=8,
+        threads = utils.resources.get_tf_threads(default=8)
+        self.sess = tf.Session(config=tf.ConfigProto(inter_op_parallelism_threads=threads,
+                                                     intra_op_parallelism_threads=threads,
                                                      allow_soft_placement=True))
         with self.sess.graph.as_default():
             self.actor_network = ActorNetwork(self.sess, self.state_dim, self.action_dim)
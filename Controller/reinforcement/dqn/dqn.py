@@ -10,6 +10,7 @@ import tensorflow.contrib.layers as tf_layers
 
 import constants
 import utils.miscellaneous
+import utils.resources
 from reinforcement.abstract_reinforcement import AbstractReinforcement
 from reinforcement.dqn.neural_q_learner import NeuralQLearner
 from reinforcement.environment import Environment
@@ -57,8 +58,9 @@ class DQN(AbstractReinforcement):
         self.actions_count_sum = sum(self.actions_count)
         self.init_directories()
 
-        self.sess = tf.Session(config=tf.ConfigProto(inter_op_parallelism_threads=16,
-                                                     intra_op_parallelism_threads=16,
+        threads = utils.resources.get_tf_threads(default=16)
+        self.sess = tf.Session(config=tf.ConfigProto(inter_op_parallelism_threads=threads,
+                                                     intra_op_parallelism_threads=threads,
                                                      allow_soft_placement=True))
 
         self.writer = tf.summary.FileWriter(logdir=self.logdir,
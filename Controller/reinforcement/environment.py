@@ -51,7 +51,7 @@ class Environment(gym.Env):
             actions_count = end - begin
 
         new_state, self.last_phase, reward, done = self.game_instance.step(action)
-        self.state = np.array(new_state)
+        self.state = np.array(new_state)  # copy, games reuse their state buffer
         self.done = done
         return self.state, reward, done, float(self.game_instance.score)
 
@@ -3,12 +3,8 @@ import tensorflow as tf
 
 
 def get_activation(name):
-    if name == "relu":
-        return relu
-    if name == "tanh":
-        return tanh
-    if name == "logsig":
-        return logsig
+    if name in ACTIVATIONS:
+        return ACTIVATIONS[name]
 
     raise NotImplementedError
 
@@ -18,17 +14,58 @@ def get_activation_tf(name):
         return tf.nn.relu
     if name == "tanh":
         return tf.nn.tanh
-    if name == "identity":
+    if name == "identity" or name == "linear":
         return tf.identity
 
 
-def relu(x):
-    return np.array([max(0, y) for y in x])
+# All activations are vectorized NumPy ufuncs; with 'out' specified (can be 'x' itself), they run without allocation.
+
+def relu(x, out=None):
+    return np.maximum(x, 0, out=out)
+
+
+def tanh(x, out=None):
+    return np.tanh(x, out=out)
+
+
+def logsig(x, out=None):
+    out = np.negative(x, out=out)
+    np.exp(out, out=out)
+    np.add(out, 1, out=out)
+    return np.reciprocal(out, out=out)
+
+
+def linear(x, out=None):
+    return np.positive(x, out=out)
 
 
-def tanh(x):
-    return np.array([np.tanh(y) for y in x])
+ACTIVATIONS = {"relu": relu, "tanh": tanh, "logsig": logsig, "linear": linear}
 
 
-def logsig(x):
-    return np.array([1 / (1 + np.exp(-y)) for y in x])
+def normalize(x, out=None):
+    """
+    Normalizes the specified values to [0, 1] interval (min-max normalization). Values are kept as they are if all of
+    them are equal. 2-D arrays are normalized row by row (a row per model of a population).
+    :param x: Values to be normalized.
+    :param out: Output array (can be 'x' itself).
+    :return: Normalized values.
+    """
+    if out is None:
+        out = np.empty_like(x)
+    if x.ndim == 2:
+        min_val = x.min(axis=1, keepdims=True)
+        scale = x.max(axis=1, keepdims=True) - min_val
+        constant = scale == 0
+        min_val[constant] = 0
+        scale[constant] = 1
+        np.subtract(x, min_val, out=out)
+        np.divide(out, scale, out=out)
+        return out
+    min_val = x.min()
+    max_val = x.max()
+    if max_val - min_val == 0:
+        out[...] = x
+        return out
+    np.subtract(x, min_val, out=out)
+    np.divide(out, max_val - min_val, out=out)
+    return out
@@ -0,0 +1,309 @@
+"""
+Micro-benchmarks of the performance-sensitive parts of the controller (game communication, models...).
+Run this file directly (from 'Controller' directory) and select benchmarks in the main section.
+"""
+import concurrent.futures
+import copy
+import io
+import timeit
+import numpy as np
+from deap import tools
+
+import utils.miscellaneous
+from evolution import variation
+from evolution.process_pool import ProcessPoolEvaluator
+from games.action_encoder import ActionEncoder
+from games.game2048 import Game2048
+from games.reference import Reference
+from models.echo_state_network import EchoState
+from models.mlp import MLP
+from utils.projection_cache import ProjectionCache
+
+
+def measure(function, repeats):
+    """
+    Measures an average duration of the specified function.
+    :param function: Function (without parameters) to measure.
+    :param repeats: Number of calls.
+    :return: Average duration of a single call in microseconds.
+    """
+    function()  # warm-up
+    return 1e6 * timeit.timeit(function, number=repeats) / repeats
+
+
+def benchmark_action_encoding(repeats=100000):
+    """
+    Compares the original string-based action encoding with the ActionEncoder on action sizes of 2048 (4 outputs),
+    TORCS (3 outputs), the largest Alhambra phase and a large synthetic action (vectorized path of the encoder).
+    :param repeats: Number of encoded actions for each measurement.
+    :return: List of tuples (name, size, string path [us], encoder path [us]).
+    """
+    sizes = [("2048", 4), ("torcs", 3), ("alhambra", max(utils.miscellaneous.get_game_config("alhambra")["output_sizes"])),
+             ("synthetic", 1000)]
+    results = []
+    for name, size in sizes:
+        action = np.random.random(size)
+        encoder = ActionEncoder(size)
+        sink = io.BytesIO()
+
+        def string_path():
+            sink.seek(0)
+            sink.write(ActionEncoder.encode_as_string(action))
+
+        def encoder_path():
+            sink.seek(0)
+            sink.write(encoder.encode(action))
+
+        old = measure(string_path, repeats)
+        new = measure(encoder_path, repeats)
+        print(f"{name} ({size} outputs): string {old:.2f} us, encoder {new:.2f} us, speed-up {old / new:.2f}x")
+        results.append((name, size, old, new))
+    return results
+
+
+# Original (per-element) activations of the MLP, used as the baseline of 'benchmark_mlp_forward'
+ORIGINAL_ACTIVATIONS = {"relu": lambda x: np.array([max(0, y) for y in x]),
+                        "tanh": lambda x: np.array([np.tanh(y) for y in x]),
+                        "logsig": lambda x: np.array([1 / (1 + np.exp(-y)) for y in x])}
+
+
+def benchmark_mlp_forward(layer_sizes=(100, 100, 100, 100), activation="relu", repeats=20000):
+    """
+    Compares the original MLP forward pass (concatenation of the bias input, per-element activation and
+    normalization by list comprehensions) with the compiled forward pass of MLPNetwork.
+    :param layer_sizes: Sizes of all layers of the network.
+    :param activation: Name of the activation function.
+    :param repeats: Number of forward passes for each measurement.
+    :return: Tuple (original path [us], compiled path [us]).
+    """
+    layer_sizes = list(layer_sizes)
+    n = sum((layer_sizes[i] + 1) * layer_sizes[i + 1] for i in range(len(layer_sizes) - 1))
+    weights = np.random.randn(n)
+    network = MLP.MLPNetwork(layer_sizes, activation, weights)
+    x = np.random.randn(layer_sizes[0])
+
+    # matrices with the bias row, as built by the original MLPNetwork
+    original_weights = np.array(list(map(float, weights)))
+    matrices = []
+    l_bound = 0
+    for i in range(len(layer_sizes) - 1):
+        r_bound = l_bound + (layer_sizes[i] + 1) * layer_sizes[i + 1]
+        matrices.append(original_weights[l_bound:r_bound].reshape(layer_sizes[i] + 1, layer_sizes[i + 1]))
+        l_bound = r_bound
+    original_activation = ORIGINAL_ACTIVATIONS[activation]
+
+    def original_path():
+        y = np.asarray(x)
+        for W in matrices:
+            y = np.concatenate((y, [1]), axis=0)
+            y = original_activation(np.matmul(y, W))
+        min_val, max_val = min(y), max(y)
+        if max_val - min_val == 0:
+            return y
+        return np.array([((y_i - min_val) / (max_val - min_val)) for y_i in y])
+
+    old = measure(original_path, repeats)
+    new = measure(lambda: network.predict(x), repeats)
+    print(f"MLP {layer_sizes}: original {old:.2f} us, compiled {new:.2f} us, speed-up {old / new:.2f}x")
+    return old, new
+
+
+def benchmark_population_forward(population_size=100, hidden_layers=(100, 100), repeats=1000):
+    """
+    Compares a step of a whole population of 2048 MLPs evaluated one by one and by the stacked MLPPopulation.
+    :param population_size: Number of models (individuals).
+    :param hidden_layers: Hidden layers of the MLP.
+    :param repeats: Number of population steps for each measurement.
+    :return: Tuple (one by one [us], population [us]).
+    """
+    game_config = utils.miscellaneous.get_game_config("2048")
+    mlp = MLP(list(hidden_layers), "relu")
+    n = mlp.get_number_of_parameters("2048")
+    models = [mlp.get_new_instance(np.random.randn(n), game_config) for _ in range(population_size)]
+    population = mlp.get_population(models)
+    states = np.random.randn(population_size, game_config["input_sizes"][0])
+
+    def one_by_one():
+        for model, state in zip(models, states):
+            model.evaluate(state, 0)
+
+    old = measure(one_by_one, repeats)
+    new = measure(lambda: population.evaluate(states, 0), repeats)
+    print(f"Population of {population_size} MLPs {list(hidden_layers)}: one by one {old:.2f} us, "
+          f"population {new:.2f} us, speed-up {old / new:.2f}x")
+    return old, new
+
+
+def benchmark_esn_population(population_size=64, n_components=1000, n_readout=200, repeats=100):
+    """
+    Compares a step of a whole population of 2048 Echo-State models evaluated one by one (one reservoir matvec per
+    game) and by EchoStatePopulation (one reservoir matmul for all games).
+    :param population_size: Number of models (individuals).
+    :param n_components: Number of neurons in the reservoir.
+    :param n_readout: Number of readout neurons.
+    :param repeats: Number of population steps for each measurement.
+    :return: Tuple (one by one [us], population [us]).
+    """
+    game_config = utils.miscellaneous.get_game_config("2048")
+    esn = EchoState(n_readout, n_components, [], "relu")
+    n = esn.get_number_of_parameters("2048")
+    models = [esn.get_new_instance(np.random.randn(n), game_config) for _ in range(population_size)]
+    population = esn.get_population(models)
+    states = np.random.randn(population_size, game_config["input_sizes"][0])
+
+    def one_by_one():
+        for model, state in zip(models, states):
+            model.evaluate(state, 0)
+
+    old = measure(one_by_one, repeats)
+    new = measure(lambda: population.evaluate(states, 0), repeats)
+    print(f"Population of {population_size} ESNs ({n_components} neurons): one by one {old:.2f} us, "
+          f"population {new:.2f} us, speed-up {old / new:.2f}x")
+    return old, new
+
+
+def benchmark_projection_cache(models=10, n_components=1000, n_readout=200, game_batch_size=2, seed=42):
+    """
+    Compares 2048 games played by stateless Echo-State models (different individuals sharing one reservoir) with and
+    without the cache of reservoir projections.
+    :param models: Number of models (individuals), each one plays its own games.
+    :param n_components: Number of neurons in the reservoir.
+    :param n_readout: Number of readout neurons.
+    :param game_batch_size: Number of games played by every model.
+    :param seed: Seed of games of all models (the same seed = the same first states).
+    :return: Tuple (without cache [s], with cache [s]).
+    """
+    game_config = utils.miscellaneous.get_game_config("2048")
+    esn = EchoState(n_readout, n_components, [], "relu", stateful=False)
+    n = esn.get_number_of_parameters("2048")
+    weights = [np.random.randn(n) for _ in range(models)]
+    cache = ProjectionCache(64 << 20)
+
+    def play(projection_cache):
+        start = timeit.default_timer()
+        for w in weights:
+            model = esn.get_new_instance(w, game_config)
+            model.projection_cache = projection_cache
+            Game2048(model, game_batch_size, seed).run()
+        return timeit.default_timer() - start
+
+    play(None)  # warm-up (reservoir initialization)
+    old = play(None)
+    new = play(cache)
+    print(f"{models} stateless ESNs ({n_components} neurons) playing 2048: without cache {old:.2f} s, "
+          f"with cache {new:.2f} s, speed-up {old / new:.2f}x")
+    print(cache.to_string())
+    return old, new
+
+
+def benchmark_evaluation_pool(population_size=32, hidden_layers=(32, 32), game_batch_size=2, max_workers=4):
+    """
+    Compares evaluation of a 2048 population by a pool of threads and by a pool of processes (shared population
+    matrix, see ProcessPoolEvaluator).
+    :param population_size: Number of individuals.
+    :param hidden_layers: Hidden layers of MLP individuals.
+    :param game_batch_size: Number of games played by every individual.
+    :param max_workers: Number of threads / processes.
+    :return: Tuple (threads [s], processes [s]).
+    """
+    game_config = utils.miscellaneous.get_game_config("2048")
+    mlp = MLP(list(hidden_layers), "relu")
+    n = mlp.get_number_of_parameters("2048")
+    population = [np.random.randn(n) for _ in range(population_size)]
+    seeds = list(range(population_size))
+
+    def eval_fitness(individual, seed):
+        return Game2048(mlp.get_new_instance(individual, game_config), game_batch_size, seed).run(),
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        start = timeit.default_timer()
+        results = list(executor.map(eval_fitness, population, seeds))
+        threads = timeit.default_timer() - start
+
+    evaluator = ProcessPoolEvaluator("2048", mlp, game_batch_size, population_size, n, max_workers)
+    evaluator.evaluate(population[:max_workers], seeds[:max_workers])  # warm-up (worker start)
+    start = timeit.default_timer()
+    assert evaluator.evaluate(population, seeds) == results
+    processes = timeit.default_timer() - start
+    print(f"{population_size} individuals playing 2048 ({max_workers} workers): threads {threads:.2f} s, "
+          f"processes {processes:.2f} s, speed-up {threads / processes:.2f}x")
+    return threads, processes
+
+
+def benchmark_variation(population_size=50, individual_len=20000, cxindpb=0.25, mutindpb=0.1):
+    """
+    Compares a generation of variation (cloning, uniform crossover of all pairs and uniform mutation of all
+    individuals) of list individuals, gene by gene, and of the offspring matrix.
+    :param population_size: Number of individuals.
+    :param individual_len: Length of an individual.
+    :param cxindpb: Probability of a swap of a gene.
+    :param mutindpb: Probability of mutation of a gene.
+    :return: Tuple (lists [ms], matrix [ms]).
+    """
+    population = [np.random.random(individual_len) for _ in range(population_size)]
+    lists = [individual.tolist() for individual in population]
+
+    def vary_lists():
+        offspring = [copy.deepcopy(individual) for individual in lists]
+        for i in range(1, len(offspring), 2):
+            tools.cxUniform(offspring[i - 1], offspring[i], cxindpb)
+        for individual in offspring:
+            for i in range(len(individual)):
+                if np.random.random() < mutindpb:
+                    individual[i] = np.random.random()
+
+    def vary_matrix():
+        matrix = np.array(population)
+        pairs = 2 * np.arange(len(matrix) // 2)
+        matrix[pairs], matrix[pairs + 1] = variation.cx_uniform(matrix[pairs], matrix[pairs + 1], cxindpb)
+        variation.mut_uniform(matrix, mutindpb)
+
+    old = measure(vary_lists, 3) / 1000
+    new = measure(vary_matrix, 20) / 1000
+    print(f"Variation of {population_size} individuals ({individual_len} genes): lists {old:.1f} ms, "
+          f"matrix {new:.1f} ms, speed-up {old / new:.1f}x")
+    return old, new
+
+
+class EchoModel():
+    """
+    Trivial model for protocol benchmarks (answers with the beginning of the state).
+    """
+
+    def __init__(self, size):
+        self.size = size
+
+    def evaluate(self, input, current_phase):
+        return input[:self.size]
+
+    def reset_state(self):
+        pass
+
+
+def benchmark_transport(game_batch_size=20):
+    """
+    Compares per-step latency of the pipe and shared-memory transports, using the reference game.
+    :param game_batch_size: Number of reference games (100 steps each) played by every transport.
+    :return: Dictionary transport -> average step duration in microseconds.
+    """
+    steps = 100 * game_batch_size
+    action_size = utils.miscellaneous.get_game_config("reference")["output_sizes"][0]
+    results = {}
+    for transport in ["pipe", "shared_memory"]:
+        game = Reference(EchoModel(action_size), game_batch_size, 42, transport=transport)
+        start = timeit.default_timer()
+        score = game.run()
+        results[transport] = 1e6 * (timeit.default_timer() - start) / steps
+        print(f"{transport}: {results[transport]:.2f} us per step (score {score})")
+    return results
+
+
+if __name__ == '__main__':
+    benchmark_action_encoding()
+    benchmark_transport()
+    benchmark_mlp_forward()
+    benchmark_population_forward()
+    benchmark_esn_population()
+    benchmark_projection_cache()
+    benchmark_evaluation_pool()
+    benchmark_variation()
@@ -9,6 +9,7 @@ from games.alhambra import Alhambra
 from games.torcs import Torcs
 from games.mario import Mario
 from games.game2048 import Game2048
+from games.reference import Reference
 
 
 def get_game_config(game_name):
@@ -21,6 +22,8 @@ def get_game_config(game_name):
         game_config_file = constants.MARIO_CONFIG_FILE
     elif game_name == "torcs":
         game_config_file = constants.TORCS_CONFIG_FILE
+    elif game_name == "reference":
+        game_config_file = constants.REFERENCE_CONFIG_FILE
     with open(game_config_file, "r") as f:
         game_config = json.load(f)
     return game_config
@@ -36,6 +39,8 @@ def get_game_instance(game_name, params, test=False):
         game_instance = Torcs(*params, test=test)
     if game_name == "mario":
         game_instance = Mario(*params)
+    if game_name == "reference":
+        game_instance = Reference(*params)
     return game_instance
 
 
@@ -49,6 +54,8 @@ def get_game_class(game_name):
         game_class = Torcs
     if game_name == "mario":
         game_class = Mario
+    if game_name == "reference":
+        game_class = Reference
     return game_class
 
 
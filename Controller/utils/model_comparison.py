@@ -0,0 +1,188 @@
+"""
+Tools comparing a model with its optimized variant (reduced precision, quantized or pruned weights...): states
+recorded from seeded games are replayed through both models and divergence of their actions is reported, together
+with scores of seeded games.
+Run this file directly (from 'Controller' directory) and select the comparison in the main section.
+"""
+import numpy as np
+
+import utils.miscellaneous
+from models.abstract_model import AbstractModel
+from models.mlp import MLP
+from models.quantized_mlp import QuantizedMLP
+
+
+class RecordingModel(AbstractModel):
+    """
+    Wraps a model and records all states (and game phases) it evaluates.
+    """
+
+    def __init__(self, model):
+        """
+        Initializes a new instance of RecordingModel.
+        :param model: Model to be wrapped.
+        """
+        self.model = model
+        self.records = []
+
+    def evaluate(self, input, current_phase):
+        self.records.append((np.array(input, dtype=np.float64), current_phase))
+        return self.model.evaluate(input, current_phase)
+
+    def reset_state(self):
+        self.model.reset_state()
+
+    def get_name(self):
+        return self.model.get_name()
+
+    def get_class_name(self):
+        return self.model.get_class_name()
+
+
+def record_states(game, model, seeds, game_batch_size=1):
+    """
+    Plays seeded games with the specified model and records all states.
+    :param game: Game name.
+    :param model: Model playing the games.
+    :param seeds: Seeds of the games.
+    :param game_batch_size: Number of games played for each seed.
+    :return: List of tuples (state, phase).
+    """
+    recorder = RecordingModel(model)
+    for seed in seeds:
+        utils.miscellaneous.get_game_instance(game, [recorder, game_batch_size, seed]).run()
+    return recorder.records
+
+
+def replay_states(model, records):
+    """
+    Evaluates the specified model on recorded states.
+    :param model: Model to evaluate.
+    :param records: List of tuples (state, phase), see 'record_states'.
+    :return: List of actions (float64 copies).
+    """
+    return [np.array(model.evaluate(state, phase), dtype=np.float64) for state, phase in records]
+
+
+def action_divergence(reference_actions, actions):
+    """
+    Evaluates how far the actions diverge from the reference actions.
+    :param reference_actions: Actions of the reference model.
+    :param actions: Actions of the compared model (for the same states).
+    :return: Dictionary with maximum and mean absolute difference and the ratio of steps, where the best action
+    (argmax) is the same.
+    """
+    differences = np.concatenate([np.abs(a - r) for r, a in zip(reference_actions, actions)])
+    same_best = np.mean([np.argmax(r) == np.argmax(a) for r, a in zip(reference_actions, actions)])
+    return {"max_abs": float(differences.max()), "mean_abs": float(differences.mean()),
+            "argmax_agreement": float(same_best)}
+
+
+def compare_scores(game, models, seeds, game_batch_size=1):
+    """
+    Plays the same seeded games with all specified models.
+    :param game: Game name.
+    :param models: List of tuples (name, model).
+    :param seeds: Seeds of the games.
+    :param game_batch_size: Number of games played for each seed.
+    :return: Dictionary name -> list of scores (one for each seed).
+    """
+    scores = {}
+    for name, model in models:
+        scores[name] = [utils.miscellaneous.get_game_instance(game, [model, game_batch_size, seed]).run()
+                        for seed in seeds]
+        print(f"{name}: average score {np.mean(scores[name])}, scores {scores[name]}")
+    return scores
+
+
+def validate_precision(model_class, file_name, game, seeds, precisions=("float32", "float16")):
+    """
+    Replays states recorded with the float64 model through the same model in reduced precisions and reports the
+    divergence of actions.
+    :param model_class: Class of the model (MLP, EchoState).
+    :param file_name: File with the stored model.
+    :param game: Game name.
+    :param seeds: Seeds of the recorded games.
+    :param precisions: Precisions to be validated.
+    :return: Dictionary precision -> divergence (see 'action_divergence').
+    """
+    reference = model_class.load_from_file(file_name, game, precision="float64")
+    records = record_states(game, reference, seeds)
+    reference_actions = replay_states(reference, records)
+    print(f"Recorded {len(records)} states in {len(seeds)} games")
+
+    results = {}
+    for precision in precisions:
+        model = model_class.load_from_file(file_name, game, precision=precision)
+        results[precision] = action_divergence(reference_actions, replay_states(model, records))
+        print(f"{precision}: {results[precision]}")
+    return results
+
+
+def compare_quantized(file_name, game, seeds, game_batch_size=1):
+    """
+    Compares a MLP model with its int8 quantized form: divergence of actions on recorded states and scores of seeded
+    games.
+    :param file_name: File with the stored MLP model.
+    :param game: Game name.
+    :param seeds: Seeds of the games.
+    :param game_batch_size: Number of games played for each seed.
+    :return: Tuple (divergence, scores), see 'action_divergence' and 'compare_scores'.
+    """
+    mlp = MLP.load_from_file(file_name, game, precision="float32")
+    quantized = QuantizedMLP.quantize(mlp)
+    float_size = sum(network.weights.nbytes for network in mlp.models)
+    print(f"Weights: {float_size} B (float32), {quantized.get_size_in_bytes()} B (int8)")
+
+    records = record_states(game, mlp, seeds)
+    divergence = action_divergence(replay_states(mlp, records), replay_states(quantized, records))
+    print(f"int8: {divergence}")
+    scores = compare_scores(game, [("float32", mlp), ("int8", quantized)], seeds, game_batch_size)
+    return divergence, scores
+
+
+def compare_pruned(model_class, file_name, game, seeds, sparsities=(0.5, 0.8, 0.95), game_batch_size=1,
+                   output_file=None):
+    """
+    Compares a model with its pruned copies (see 'prune' of MLP / EchoState): divergence of actions on recorded
+    states and scores of seeded games.
+    :param model_class: Class of the model (MLP, EchoState).
+    :param file_name: File with the stored model.
+    :param game: Game name.
+    :param seeds: Seeds of the games.
+    :param sparsities: Target sparsities of pruned models.
+    :param game_batch_size: Number of games played for each seed.
+    :param output_file: If specified, pruned models are saved to '<output_file>_<sparsity>.json'.
+    :return: Tuple (divergences, scores), divergences is a dictionary sparsity -> divergence.
+    """
+    model = model_class.load_from_file(file_name, game)
+    records = record_states(game, model, seeds)
+    reference_actions = replay_states(model, records)
+
+    divergences = {}
+    models = [("original", model)]
+    for sparsity in sparsities:
+        pruned = model.prune(sparsity)
+        divergences[sparsity] = action_divergence(reference_actions, replay_states(pruned, records))
+        print(f"sparsity {sparsity}: {divergences[sparsity]}")
+        models.append((f"sparsity {sparsity}", pruned))
+        if output_file is not None:
+            pruned.save_to_file(f"{output_file}_{sparsity}.json")
+
+    scores = compare_scores(game, models, seeds, game_batch_size)
+    return divergences, scores
+
+
+if __name__ == '__main__':
+    np.random.seed(930615)
+
+    game = "2048"
+    seeds = list(range(10))
+    file_name = "C:/Users/Jan/Documents/GitHub/general-ai/Experiments/MLP+ES/2048/logs_2017-02-21_17-24-07/best/best_0.json"
+
+    validate_precision(MLP, file_name, game, seeds)
+    # from models.echo_state_network import EchoState
+    # validate_precision(EchoState, file_name, game, seeds)
+    # compare_quantized(file_name, game, seeds, game_batch_size=10)
+    # QuantizedMLP.export(file_name, game, "quantized.json")
+    # compare_pruned(MLP, file_name, game, seeds, sparsities=(0.5, 0.8, 0.95), output_file="pruned")
@@ -0,0 +1,129 @@
+"""
+Binary model container: JSON metadata with the weights stored in a '.npy' sidecar file (raw little-endian array next
+to the JSON file, referenced by 'weights_file'). Weights are loaded memory-mapped, so loading is I/O bound and all
+processes loading the same model share its pages. Old JSON files with weights as a list of floats stay loadable.
+Run this file directly (from 'Controller' directory) to convert JSON models of a directory tree (e.g. 'Experiments').
+"""
+import json
+import os
+import numpy as np
+
+import constants
+
+
+def get_sidecar_name(file_name, key):
+    """
+    Returns a name of the sidecar file of the specified JSON file ('best_0.json' -> 'best_0.npy').
+    :param file_name: JSON file.
+    :param key: Key of the stored array ('weights' or 'population').
+    """
+    base = os.path.splitext(file_name)[0]
+    return f"{base}.npy" if key == "weights" else f"{base}_{key}.npy"
+
+
+def write_model(file_name, data, weights, binary=None, dtype=np.float64):
+    """
+    Writes a model file.
+    :param file_name: JSON file.
+    :param data: Metadata of the model (dictionary, e.g. 'model' and 'model_name').
+    :param weights: Weights of the model (list or NumPy array).
+    :param binary: If true, weights are written to a '.npy' sidecar (constants.BINARY_MODEL_FILES by default).
+    :param dtype: Type of weights in the sidecar.
+    """
+    write_arrays(file_name, data, {"weights": weights}, binary, dtype)
+
+
+def write_arrays(file_name, data, arrays, binary=None, dtype=np.float64):
+    """
+    Writes a JSON file with the specified arrays (weights, population...) stored inline or in '.npy' sidecars.
+    :param file_name: JSON file.
+    :param data: Other content of the JSON file (dictionary).
+    :param arrays: Dictionary key -> array (list or NumPy array).
+    :param binary: If true, arrays are written to '.npy' sidecars (constants.BINARY_MODEL_FILES by default).
+    :param dtype: Type of values in sidecars.
+    """
+    if binary is None:
+        binary = constants.BINARY_MODEL_FILES
+
+    data = dict(data)
+    for key, values in arrays.items():
+        data.pop(key, None)
+        data.pop(f"{key}_file", None)
+        if binary:
+            data[f"{key}_file"] = write_sidecar(file_name, key, values, dtype)
+        else:
+            data[key] = np.asarray(values, dtype=np.float64).tolist()
+
+    with open(file_name, "w") as f:
+        f.write(json.dumps(data))
+
+
+def write_sidecar(file_name, key, values, dtype=np.float64):
+    """
+    Writes the specified array to a '.npy' sidecar of the JSON file.
+    :return: Name of the sidecar (relative to the JSON file).
+    """
+    sidecar = get_sidecar_name(file_name, key)
+    np.save(sidecar, np.asarray(values, dtype=np.dtype(dtype).newbyteorder("<")))
+    return os.path.basename(sidecar)
+
+
+def read_model(file_name, mmap=True):
+    """
+    Reads a model file (binary container or old JSON format).
+    :param file_name: JSON file.
+    :param mmap: If true, sidecar arrays are memory-mapped (read-only), otherwise they are read to memory.
+    :return: Content of the JSON file, 'weights' (and 'population') are filled from sidecars.
+    """
+    with open(file_name, "r") as f:
+        data = json.load(f)
+
+    for key in ["weights", "population"]:
+        if f"{key}_file" in data:
+            sidecar = os.path.join(os.path.dirname(file_name), data[f"{key}_file"])
+            data[key] = np.load(sidecar, mmap_mode="r" if mmap else None)
+    return data
+
+
+def convert_tree(directory, dtype=np.float64):
+    """
+    Converts all JSON models (and populations) with inline weights in the directory tree to the binary container.
+    :param directory: Root directory (e.g. 'Experiments').
+    :param dtype: Type of weights in sidecars (float64 is lossless, float32 halves the size and is loaded without
+    conversion by models of the default precision).
+    :return: Tuple (number of converted files, bytes before, bytes after).
+    """
+    converted, before, after = 0, 0, 0
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if not name.endswith(".json"):
+                continue
+            file_name = os.path.join(root, name)
+            try:
+                with open(file_name, "r") as f:
+                    data = json.load(f)
+            except (ValueError, UnicodeDecodeError):
+                continue
+            keys = [key for key in ["weights", "population"] if isinstance(data, dict) and key in data]
+            if not keys:
+                continue
+
+            size = os.path.getsize(file_name)
+            write_arrays(file_name, data, {key: data[key] for key in keys}, binary=True, dtype=dtype)
+
+            new_size = os.path.getsize(file_name) + sum(os.path.getsize(get_sidecar_name(file_name, key))
+                                                         for key in keys)
+            converted += 1
+            before += size
+            after += new_size
+            print(f"{file_name}: {size} B -> {new_size} B")
+
+    print(f"Converted {converted} files: {before} B -> {after} B")
+    return converted, before, after
+
+
+if __name__ == '__main__':
+    directory = f"{constants.prefix}general-ai/Experiments"
+
+    convert_tree(directory)
+    # convert_tree(directory, dtype=np.float32)
@@ -0,0 +1,96 @@
+"""
+Bounded LRU cache of reservoir projections (readout features) of stateless Echo-State models. In the stateless mode,
+features are a pure function of the input, and all individuals of a run share one reservoir, so discrete-state games
+(2048, Alhambra) evaluate the same inputs over and over. Single cache is shared by all models (and threads) using the
+same reservoir.
+"""
+import threading
+from collections import OrderedDict
+
+# approximate memory overhead of a single entry (dictionary slot, key and array objects)
+ENTRY_OVERHEAD = 200
+
+
+class ProjectionCache():
+    """
+    Thread-safe LRU cache: input bytes -> readout features (read-only arrays), limited by the total size in bytes.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        Initializes a new instance of ProjectionCache.
+        :param max_bytes: Maximal size of cached keys and features (least recently used entries are evicted).
+        """
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns features cached for the specified key.
+        :param key: Input of the reservoir (bytes).
+        :return: Cached features (read-only array), or None.
+        """
+        with self.lock:
+            features = self.entries.get(key)
+            if features is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return features
+
+    def put(self, key, features):
+        """
+        Stores features for the specified key (evicts least recently used entries over the size limit).
+        :param key: Input of the reservoir (bytes).
+        :param features: Features (array owned by the cache from now on).
+        :return: Stored features (read-only).
+        """
+        features.flags.writeable = False
+        size = len(key) + features.nbytes + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return features
+
+        with self.lock:
+            if key in self.entries:
+                return self.entries[key]
+            self.entries[key] = features
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                old_key, old_features = self.entries.popitem(last=False)
+                self.bytes -= len(old_key) + old_features.nbytes + ENTRY_OVERHEAD
+        return features
+
+    def clear(self):
+        """
+        Removes all entries and resets statistics.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def get_statistics(self):
+        """
+        Returns statistics of the cache.
+        :return: Dictionary (hits, misses, hit_rate, entries, bytes).
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "entries": len(self.entries), "bytes": self.bytes}
+
+    def to_string(self):
+        """
+        A string representation of the current object, that describes statistics.
+        :return: A string representation of the current object.
+        """
+        statistics = self.get_statistics()
+        return (f"Projection cache - hit rate: {100 * statistics['hit_rate']:.1f} % ({statistics['hits']} hits, "
+                f"{statistics['misses']} misses), entries: {statistics['entries']}, "
+                f"size: {statistics['bytes'] / 2 ** 20:.1f} MB / {self.max_bytes / 2 ** 20:.1f} MB")
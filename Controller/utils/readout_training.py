@@ -0,0 +1,139 @@
+"""
+Closed-form training of Echo-State readouts: trajectories are recorded from a teacher model (expert, search agent,
+DQN policy...) playing seeded games, and readout weights are fitted to its actions by a single ridge-regression solve
+(see 'EchoState.fit_readout'). Fitted models are stored in the model file format and can seed the evolution
+population.
+Run this file directly (from 'Controller' directory) and select the teacher in the main section.
+"""
+import numpy as np
+
+import utils.miscellaneous
+import utils.model_files
+from models.abstract_model import AbstractModel
+from models.echo_state_network import EchoState
+
+
+class TrajectoryRecorder(AbstractModel):
+    """
+    Wraps a teacher model and records states, game phases and actions of every game it plays.
+    """
+
+    def __init__(self, model):
+        """
+        Initializes a new instance of TrajectoryRecorder.
+        :param model: Teacher model to be wrapped.
+        """
+        self.model = model
+        self.trajectories = []
+
+    def evaluate(self, input, current_phase):
+        action = self.model.evaluate(input, current_phase)
+        if not self.trajectories:
+            self.trajectories.append([])
+        self.trajectories[-1].append((np.array(input, dtype=np.float64), current_phase,
+                                      np.array(action, dtype=np.float64)))
+        return action
+
+    def reset_state(self):
+        # games reset models at their start, so every game is a separate trajectory
+        self.model.reset_state()
+        self.trajectories.append([])
+
+    def get_name(self):
+        return self.model.get_name()
+
+    def get_class_name(self):
+        return self.model.get_class_name()
+
+
+def record_trajectories(game, teacher, seeds, game_batch_size=1):
+    """
+    Plays seeded games with the teacher model and records their trajectories.
+    :param game: Game name.
+    :param teacher: Teacher model.
+    :param seeds: Seeds of the games.
+    :param game_batch_size: Number of games played for each seed.
+    :return: List of trajectories, each one is a list of tuples (state, phase, action).
+    """
+    recorder = TrajectoryRecorder(teacher)
+    for seed in seeds:
+        utils.miscellaneous.get_game_instance(game, [recorder, game_batch_size, seed]).run()
+    trajectories = [trajectory for trajectory in recorder.trajectories if trajectory]
+    print(f"Recorded {len(trajectories)} trajectories, {sum(map(len, trajectories))} states")
+    return trajectories
+
+
+def check_readout(model, trajectories, tolerance=1e-3):
+    """
+    Checks that the fitted model plays its fitted readout: outputs of 'evaluate' on the recorded states must match
+    readout features of the states times the fitted weights.
+    :param model: Echo-State model with a fitted readout (see 'EchoState.fit_readout').
+    :param trajectories: Recorded trajectories (list of lists of tuples (state, phase, action)).
+    :param tolerance: Maximum absolute difference (reduced precisions of the model round the outputs).
+    :return: Maximum absolute difference of the outputs.
+    """
+    expected = {}
+    for phase, (X, _) in model.get_readout_features(trajectories).items():
+        W = model.models[phase].weights.astype(np.float64).reshape(X.shape[1] + 1, -1)
+        expected[phase] = iter(X @ W[:-1] + W[-1])
+
+    difference = 0.0
+    for trajectory in trajectories:
+        model.reset_state()
+        for state, phase, _ in trajectory:
+            output = np.asarray(model.evaluate(state, phase), dtype=np.float64)
+            difference = max(difference, float(np.max(np.abs(output - next(expected[phase])))))
+    if difference > tolerance:
+        raise ValueError(f"Outputs of the fitted model differ from the fitted readout by {difference}.")
+    print(f"Fitted readout checked on {sum(map(len, trajectories))} states (max. difference {difference:.2e})")
+    return difference
+
+
+def write_seed_population(file_name, weights, pop_size, sigma=0.05):
+    """
+    Writes a population file (same format as populations logged by the evolution) seeded by the fitted weights:
+    the first individual is the fitted one, the others are its copies with Gaussian noise.
+    :param file_name: Population file (JSON).
+    :param weights: Fitted weights (individual).
+    :param pop_size: Population size.
+    :param sigma: Standard deviation of the noise.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    population = weights + sigma * np.random.randn(pop_size, len(weights))
+    population[0] = weights
+    utils.model_files.write_arrays(file_name, {}, {"population": population})
+
+
+def train_readout(game, teacher, esn, seeds, file_name, alpha=1e-3, one_hot=False, game_batch_size=1):
+    """
+    Records trajectories of the teacher, fits the readout of the Echo-State model and saves it.
+    :param game: Game name.
+    :param teacher: Teacher model.
+    :param esn: Echo-State model (template) without output layers. The fitted model has the 'linear' activation and
+    outputs without normalization, so templates evolving its weights (e.g. from 'write_seed_population') should use
+    'activation="linear"' and 'normalize_output=False' too.
+    :param seeds: Seeds of recorded games.
+    :param file_name: File to save the fitted model to.
+    :param alpha: Regularization strength.
+    :param one_hot: If true, targets are one-hot vectors of the best actions of the teacher.
+    :param game_batch_size: Number of games played for each seed.
+    :return: Fitted Echo-State model.
+    """
+    trajectories = record_trajectories(game, teacher, seeds, game_batch_size)
+    model = esn.fit_readout(trajectories, utils.miscellaneous.get_game_config(game), alpha, one_hot)
+    check_readout(model, trajectories)
+    model.save_to_file(file_name)
+    return model
+
+
+if __name__ == '__main__':
+    np.random.seed(930615)
+
+    game = "2048"
+    seeds = list(range(100))
+    esn = EchoState(n_readout=200, n_components=1000, output_layers=[], activation="linear", normalize_output=False)
+
+    from models.learned_dqn import LearnedDQN
+    teacher = LearnedDQN("C:/Users/Jan/Documents/GitHub/general-ai/Experiments/DQN/2048/logs_2017-05-18_14-20-07")
+    model = train_readout(game, teacher, esn, seeds, "esn_readout.json", one_hot=True)
+    # write_seed_population("esn_readout_pop.json", np.concatenate([n.weights for n in model.models]), 50)
@@ -0,0 +1,116 @@
+"""
+On-disk cache of Echo-State reservoirs. Generating a reservoir means a dense 'n_components x n_components' matrix and
+its spectral radius, which takes seconds for 1000 units and minutes for 5000. Reservoirs are stored once per
+configuration (seed, n_components, n_features, weight_scaling, damping, connectivity, dtype) as '.npy' arrays (scaled
+weights - CSR arrays of sparse reservoirs, input weights and readout permutation) and every later process maps them
+read-only, so all workers share their pages.
+"""
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import scipy.sparse
+
+import constants
+import lib.simple_esn
+import utils.model_files
+
+CACHE_FILE = "reservoir.json"
+
+
+def get_cache_directory(seed, n_components, n_features, weight_scaling, damping, dtype, connectivity=None,
+                        radius_method="auto", radius_tol=1e-4):
+    """
+    Returns a directory of the cached reservoir with the specified configuration (the method and tolerance of the
+    spectral radius are part of it, they change the scaling of reservoir weights).
+    """
+    name = (f"esn_{seed}_{n_components}_{n_features}_{weight_scaling!r}_{damping!r}_{np.dtype(dtype).name}"
+            f"_{radius_method}_{radius_tol!r}")
+    if connectivity is not None:
+        name += f"_sparse_{connectivity!r}"
+    return os.path.join(constants.RESERVOIR_CACHE_DIR, name)
+
+
+def write_reservoir(directory, esn, seed, n_features):
+    """
+    Generates a reservoir of the specified configuration and writes it to the cache. Readout neurons are stored as the
+    whole permutation of the reservoir (readout of any size is its prefix). The reservoir is written to a temporary
+    directory and renamed, so processes missing the cache at once never see an incomplete reservoir.
+    :param directory: Cache directory of the reservoir.
+    :param esn: Reservoir (SimpleESN) that defines the configuration.
+    :param seed: Seed of the reservoir.
+    :param n_features: Number of input features.
+    """
+    full = lib.simple_esn.SimpleESN(esn.n_components, esn.n_components, damping=esn.damping,
+                                    weight_scaling=esn.weight_scaling, random_state=seed, dtype=esn.dtype,
+                                    radius_method=esn.radius_method, radius_tol=esn.radius_tol,
+                                    connectivity=esn.connectivity)
+    full.init_weights(n_samples=1, n_features=n_features)
+
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    temporary = tempfile.mkdtemp(dir=os.path.dirname(directory))
+    file_name = os.path.join(temporary, CACHE_FILE)
+    data = {"echo_state_seed": int(seed), "n_components": esn.n_components, "n_features": n_features,
+            "weight_scaling": esn.weight_scaling, "damping": esn.damping, "dtype": np.dtype(esn.dtype).name,
+            "connectivity": esn.connectivity, "radius_method": esn.radius_method, "radius_tol": esn.radius_tol}
+    arrays = {"input_weights": full.input_weights_, "readout": full.readout_idx_}
+    if scipy.sparse.issparse(full.weights_):
+        arrays.update({"weights_data": full.weights_.data, "weights_indices": full.weights_.indices,
+                       "weights_indptr": full.weights_.indptr})
+    else:
+        arrays["weights"] = full.weights_
+    for key, values in arrays.items():
+        data[f"{key}_file"] = utils.model_files.write_sidecar(file_name, key, values, values.dtype)
+    with open(file_name, "w") as f:
+        f.write(json.dumps(data))
+
+    try:
+        os.rename(temporary, directory)
+    except OSError:
+        # reservoir has been written by another process meanwhile
+        shutil.rmtree(temporary, ignore_errors=True)
+
+
+def read_reservoir(directory):
+    """
+    Reads the cached reservoir (arrays are memory-mapped read-only, CSR matrices of sparse reservoirs use them without
+    copying).
+    :param directory: Cache directory of the reservoir.
+    :return: Dictionary key -> array ('weights', 'input_weights', 'readout').
+    """
+    file_name = os.path.join(directory, CACHE_FILE)
+    with open(file_name, "r") as f:
+        data = json.load(f)
+    arrays = {key[:-len("_file")]: np.load(os.path.join(directory, value), mmap_mode="r")
+              for key, value in data.items() if key.endswith("_file")}
+    if "weights_data" in arrays:
+        n = data["n_components"]
+        arrays["weights"] = scipy.sparse.csr_matrix((arrays.pop("weights_data"), arrays.pop("weights_indices"),
+                                                     arrays.pop("weights_indptr")), shape=(n, n), copy=False)
+    return arrays
+
+
+def init_reservoir(esn, seed, n_features):
+    """
+    Initializes weights of the specified reservoir from the cache (the reservoir is generated and cached first, if
+    it is not cached yet). The reservoir is the same as the one generated by 'init_weights' with the same seed. Cycle
+    reservoirs are generated in O(n_components), so they are not cached.
+    :param esn: Reservoir (SimpleESN) to initialize.
+    :param seed: Seed of the reservoir.
+    :param n_features: Number of input features.
+    """
+    if constants.RESERVOIR_CACHE_DIR is None or seed is None or isinstance(esn, lib.simple_esn.CycleESN):
+        esn.init_weights(n_samples=1, n_features=n_features)
+        return
+
+    directory = get_cache_directory(seed, esn.n_components, n_features, esn.weight_scaling, esn.damping, esn.dtype,
+                                    esn.connectivity, esn.radius_method, esn.radius_tol)
+    if not os.path.exists(os.path.join(directory, CACHE_FILE)):
+        write_reservoir(directory, esn, seed, n_features)
+
+    arrays = read_reservoir(directory)
+    esn.weights_ = arrays["weights"]
+    esn.input_weights_ = arrays["input_weights"]
+    esn.readout_idx_ = np.array(arrays["readout"][:esn.n_readout])
+    esn.init_weights(n_samples=1, n_features=n_features)
@@ -0,0 +1,148 @@
+"""
+Resource governor: assigns CPU cores to controller workers (evaluation threads) and their game subprocesses and caps
+thread pools of BLAS and TensorFlow, so the workers, games and libraries do not oversubscribe the machine.
+Usage (before the evolution / learning starts):
+    ResourceGovernor(workers=8, game_niceness=5).install()
+"""
+import os
+import shutil
+import threading
+
+BLAS_ENVIRONMENT_VARIABLES = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "VECLIB_MAXIMUM_THREADS",
+                              "NUMEXPR_NUM_THREADS"]
+
+
+class ResourceGovernor():
+    """
+    Splits available cores into slots, one slot per controller worker. A worker thread (and every game subprocess
+    started from it) is pinned to the cores of its slot. Game subprocesses are started through 'taskset' and 'nice'
+    (commands given as lists of arguments), so all their threads and children inherit the affinity and niceness.
+    """
+    active = None
+
+    def __init__(self, workers, cores=None, cores_per_worker=None, game_niceness=0, blas_threads=1,
+                 tf_threads=None):
+        """
+        Initializes a new instance of ResourceGovernor.
+        :param workers: Number of controller workers (e.g. 'max_workers' of the evolution).
+        :param cores: List of cores to use (all cores available to the process by default).
+        :param cores_per_worker: Number of cores of a single worker slot (cores are split evenly by default).
+        :param game_niceness: Niceness increment of game subprocesses (0 = unchanged).
+        :param blas_threads: Maximum number of BLAS / OpenMP threads.
+        :param tf_threads: Number of TensorFlow inter/intra-op threads (cores of a single slot by default).
+        """
+        if cores is None:
+            cores = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(
+                range(os.cpu_count()))
+        self.cores = list(cores)
+        self.workers = workers
+        self.cores_per_worker = cores_per_worker or max(1, len(self.cores) // workers)
+        self.game_niceness = game_niceness
+        self.blas_threads = blas_threads
+        self.tf_threads = tf_threads or self.cores_per_worker
+
+        self.slots = []
+        for i in range(workers):
+            begin = (i * self.cores_per_worker) % len(self.cores)
+            slot = [self.cores[(begin + j) % len(self.cores)] for j in range(self.cores_per_worker)]
+            self.slots.append(sorted(set(slot)))
+
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.next_slot = 0
+        self.blas_limits = None
+        self.taskset = shutil.which("taskset") is not None
+        self.nice = shutil.which("nice") is not None
+
+    def install(self):
+        """
+        Makes this governor active for the whole process: caps BLAS thread pools (environment variables are also
+        inherited by game subprocesses) and reports the core allocation.
+        """
+        for variable in BLAS_ENVIRONMENT_VARIABLES:
+            os.environ[variable] = str(self.blas_threads)
+        try:
+            # BLAS libraries already loaded by NumPy / SciPy ignore the environment variables
+            from threadpoolctl import threadpool_limits
+            self.blas_limits = threadpool_limits(limits=self.blas_threads)
+        except ImportError:
+            print("threadpoolctl is not available, BLAS threads are capped only for libraries loaded later.")
+
+        ResourceGovernor.active = self
+        self.report()
+        return self
+
+    def report(self):
+        """
+        Prints the core allocation.
+        """
+        print(f"Resource governor: {len(self.cores)} cores, {self.workers} workers, BLAS threads: {self.blas_threads}, "
+              f"TF threads: {self.tf_threads}, game niceness: +{self.game_niceness}")
+        for i, slot in enumerate(self.slots):
+            print(f"    worker {i}: cores {slot}")
+        if not self.taskset:
+            print("    'taskset' is not available, game subprocesses are not pinned to cores.")
+        if self.game_niceness and not self.nice:
+            print("    'nice' is not available, niceness of game subprocesses is not changed.")
+
+    def get_worker_cores(self):
+        """
+        Returns cores of the slot of the calling thread (the first call assigns the next free slot to the thread).
+        :return: List of cores.
+        """
+        if not hasattr(self.local, "cores"):
+            with self.lock:
+                self.local.cores = self.slots[self.next_slot % len(self.slots)]
+                self.next_slot += 1
+        return self.local.cores
+
+    def pin_worker(self):
+        """
+        Pins the calling worker thread to the cores of its slot.
+        """
+        cores = self.get_worker_cores()
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)  # 0 = calling thread on Linux
+
+    def get_child_command(self, command):
+        """
+        Prefixes the command of a game subprocess by 'taskset' (cores of the slot of the calling worker) and 'nice'.
+        Nothing runs in the forked child before exec (unlike 'preexec_fn', which is unsafe in multithreaded processes).
+        :param command: Command as a list of arguments (shell command strings are returned unchanged).
+        :return: Command to start.
+        """
+        if not isinstance(command, list):
+            return command
+        prefix = []
+        if self.taskset:
+            prefix += ["taskset", "-c", ",".join(map(str, self.get_worker_cores()))]
+        if self.game_niceness and self.nice:
+            prefix += ["nice", "-n", str(self.game_niceness)]
+        return prefix + command
+
+
+def init_worker():
+    """
+    Initializer of controller worker threads (pins the thread if a governor is active).
+    """
+    if ResourceGovernor.active is not None:
+        ResourceGovernor.active.pin_worker()
+
+
+def get_child_command(command):
+    """
+    Returns the command of a game subprocess (pinned and reniced if a governor is active, see 'get_child_command').
+    """
+    if ResourceGovernor.active is None:
+        return command
+    return ResourceGovernor.active.get_child_command(command)
+
+
+def get_tf_threads(default):
+    """
+    Returns number of TensorFlow inter/intra-op threads.
+    :param default: Number of threads used if no governor is active.
+    """
+    if ResourceGovernor.active is None:
+        return default
+    return ResourceGovernor.active.tf_threads
@@ -4,6 +4,7 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import numpy as np
 import os, json
+import concurrent.futures
 
 import games
 import time
@@ -123,18 +124,42 @@ def run_2048_extended(model, evals):
     return game_instance.run(advanced_results=True)
 
 
-def run_random_model(game, evals):
+def play_random_game(game, seed):
+    """
+    Plays a single game with the random model (worker of 'run_random_model').
+    :param game: Game name.
+    :param seed: Seed of the game and of the model.
+    :return: Game result.
+    """
+    parameters = [Random(game, seed), 1, seed]
+    return utils.miscellaneous.get_game_instance(game, parameters).run()
+
+
+def run_random_model(game, evals, max_workers=None):
+    """
+    Plays the specified number of games with the random model in parallel and creates a graph. Games running in the
+    controller process (2048) are played by worker processes, games running in subprocesses are played by threads
+    (their resources, e.g. TORCS ports, are allocated by locks of the controller process).
+    :param game: Game name.
+    :param evals: Number of games.
+    :param max_workers: Number of workers (default of the executor).
+    :return: Results of all games.
+    """
     print(f"Generating graph of 'random' model for game {game}.")
-    results = []
+    seeds = [np.random.randint(0, 2 ** 16) for _ in range(evals)]
+    results = np.zeros(evals)
     t = time.time()
-    for i in range(evals):
-        if time.time() - t > 1 or i == evals - 1:
-            print(f"{i + 1}/{evals}")
-            t = time.time()
-        parameters = [Random(game), 1, np.random.randint(0, 2 ** 16)]
-        game_instance = utils.miscellaneous.get_game_instance(game, parameters)
-        result = game_instance.run()
-        results.append(result)
+    if utils.miscellaneous.get_game_class(game).in_process:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    with executor:
+        futures = {executor.submit(play_random_game, game, seed): i for i, seed in enumerate(seeds)}
+        for done, future in enumerate(concurrent.futures.as_completed(futures)):
+            results[futures[future]] = future.result()
+            if time.time() - t > 1 or done == evals - 1:
+                print(f"{done + 1}/{evals}, average score: {np.sum(results) / (done + 1)}")
+                t = time.time()
 
     x = range(0, evals)
     # plt.plot(x, results, 'b', x, [np.mean(results) for _ in results], 'r--')
@@ -146,6 +171,7 @@ def run_random_model(game, evals):
     plt.xlabel("Evals")
     plt.ylabel("Score")
     plt.savefig(f"random_model_{game}.png")
+    return results
 
 
 def eval_alhambra_winrate(model, evals):
@@ -234,6 +260,8 @@ def run_avg_results():
         # SELECT PROPER MODEL
         model = MLP.load_from_file(file_name, game)
         # model = EchoState.load_from_file(file_name, game)
+        # from models.quantized_mlp import QuantizedMLP  # models exported by QuantizedMLP.export
+        # model = QuantizedMLP.load_from_file(file_name, game)
 
         # RUN MODEL
         # 2048
@@ -0,0 +1,94 @@
+"""
+Reference game for testing of the controller <-> game protocols. Usage:
+    python reference_game.py <seed> <game_batch_size>  (pipe protocol)
+    python reference_game.py <seed> <game_batch_size> <shared-memory channel arguments>  (shared memory)
+"""
+
+import json
+import os
+import socket
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "..", "Controller"))
+
+STATE_SIZE = 32
+ACTION_SIZE = 4
+STEPS = 100
+
+
+class ReferenceGame():
+    """
+    Deterministic game: the state is a random vector and the player should answer with its first values.
+    """
+
+    def __init__(self, seed):
+        self.rng = np.random.RandomState(seed)
+        self.state = self.rng.rand(STATE_SIZE)
+        self.steps = 0
+        self.score = 0.0
+        self.end = False
+
+    def move(self, action):
+        """
+        Performs a single move.
+        :param action: Action of the player.
+        :return: Reward of the move.
+        """
+        reward = -float(np.mean((np.asarray(action)[:ACTION_SIZE] - self.state[:ACTION_SIZE]) ** 2))
+        self.score += reward
+        self.steps += 1
+        self.end = self.steps >= STEPS
+        self.state = self.rng.rand(STATE_SIZE)
+        return reward
+
+
+class PipeProtocol():
+    def __init__(self):
+        # States are written to the separate protocol channel if the controller provides it
+        self.output = sys.stdout
+        port = os.environ.get("GENERAL_AI_PROTOCOL_PORT")
+        if port is not None:
+            connection = socket.create_connection(("127.0.0.1", int(port)))
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.output = connection.makefile("w")
+
+    def write_state(self, state, current_phase, reward, score, done):
+        data = {"state": state.tolist(), "current_phase": current_phase, "reward": reward, "score": score, "done": done}
+        self.output.write(json.dumps(data) + "\n")
+        self.output.flush()
+
+    def read_action(self):
+        return list(map(float, sys.stdin.readline().split()))
+
+
+def main():
+    seed = int(sys.argv[1])
+    game_batch_size = int(sys.argv[2])
+
+    if len(sys.argv) > 3:
+        from games.shared_memory_channel import SharedMemoryChannel
+        protocol = SharedMemoryChannel.attach(sys.argv[3:])
+        parent = os.getppid()
+        alive = lambda: os.getppid() == parent
+        read_action = lambda: protocol.read_action(alive)
+    else:
+        protocol = PipeProtocol()
+        read_action = protocol.read_action
+
+    rng = np.random.RandomState(seed)
+    total_score = 0.0
+    for i in range(game_batch_size):
+        game = ReferenceGame(rng.randint(0, 2 ** 30))
+        reward = 0.0
+        while not game.end:
+            protocol.write_state(game.state, 0, reward, [total_score / game_batch_size], 0)
+            reward = game.move(read_action())
+        total_score += game.score
+        print(f"Game {i + 1}/{game_batch_size} finished, score: {game.score}", file=sys.stderr)
+
+    protocol.write_state(game.state, 0, reward, [total_score / game_batch_size], 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,7 @@ import java.io.BufferedWriter;
 import java.io.IOException;
 import java.io.InputStreamReader;
 import java.io.OutputStreamWriter;
+import java.net.Socket;
 
 /**
  * General artificial interface for game playing project. This is the main file
@@ -54,6 +55,18 @@ public class GeneralAIDriver extends Controller {
         writer = new BufferedWriter(new OutputStreamWriter(System.out));
         reader = new BufferedReader(new InputStreamReader(System.in));
 
+        // Separate protocol channel (logs then stay on the standard output)
+        String protocolPort = System.getenv("GENERAL_AI_PROTOCOL_PORT");
+        if (protocolPort != null) {
+            try {
+                Socket socket = new Socket("127.0.0.1", Integer.parseInt(protocolPort));
+                socket.setTcpNoDelay(true);
+                writer = new BufferedWriter(new OutputStreamWriter(socket.getOutputStream()));
+            } catch (IOException e) {
+                e.printStackTrace();
+            }
+        }
+
         float[] angles = new float[19];
 
         /* set angles as {-90,-75,-60,-45,-30,-20,-15,-10,-5,0,5,10,15,20,30,45,60,75,90} */